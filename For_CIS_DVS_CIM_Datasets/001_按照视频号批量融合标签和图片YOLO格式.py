@@ -1,5 +1,6 @@
 import os
 import cv2
+import numpy as np
 
 
 # 解析路径，提取视频编号、相机类型和帧编号
@@ -60,16 +61,20 @@ def draw_labels(image, labels):
     返回:
         numpy.ndarray: 绘制了边界框的图片
     """
+    if not labels:
+        return image
     h, w = image.shape[:2]  # 获取图片高度和宽度
-    for label in labels:
-        class_id, center_x, center_y, width, height = label
-        # 将归一化坐标转换为像素坐标
-        x1 = int((center_x - width / 2) * w)
-        y1 = int((center_y - height / 2) * h)
-        x2 = int((center_x + width / 2) * w)
-        y2 = int((center_y + height / 2) * h)
-        # 绘制绿色边界框，厚度为2
-        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    # 整帧一次性将归一化坐标转换为像素坐标
+    boxes = np.asarray(labels, dtype=np.float64)
+    x1 = (boxes[:, 1] - boxes[:, 3] / 2) * w
+    y1 = (boxes[:, 2] - boxes[:, 4] / 2) * h
+    x2 = (boxes[:, 1] + boxes[:, 3] / 2) * w
+    y2 = (boxes[:, 2] + boxes[:, 4] / 2) * h
+    # 每个框的四个角点，形状为 (框数, 4, 2)
+    polygons = np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                         np.stack([x2, y2], 1), np.stack([x1, y2], 1)], axis=1).astype(np.int32)
+    # 一次调用绘制所有绿色边界框，厚度为2
+    cv2.polylines(image, polygons, True, (0, 255, 0), 2)
     return image
 
 
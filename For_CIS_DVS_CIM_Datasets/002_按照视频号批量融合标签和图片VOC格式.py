@@ -1,7 +1,14 @@
 import os
+import zlib
+from functools import lru_cache
+
 import cv2
+import numpy as np
 import xml.etree.ElementTree as ET
 
+# 一帧中目标数超过该值时不再逐个写类别名，改为在左上角画图例（遥感车辆等密集帧）
+DENSE_LABEL_THRESHOLD = 50
+
 # 解析路径，提取视频编号、相机类型和帧编号
 def parse_path(path):
     """
@@ -52,6 +59,20 @@ def load_labels(label_dir):
                     label_dict[key] = objects
     return label_dict
 
+# 类别颜色：按类别名的 crc32 取色相，与集合遍历顺序无关，每次运行颜色都相同
+@lru_cache(maxsize=None)
+def class_color(class_name):
+    """
+    返回类别的固定颜色
+    参数:
+        class_name (str): 类别名
+    返回:
+        tuple: BGR 颜色
+    """
+    hue = zlib.crc32(class_name.encode('utf-8')) % 180
+    b, g, r = cv2.cvtColor(np.uint8([[[hue, 255, 255]]]), cv2.COLOR_HSV2BGR)[0, 0]
+    return int(b), int(g), int(r)
+
 # 为所有类别生成颜色映射
 def get_class_colors(label_dict):
     """
@@ -65,16 +86,40 @@ def get_class_colors(label_dict):
     for objects in label_dict.values():
         for obj in objects:
             all_classes.add(obj['class'])
-    colors = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255)]
-    class_colors = {}
-    for i, cls in enumerate(all_classes):
-        class_colors[cls] = colors[i % len(colors)]
-    return class_colors
+    return {cls: class_color(cls) for cls in sorted(all_classes)}
+
+# 将 [xmin, ymin, xmax, ymax] 数组转换为矩形的四个角点
+def box_polygons(boxes):
+    """
+    参数:
+        boxes (numpy.ndarray): 形状为 (N, 4) 的边界框数组
+    返回:
+        numpy.ndarray: 形状为 (N, 4, 2) 的 int32 角点数组，可直接传给 cv2.polylines
+    """
+    xmin, ymin, xmax, ymax = boxes.T
+    return np.stack([np.stack([xmin, ymin], 1), np.stack([xmax, ymin], 1),
+                     np.stack([xmax, ymax], 1), np.stack([xmin, ymax], 1)], axis=1).astype(np.int32)
+
+# 在左上角绘制类别图例
+def draw_legend(image, class_names, counts, class_colors):
+    """
+    在左上角按类别绘制图例和目标数，用于目标密集的帧
+    参数:
+        image (numpy.ndarray): 输入图片
+        class_names (numpy.ndarray): 类别名（已排序）
+        counts (numpy.ndarray): 每个类别的目标数
+        class_colors (dict): 类别到颜色的映射
+    """
+    for i, (class_name, count) in enumerate(zip(class_names, counts)):
+        y = 30 + i * 30
+        color = class_colors.get(class_name) or class_color(class_name)
+        cv2.putText(image, f"{class_name}: {count}", (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
 
 # 在图片上绘制VOC标签
 def draw_labels(image, objects, class_colors):
     """
-    根据VOC标签在图片上绘制边界框和类别名称
+    根据VOC标签在图片上绘制边界框和类别名称：整帧的坐标一次转为数组，每个类别只调用一次 cv2.polylines；
+    目标数超过 DENSE_LABEL_THRESHOLD 时用图例代替逐个目标的类别名
     参数:
         image (numpy.ndarray): 输入图片
         objects (list): 对象列表，每个对象为{'class': str, 'bbox': [xmin, ymin, xmax, ymax]}
@@ -82,12 +127,20 @@ def draw_labels(image, objects, class_colors):
     返回:
         numpy.ndarray: 绘制了边界框和类别的图片
     """
-    for obj in objects:
-        class_name = obj['class']
-        xmin, ymin, xmax, ymax = obj['bbox']
-        color = class_colors.get(class_name, (0, 255, 0))  # 默认绿色
-        cv2.rectangle(image, (xmin, ymin), (xmax, ymax), color, 2)
-        cv2.putText(image, class_name, (xmin, ymin - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+    if not objects:
+        return image
+    classes = [obj['class'] for obj in objects]
+    polygons = box_polygons(np.array([obj['bbox'] for obj in objects]))
+    class_names, inverse, counts = np.unique(classes, return_inverse=True, return_counts=True)
+    for idx, class_name in enumerate(class_names):
+        color = class_colors.get(class_name) or class_color(class_name)
+        cv2.polylines(image, polygons[inverse == idx], True, color, 2)
+    if len(objects) > DENSE_LABEL_THRESHOLD:
+        draw_legend(image, class_names, counts, class_colors)
+    else:
+        for class_name, (xmin, ymin) in zip(classes, polygons[:, 0]):
+            color = class_colors.get(class_name) or class_color(class_name)
+            cv2.putText(image, class_name, (int(xmin), int(ymin) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
     return image
 
 # 处理单张图片
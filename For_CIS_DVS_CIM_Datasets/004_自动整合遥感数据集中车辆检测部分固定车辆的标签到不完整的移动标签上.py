@@ -1,6 +1,12 @@
 import os
+import sys
+import copy
 import glob
+import fnmatch
+import importlib.util
 import xml.etree.ElementTree as ET
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 import logging
 from tqdm import tqdm
@@ -10,33 +16,17 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 
-def calculate_iou(box1, box2):
-    """
-    计算两个边界框的IOU
-    box格式: [xmin, ymin, xmax, ymax]
-    """
-    x1, y1, x2, y2 = box1
-    x1_, y1_, x2_, y2_ = box2
-
-    # 计算交集的坐标
-    xi1 = max(x1, x1_)
-    yi1 = max(y1, y1_)
-    xi2 = min(x2, x2_)
-    yi2 = min(y2, y2_)
+def load_box_index():
+    """加载同目录下 037 的网格空间索引"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "037_矩形框网格空间索引.py")
+    spec = importlib.util.spec_from_file_location("box_index", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
 
-    # 计算交集面积
-    inter_area = max(0, xi2 - xi1) * max(0, yi2 - yi1)
 
-    # 计算各自面积
-    box1_area = (x2 - x1) * (y2 - y1)
-    box2_area = (x2_ - x1_) * (y2_ - y1_)
-
-    # 计算并集面积
-    union_area = box1_area + box2_area - inter_area
-
-    # 计算IOU
-    iou = inter_area / union_area if union_area > 0 else 0
-    return iou
+box_index = load_box_index()
 
 
 def get_bndbox_coordinates(obj):
@@ -50,55 +40,44 @@ def get_bndbox_coordinates(obj):
     ]
 
 
+@lru_cache(maxsize=None)
+def load_template(fixed_xml):
+    """
+    解析固定小车模板，每个进程只解析一次
+    返回 (边界框数组 (M, 4), 对应的 object 节点列表)
+    """
+    fixed_root = ET.parse(fixed_xml).getroot()
+    objects = [obj for obj in fixed_root.findall('object') if obj.find('name').text == 'vehicle']
+    boxes = np.array([get_bndbox_coordinates(obj) for obj in objects], dtype=np.float64).reshape(-1, 4)
+    return boxes, objects
+
+
 def add_fixed_vehicles(stationary_xml, fixed_xml, iou_threshold=0.2):
     """
     将固定小车标签添加到静止小车标签中，检查IOU避免重复
     返回是否修改了文件
     """
     try:
-        # 解析XML
-        stationary_tree = ET.parse(stationary_xml)
-        fixed_tree = ET.parse(fixed_xml)
+        fixed_boxes, fixed_objects = load_template(fixed_xml)
+        if not fixed_objects:
+            return False
 
+        stationary_tree = ET.parse(stationary_xml)
         stationary_root = stationary_tree.getroot()
-        fixed_root = fixed_tree.getroot()
-
-        # 获取所有固定小车的边界框
-        fixed_boxes = []
-        for obj in fixed_root.findall('object'):
-            if obj.find('name').text == 'vehicle':
-                fixed_boxes.append(get_bndbox_coordinates(obj))
 
         # 获取静止小车的边界框
-        stationary_boxes = []
-        for obj in stationary_root.findall('object'):
-            if obj.find('name').text == 'vehicle':
-                stationary_boxes.append(get_bndbox_coordinates(obj))
-
-        modified = False
-        # 检查每个固定小车边界框
-        for fixed_obj in fixed_root.findall('object'):
-            if fixed_obj.find('name').text != 'vehicle':
-                continue
-
-            fixed_box = get_bndbox_coordinates(fixed_obj)
-            is_duplicate = False
-
-            # 检查是否与现有边界框重叠
-            for stat_box in stationary_boxes:
-                iou = calculate_iou(fixed_box, stat_box)
-                if iou > iou_threshold:
-                    is_duplicate = True
-                    logger.debug(f"Skipping duplicate box in {stationary_xml}: IOU={iou:.2f}")
-                    break
-
-            # 如果不是重复的，添加到静止标签中
-            if not is_duplicate:
-                stationary_root.append(fixed_obj)
-                modified = True
-                logger.debug(f"Added vehicle box to {stationary_xml}")
-
-        # 如果有修改，保存文件
+        stationary_boxes = [get_bndbox_coordinates(obj) for obj in stationary_root.findall('object')
+                            if obj.find('name').text == 'vehicle']
+
+        # 用网格索引只对相邻的框计算IOU，与现有边界框IOU超过阈值的固定小车视为重复
+        duplicate = box_index.BoxGridIndex(stationary_boxes).max_iou(fixed_boxes) > iou_threshold
+        logger.debug(f"Skipping {int(duplicate.sum())} duplicate boxes in {stationary_xml}")
+
+        # 不重复的固定小车添加到静止标签中
+        for idx in np.flatnonzero(~duplicate):
+            stationary_root.append(copy.deepcopy(fixed_objects[idx]))
+
+        modified = not duplicate.all()
         if modified:
             stationary_tree.write(stationary_xml, encoding='utf-8', xml_declaration=True)
             logger.info(f"Updated {stationary_xml}")
@@ -113,39 +92,66 @@ def add_fixed_vehicles(stationary_xml, fixed_xml, iou_threshold=0.2):
         return False
 
 
+def find_template(video_folder, templates):
+    """按视频文件夹名匹配对应相机场景的固定小车模板，没有匹配时返回 None"""
+    name = os.path.basename(video_folder)
+    for pattern, fixed_xml in templates:
+        if fnmatch.fnmatch(name, pattern):
+            return fixed_xml
+    return None
+
+
+def process_video_folder(video_folder, fixed_xml, iou_threshold=0.2):
+    """处理一个视频文件夹下的所有XML，返回 (文件数, 修改的文件数)"""
+    xml_files = glob.glob(os.path.join(video_folder, "*.xml"))
+    modified = sum(1 for xml_file in xml_files if add_fixed_vehicles(xml_file, fixed_xml, iou_threshold))
+    return len(xml_files), modified
+
+
 def main():
     # 路径配置
-    fixed_xml_path = r"D:\Dataset\梁慧标签\2025030917474111_aps\label_png\固定小车标签\3264_2448_10_0000000000.xml"
+    # 每个相机场景一个固定小车模板：(视频文件夹名的通配模式, 模板XML)，按顺序匹配，先匹配到的生效
+    templates = [
+        ("2025*", r"D:\Dataset\梁慧标签\2025030917474111_aps\label_png\固定小车标签\3264_2448_10_0000000000.xml"),
+    ]
     stationary_base_path = r"D:\Dataset\关于遥感的标签"
+    iou_threshold = 0.2
+    max_workers = os.cpu_count() or 1
 
     # 检查固定小车标签文件是否存在
-    if not os.path.exists(fixed_xml_path):
-        logger.error(f"Fixed vehicle XML not found: {fixed_xml_path}")
+    missing = [fixed_xml for _, fixed_xml in templates if not os.path.exists(fixed_xml)]
+    if missing:
+        for fixed_xml in missing:
+            logger.error(f"Fixed vehicle XML not found: {fixed_xml}")
         return
 
-    # 查找所有视频文件夹
-    video_folders = [f for f in glob.glob(os.path.join(stationary_base_path, "2025*"))
-                     if os.path.isdir(f)]
+    # 查找所有视频文件夹，并为每个文件夹匹配模板
+    jobs = []
+    for video_folder in sorted(glob.glob(os.path.join(stationary_base_path, "*"))):
+        if not os.path.isdir(video_folder):
+            continue
+        fixed_xml = find_template(video_folder, templates)
+        if fixed_xml is not None:
+            jobs.append((video_folder, fixed_xml))
 
-    if not video_folders:
+    if not jobs:
         logger.warning(f"No video folders found in {stationary_base_path}")
         return
 
     total_files = 0
     modified_files = 0
 
-    # 遍历每个视频文件夹
-    for video_folder in tqdm(video_folders, desc="Processing video folders"):
-        # 查找所有XML文件
-        xml_files = glob.glob(os.path.join(video_folder, "*.xml"))
-        total_files += len(xml_files)
-
-        for xml_file in xml_files:
-            if add_fixed_vehicles(xml_file, fixed_xml_path):
-                modified_files += 1
+    # 按视频文件夹并行处理
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(process_video_folder, video_folder, fixed_xml, iou_threshold)
+                   for video_folder, fixed_xml in jobs]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing video folders"):
+            files, modified = future.result()
+            total_files += files
+            modified_files += modified
 
     logger.info(f"Processed {total_files} XML files, modified {modified_files} files")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
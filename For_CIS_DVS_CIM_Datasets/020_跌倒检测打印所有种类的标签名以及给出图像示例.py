@@ -1,12 +1,34 @@
 import os
+import re
+import sys
+import time
+import importlib.util
 import xml.etree.ElementTree as ET
 from pathlib import Path
 from collections import defaultdict
 import random
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+def load_script(name, filename):
+    """加载同目录下的编号脚本"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# 预览解码和缓存与 034 的渲染流水线共用一份实现
+renderer = load_script("renderer", "034_并行分片批量融合标签和图片.py")
 
 
 def parse_xml_classes(xml_path, video_id, sub_dir_type, video_base_path):
-    """解析单个 XML 文件，提取类别名称及对应的图片路径"""
+    """解析单个 XML 文件，提取类别名称、对应的图片路径和边界框"""
     try:
         tree = ET.parse(xml_path)
         root = tree.getroot()
@@ -30,8 +52,16 @@ def parse_xml_classes(xml_path, video_id, sub_dir_type, video_base_path):
 
         for obj in root.findall('object'):
             class_name = obj.find('name').text
+            bndbox = obj.find('bndbox')
+            bbox = None
+            if bndbox is not None:
+                # 坐标缺失或为空时只是不画框，类别仍然计入统计
+                try:
+                    bbox = [int(float(bndbox.find(k).text)) for k in ('xmin', 'ymin', 'xmax', 'ymax')]
+                except (AttributeError, TypeError, ValueError):
+                    bbox = None
             if class_name:
-                class_image_pairs.append((class_name, str(image_path)))
+                class_image_pairs.append((class_name, str(image_path), bbox))
         return class_image_pairs
     except ET.ParseError:
         print(f"解析错误: {xml_path}")
@@ -41,13 +71,133 @@ def parse_xml_classes(xml_path, video_id, sub_dir_type, video_base_path):
         return []
 
 
-def check_video_labels(video_base_path, label_base_path):
+def load_preview(image_path, factor, cache_dir=None):
+    """
+    以缩小的分辨率解码图片；指定 cache_dir 时按源图片修改时间复用磁盘缓存（缓存布局与 034 相同）
+
+    Returns:
+        numpy.ndarray: 预览图，读取失败时为 None
+    """
+    cache_path = None
+    if cache_dir:
+        # 视频号和相机取自 <视频号>/<APS|EVS>/<...>/<aps_png|evs_png>/<帧>.png，避免不同视频的同名帧冲突
+        parts = Path(image_path).parts
+        cache_path = renderer.preview_cache_path(cache_dir, parts[-5], parts[-4], factor, parts[-1])
+    return renderer.load_preview(image_path, factor, cache_path)
+
+
+def safe_filename(class_name):
+    """类别名可能含有文件名不允许的字符，替换为下划线后作为文件夹名或文件名"""
+    return re.sub(r'[\\/:*?"<>|]', '_', class_name)
+
+
+def export_previews(sampled_images, preview_dir, factor=4, cache_dir=None):
+    """
+    将每个类别抽样的图片以预览分辨率导出到 preview_dir/<类别>/，并按同一比例缩放后画出该对象的边界框
+
+    Args:
+        sampled_images: 类别 -> [(图片路径, 边界框)]
+        preview_dir: 预览图输出目录
+        factor: 预览档位（1/2/4/8）
+        cache_dir: 预览缓存目录，None 表示不缓存
+    """
+    for class_name, samples in sampled_images.items():
+        class_dir = os.path.join(preview_dir, safe_filename(class_name))
+        os.makedirs(class_dir, exist_ok=True)
+        for idx, (image_path, bbox) in enumerate(samples, 1):
+            image = load_preview(image_path, factor, cache_dir)
+            if image is None:
+                print(f"错误: 无法读取图片 {image_path}")
+                continue
+            if bbox:
+                xmin, ymin, xmax, ymax = (v // factor for v in bbox)
+                cv2.rectangle(image, (xmin, ymin), (xmax, ymax), (0, 0, 255), 2)
+            try:
+                renderer.write_image(os.path.join(class_dir, f"{idx:02d}_{Path(image_path).name}"), image)
+            except OSError as e:
+                print(f"错误: 无法导出预览图 {image_path}: {e}")
+    print(f"\n抽样图片的预览图已导出到: {preview_dir}")
+
+
+def render_tile(image_path, bbox, factor, cache_dir, tile_size):
+    """
+    以预览分辨率解码一张抽样图片，突出显示该对象（框外区域压暗并画红框），缩放到格子大小并标注视频号和文件名
+
+    Returns:
+        numpy.ndarray: 格子图像，读取失败时为 None
+    """
+    image = load_preview(image_path, factor, cache_dir)
+    if image is None:
+        return None
+    if bbox:
+        h, w = image.shape[:2]
+        xmin, ymin, xmax, ymax = (v // factor for v in bbox)
+        xmin, xmax = max(0, min(xmin, w)), max(0, min(xmax, w))
+        ymin, ymax = max(0, min(ymin, h)), max(0, min(ymax, h))
+        highlighted = image // 3
+        highlighted[ymin:ymax, xmin:xmax] = image[ymin:ymax, xmin:xmax]
+        image = highlighted
+        cv2.rectangle(image, (xmin, ymin), (xmax, ymax), (0, 0, 255), 2)
+    tile = cv2.resize(image, tile_size, interpolation=cv2.INTER_AREA)
+    parts = Path(image_path).parts
+    # 视频号和相机取自 <视频号>/<APS|EVS>/<...>/<aps_png|evs_png>/<帧>.png
+    caption = f"{' '.join(parts[-5:-3])} {Path(image_path).stem.split('_')[-1]}"
+    cv2.rectangle(tile, (0, tile_size[1] - 20), (tile_size[0], tile_size[1]), (0, 0, 0), -1)
+    cv2.putText(tile, caption, (4, tile_size[1] - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1)
+    return tile
+
+
+def export_contact_sheets(sampled_images, sheet_dir, factor=4, cache_dir=None, tile_size=(320, 240), columns=5,
+                          max_workers=8):
+    """
+    为每个类别生成一张拼图：所有类别的抽样图片在线程池中并行解码，再按行列切片拼到一张画布上，
+    保存为 sheet_dir/<类别>.jpg，便于一眼看出被误用的类别
+
+    Args:
+        sampled_images: 类别 -> [(图片路径, 边界框)]
+        sheet_dir: 拼图输出目录
+        factor: 预览档位（1/2/4/8）
+        cache_dir: 预览缓存目录，None 表示不缓存
+        tile_size: 每个格子的 (宽, 高)
+        columns: 每行的格子数
+        max_workers: 并行解码的线程数
+    """
+    os.makedirs(sheet_dir, exist_ok=True)
+    tile_w, tile_h = tile_size
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {class_name: [executor.submit(render_tile, image_path, bbox, factor, cache_dir, tile_size)
+                                for image_path, bbox in samples]
+                   for class_name, samples in sampled_images.items() if samples}
+        for class_name, tile_futures in futures.items():
+            rows = (len(tile_futures) + columns - 1) // columns
+            sheet = np.zeros((rows * tile_h, min(columns, len(tile_futures)) * tile_w, 3), dtype=np.uint8)
+            for idx, future in enumerate(tile_futures):
+                tile = future.result()
+                if tile is None:
+                    print(f"错误: 无法读取图片 {sampled_images[class_name][idx][0]}")
+                    continue
+                row, col = divmod(idx, columns)
+                sheet[row * tile_h:(row + 1) * tile_h, col * tile_w:(col + 1) * tile_w] = tile
+            try:
+                renderer.write_image(os.path.join(sheet_dir, f"{safe_filename(class_name)}.jpg"), sheet,
+                                     [cv2.IMWRITE_JPEG_QUALITY, 90])
+            except OSError as e:
+                print(f"错误: 无法导出类别 {class_name} 的拼图: {e}")
+    print(f"\n{len(futures)} 个类别的拼图已导出到: {sheet_dir}，耗时 {time.time() - start:.1f} 秒")
+
+
+def check_video_labels(video_base_path, label_base_path, preview_dir=None, preview_factor=4, preview_cache_dir=None, sheet_dir=None):
     """
     检查所有视频的标签情况，统计类别，并为每个类别随机抽取 20 个图片路径
 
     Args:
         video_base_path: 视频数据根路径 (E:\DatasetFor5Task\FallDetection\)
         label_base_path: 标签数据根路径 (D:\数据集转换汇总\标签专用文件夹\标签整理2\0整理\跌倒\)
+        preview_dir: 抽样图片预览图的输出目录（None 表示不导出）
+        preview_factor: 预览档位（1/2/4/8），APS 3264x2448 用 4 即可
+        preview_cache_dir: 预览缓存目录（None 表示不缓存）
+        sheet_dir: 每个类别的抽样拼图输出目录（None 表示不导出）
     """
     video_base_path = Path(video_base_path)
     label_base_path = Path(label_base_path)
@@ -93,8 +243,8 @@ def check_video_labels(video_base_path, label_base_path):
                 if sub_dir.exists():
                     for xml_file in sub_dir.glob('*.xml'):
                         class_image_pairs = parse_xml_classes(xml_file, video_id, sub_dir_type, video_base_path)
-                        for class_name, image_path in class_image_pairs:
-                            class_to_images[class_name].append(image_path)
+                        for class_name, image_path, bbox in class_image_pairs:
+                            class_to_images[class_name].append((image_path, bbox))
 
             # 4. 检查视频源是否存在
             evs_video_dir = video_dir / 'EVS' / f'normal_v2_816_612_{video_id}' / 'evs_png'
@@ -127,6 +277,7 @@ def check_video_labels(video_base_path, label_base_path):
         print("未找到任何类别。")
 
     # 打印每个类别随机抽取的 20 个图片路径
+    sampled_images = {}
     print("\n每个类别随机抽取的 20 个图片路径：")
     for class_name in all_classes:
         print(f"\n类别: {class_name}")
@@ -134,10 +285,19 @@ def check_video_labels(video_base_path, label_base_path):
         # 随机抽取 20 个图片路径（若不足 20 个，则返回所有）
         selected_images = random.sample(images, min(20, len(images)))
         if selected_images:
-            for idx, image_path in enumerate(selected_images, 1):
+            for idx, (image_path, bbox) in enumerate(selected_images, 1):
                 print(f"{idx}. {image_path}")
         else:
             print("无可用图片路径。")
+        sampled_images[class_name] = selected_images
+
+    # 导出抽样图片的预览图
+    if preview_dir:
+        export_previews(sampled_images, preview_dir, preview_factor, preview_cache_dir)
+
+    # 导出每个类别的抽样拼图
+    if sheet_dir:
+        export_contact_sheets(sampled_images, sheet_dir, preview_factor, preview_cache_dir)
 
     # 打印没有标签的视频
     print("\n没有标签文件夹的视频：")
@@ -172,8 +332,14 @@ def main():
     # 设置随机种子以确保可重复性（可选）
     random.seed(42)
 
+    # 抽样图片预览图的输出目录和缓存目录（设为 None 则只打印路径）
+    preview_dir = None
+    preview_cache_dir = None
+    # 每个类别的抽样拼图输出目录（设为 None 则不导出）
+    sheet_dir = None
+
     # 执行检查
-    check_video_labels(video_base_path, label_base_path)
+    check_video_labels(video_base_path, label_base_path, preview_dir, 4, preview_cache_dir, sheet_dir)
 
 
 if __name__ == "__main__":
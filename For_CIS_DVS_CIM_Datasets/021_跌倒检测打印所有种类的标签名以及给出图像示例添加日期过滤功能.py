@@ -1,4 +1,6 @@
 import os
+import sys
+import importlib.util
 import xml.etree.ElementTree as ET
 from pathlib import Path
 from collections import defaultdict
@@ -6,8 +8,22 @@ import random
 from datetime import datetime
 
 
+def load_script(name, filename):
+    """加载同目录下的编号脚本"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# 抽样预览图和拼图的导出与 020 相同
+census = load_script("class_census", "020_跌倒检测打印所有种类的标签名以及给出图像示例.py")
+
+
 def parse_xml_classes(xml_path, video_id, sub_dir_type, video_base_path):
-    """解析单个 XML 文件，提取类别名称及对应的图片路径"""
+    """解析单个 XML 文件，提取类别名称、对应的图片路径和边界框"""
     try:
         tree = ET.parse(xml_path)
         root = tree.getroot()
@@ -28,8 +44,16 @@ def parse_xml_classes(xml_path, video_id, sub_dir_type, video_base_path):
 
         for obj in root.findall('object'):
             class_name = obj.find('name').text
+            bndbox = obj.find('bndbox')
+            bbox = None
+            if bndbox is not None:
+                # 坐标缺失或为空时只是不画框，类别仍然计入统计
+                try:
+                    bbox = [int(float(bndbox.find(k).text)) for k in ('xmin', 'ymin', 'xmax', 'ymax')]
+                except (AttributeError, TypeError, ValueError):
+                    bbox = None
             if class_name:
-                class_image_pairs.append((class_name, str(image_path)))
+                class_image_pairs.append((class_name, str(image_path), bbox))
         return class_image_pairs
     except ET.ParseError:
         print(f"解析错误: {xml_path}")
@@ -53,7 +77,8 @@ def is_valid_date(video_id, cutoff_date_str="20250507"):
         return False
 
 
-def check_video_labels(video_base_path, label_base_path, cutoff_date="20250507"):
+def check_video_labels(video_base_path, label_base_path, cutoff_date="20250507", preview_dir=None, preview_factor=4,
+                       preview_cache_dir=None, sheet_dir=None):
     """
     检查所有视频的标签情况，统计类别，并为每个类别随机抽取 20 个图片路径
     仅处理日期在 cutoff_date 之后的视频
@@ -62,6 +87,10 @@ def check_video_labels(video_base_path, label_base_path, cutoff_date="20250507")
         video_base_path: 视频数据根路径
         label_base_path: 标签数据根路径
         cutoff_date: 日期截止点（YYYYMMDD 格式，默认为 20250507）
+        preview_dir: 抽样图片预览图的输出目录（None 表示不导出）
+        preview_factor: 预览档位（1/2/4/8），APS 3264x2448 用 4 即可
+        preview_cache_dir: 预览缓存目录（None 表示不缓存）
+        sheet_dir: 每个类别的抽样拼图输出目录（None 表示不导出）
     """
     video_base_path = Path(video_base_path)
     label_base_path = Path(label_base_path)
@@ -110,8 +139,8 @@ def check_video_labels(video_base_path, label_base_path, cutoff_date="20250507")
                 if sub_dir.exists():
                     for xml_file in sub_dir.glob('*.xml'):
                         class_image_pairs = parse_xml_classes(xml_file, video_id, sub_dir_type, video_base_path)
-                        for class_name, image_path in class_image_pairs:
-                            class_to_images[class_name].append(image_path)
+                        for class_name, image_path, bbox in class_image_pairs:
+                            class_to_images[class_name].append((image_path, bbox))
 
             # 4. 检查视频源是否存在
             evs_video_dir = video_dir / 'EVS' / f'normal_v2_816_612_{video_id}' / 'evs_png'
@@ -146,16 +175,26 @@ def check_video_labels(video_base_path, label_base_path, cutoff_date="20250507")
         print("未找到任何类别。")
 
     # 打印每个类别随机抽取的 20 个图片路径
+    sampled_images = {}
     print("\n每个类别随机抽取的 20 个图片路径：")
     for class_name in all_classes:
         print(f"\n类别: {class_name}")
         images = class_to_images[class_name]
         selected_images = random.sample(images, min(20, len(images)))
         if selected_images:
-            for idx, image_path in enumerate(selected_images, 1):
+            for idx, (image_path, bbox) in enumerate(selected_images, 1):
                 print(f"{idx}. {image_path}")
         else:
             print("无可用图片路径。")
+        sampled_images[class_name] = selected_images
+
+    # 导出抽样图片的预览图
+    if preview_dir:
+        census.export_previews(sampled_images, preview_dir, preview_factor, preview_cache_dir)
+
+    # 导出每个类别的抽样拼图
+    if sheet_dir:
+        census.export_contact_sheets(sampled_images, sheet_dir, preview_factor, preview_cache_dir)
 
     # 打印没有标签的视频
     print("\n没有标签文件夹的视频：")
@@ -191,8 +230,15 @@ def main():
     # 设置随机种子以确保可重复性（可选）
     random.seed(42)
 
+    # 抽样图片预览图的输出目录和缓存目录（设为 None 则只打印路径）
+    preview_dir = None
+    preview_cache_dir = None
+    # 每个类别的抽样拼图输出目录（设为 None 则不导出）
+    sheet_dir = None
+
     # 执行检查
-    check_video_labels(video_base_path, label_base_path, cutoff_date)
+    check_video_labels(video_base_path, label_base_path, cutoff_date, preview_dir, 4, preview_cache_dir,
+                       sheet_dir)
 
 
 if __name__ == "__main__":
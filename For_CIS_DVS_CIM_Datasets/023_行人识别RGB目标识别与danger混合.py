@@ -1,6 +1,9 @@
 import os
+import sys
+import importlib.util
 import xml.etree.ElementTree as ET
 import shutil
+from collections import Counter
 import chardet
 
 # 定义路径
@@ -13,13 +16,58 @@ output_base_path = r"D:\数据集转换汇总\行人识别任务种类与danger
 if not os.path.exists(output_base_path):
     os.makedirs(output_base_path)
 
+# danger 框与已有的 danger 框 IOU 超过该值时视为同一个目标，不重复添加
+DANGER_DEDUP_IOU = 0.9
 
-def detect_encoding(file_path):
-    """检测文件编码"""
+
+def load_box_index():
+    """加载同目录下 037 的网格空间索引"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "037_矩形框网格空间索引.py")
+    spec = importlib.util.spec_from_file_location("box_index", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+box_index = load_box_index()
+
+
+# 每个文件夹（同一批标注）检测到的非 UTF-8 编码，同一文件夹后续文件直接沿用
+encoding_cache = {}
+# 各解码路径的使用次数：utf-8 直接解码、沿用文件夹缓存的编码、调用 chardet 检测
+decode_stats = Counter()
+
+
+def read_label_lines(file_path):
+    """
+    读取标签文件的所有行：先按 UTF-8（兼容 ASCII 和带 BOM 的文件）严格解码，
+    失败时沿用同一文件夹之前检测到的编码，仍失败才调用 chardet 检测并缓存结果
+    """
     with open(file_path, 'rb') as f:
-        raw_data = f.read(10000)  # 读取前10000字节以检测编码
-        result = chardet.detect(raw_data)
-        return result['encoding'] or 'utf-8'
+        raw_data = f.read()
+    try:
+        text = raw_data.decode('utf-8-sig')
+        decode_stats['utf-8'] += 1
+        return text.splitlines(keepends=True)
+    except UnicodeDecodeError:
+        pass
+
+    directory = os.path.dirname(file_path)
+    cached = encoding_cache.get(directory)
+    if cached:
+        try:
+            text = raw_data.decode(cached)
+            decode_stats['cached'] += 1
+            return text.splitlines(keepends=True)
+        except (UnicodeDecodeError, LookupError):
+            pass
+
+    encoding = chardet.detect(raw_data[:10000])['encoding'] or 'utf-8'
+    decode_stats['chardet'] += 1
+    text = raw_data.decode(encoding)
+    encoding_cache[directory] = encoding
+    return text.splitlines(keepends=True)
 
 
 def yolo_to_voc(yolo_line, width=3264, height=2448):
@@ -81,10 +129,7 @@ def process_video_folder(video_id):
                 output_evs_file = os.path.join(output_evs_path, evs_file)
 
                 try:
-                    # 检测文件编码
-                    encoding = detect_encoding(input_evs_file)
-                    with open(input_evs_file, 'r', encoding=encoding) as f:
-                        lines = f.readlines()
+                    lines = read_label_lines(input_evs_file)
 
                     with open(output_evs_file, 'w', encoding='utf-8') as f:
                         for line in lines:
@@ -99,7 +144,8 @@ def process_video_folder(video_id):
                     print(f"处理文件 {input_evs_file} 时出错: {e}")
                     continue
 
-    # 处理 APS 文件（转换为 VOC 格式并与 RGB 标签合并）
+    # 处理 APS 文件（转换为 VOC 格式并与 RGB 标签合并，跳过已存在的 danger 框）
+    skipped_duplicates = 0
     if os.path.exists(aps_video_path) and os.path.exists(rgb_video_path):
         for aps_file in os.listdir(aps_video_path):
             if aps_file.endswith(".txt"):
@@ -114,14 +160,23 @@ def process_video_folder(video_id):
                         root = tree.getroot()
 
                         # 读取 YOLO 格式的 APS 文件
-                        encoding = detect_encoding(aps_file_path)
-                        with open(aps_file_path, 'r', encoding=encoding) as f:
-                            yolo_lines = f.readlines()
+                        yolo_lines = read_label_lines(aps_file_path)
+
+                        # 已有的 danger 框登记到网格索引中，用于判断新框是否已经存在
+                        existing = [[int(float(obj.find('bndbox').find(k).text))
+                                     for k in ('xmin', 'ymin', 'xmax', 'ymax')]
+                                    for obj in root.findall('object')
+                                    if obj.find('name').text == 'danger' and obj.find('bndbox') is not None]
+                        danger_index = box_index.BoxGridIndex(existing)
 
                         # 将 YOLO 格式转换为 VOC 格式并添加到 XML
                         for line in yolo_lines:
                             voc_box = yolo_to_voc(line)
                             if voc_box:
+                                if danger_index.contains(voc_box, DANGER_DEDUP_IOU):
+                                    skipped_duplicates += 1
+                                    continue
+                                danger_index.add([voc_box])
                                 xmin, ymin, xmax, ymax = voc_box
                                 danger_obj = create_voc_object(xmin, ymin, xmax, ymax)
                                 root.append(danger_obj)
@@ -136,6 +191,9 @@ def process_video_folder(video_id):
                         print(f"处理文件 {aps_file_path} 时出错: {e}")
                         continue
 
+    if skipped_duplicates:
+        print(f"视频号 {video_id}: 跳过 {skipped_duplicates} 个重复的 danger 框")
+
 
 def main():
     """主函数，遍历所有视频号文件夹"""
@@ -150,6 +208,7 @@ def main():
         print(f"处理视频号: {video_id}")
         process_video_folder(video_id)
 
+    print("标签解码方式统计: " + ', '.join(f"{k} {v}" for k, v in decode_stats.most_common()))
     print("处理完成！")
 
 
@@ -0,0 +1,219 @@
+import os
+import re
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# 参与查重的文件后缀（标签和帧）
+TARGET_SUFFIXES = ('.xml', '.txt', '.csv', '.png', '.raw')
+# 先比较文件头部的字节数，头部相同再计算全文件哈希
+HEAD_BYTES = 64 * 1024
+# 读取全文件时的块大小
+CHUNK_BYTES = 4 * 1024 * 1024
+
+# 匹配形如 filename(1).xml 的副本文件
+copy_pattern = re.compile(r'^(.+?)\s*\(\d+\)(\.[^.]+)$')
+
+
+def scan_files(roots, suffixes):
+    """
+    遍历所有根目录，收集目标文件的路径和大小
+
+    Args:
+        roots: 根目录列表（可以跨任务、跨视频）
+        suffixes: 参与查重的文件后缀
+
+    Returns:
+        list: (路径, 大小, 文件标识) 列表，文件标识为 (设备号, inode)，取不到 inode 时为路径
+    """
+    entries = []
+    for root in roots:
+        if not os.path.exists(root):
+            print(f"警告: 路径 {root} 不存在，跳过")
+            continue
+        stack = [root]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False) and entry.name.lower().endswith(suffixes):
+                            st = entry.stat(follow_symlinks=False)
+                            # Windows 下 DirEntry.stat() 不填 st_ino/st_dev（都为 0），此时按路径区分文件
+                            identity = (st.st_dev, st.st_ino) if st.st_ino else entry.path
+                            entries.append((entry.path, st.st_size, identity))
+            except OSError as e:
+                print(f"读取目录 {current} 时出错: {e}")
+    return entries
+
+
+def group_by_size(entries):
+    """按文件大小分组，只保留可能重复的组（同一 inode 的硬链接只计一次）"""
+    size_groups = defaultdict(dict)
+    for path, size, identity in entries:
+        # 已经是硬链接的文件视为同一份数据，不重复哈希
+        size_groups[size].setdefault(identity, path)
+    return {size: list(group.values()) for size, group in size_groups.items() if len(group) > 1}
+
+
+def hash_file(path, head_only=False):
+    """计算文件哈希；head_only 为 True 时只哈希文件头部"""
+    h = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, 'rb') as f:
+            if head_only:
+                h.update(f.read(HEAD_BYTES))
+            else:
+                for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+                    h.update(chunk)
+    except OSError as e:
+        print(f"读取文件 {path} 时出错: {e}")
+        return None
+    return h.hexdigest()
+
+
+def refine_groups(groups, head_only, size, executor):
+    """对候选组中的文件并行计算哈希，按哈希值继续细分"""
+    refined = []
+    for paths in groups:
+        # 小文件的头部哈希就是全文件哈希，无需再算一遍
+        if not head_only and size <= HEAD_BYTES:
+            refined.append(paths)
+            continue
+        digests = executor.map(lambda p: hash_file(p, head_only), paths)
+        by_digest = defaultdict(list)
+        for path, digest in zip(paths, digests):
+            if digest is not None:
+                by_digest[digest].append(path)
+        refined.extend(g for g in by_digest.values() if len(g) > 1)
+    return refined
+
+
+def find_duplicates(entries, max_workers=8):
+    """
+    查找内容完全相同的文件：先按大小分组，再对候选文件依次比较头部哈希和全文件哈希
+
+    Args:
+        entries: scan_files 返回的文件列表
+        max_workers: 并行哈希的线程数
+
+    Returns:
+        list: 重复文件组，每组为内容相同的路径列表（已排序）
+    """
+    size_groups = group_by_size(entries)
+    candidate_count = sum(len(g) for g in size_groups.values())
+    print(f"大小相同的候选文件: {candidate_count} 个，分为 {len(size_groups)} 组")
+
+    duplicates = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for size, paths in size_groups.items():
+            groups = refine_groups([paths], True, size, executor)
+            groups = refine_groups(groups, False, size, executor)
+            duplicates.extend(sorted(g) for g in groups)
+
+    duplicates.sort(key=lambda g: g[0])
+    return duplicates
+
+
+def find_divergent_copies(entries):
+    """
+    查找形如 filename(1).xml 的副本中，原文件存在但内容不同的情况（这类文件不能直接删除）
+
+    Args:
+        entries: scan_files 返回的文件列表
+
+    Returns:
+        list: (副本路径, 原文件路径) 列表
+    """
+    divergent = []
+    sizes = {path: size for path, size, _ in entries}
+    for path, size, _ in entries:
+        match = copy_pattern.match(os.path.basename(path))
+        if not match:
+            continue
+        original = os.path.join(os.path.dirname(path), match.group(1) + match.group(2))
+        if original not in sizes:
+            continue
+        if sizes[original] != size or hash_file(original) != hash_file(path):
+            divergent.append((path, original))
+    return sorted(divergent)
+
+
+def hardlink_duplicates(duplicates, dry_run=True):
+    """
+    将每组重复文件中除第一个以外的文件替换为指向第一个文件的硬链接
+
+    Args:
+        duplicates: find_duplicates 返回的重复文件组
+        dry_run: 为 True 时只打印，不修改文件
+
+    Returns:
+        int: 可节省（或已节省）的字节数
+    """
+    saved_bytes = 0
+    for group in duplicates:
+        keep = group[0]
+        for path in group[1:]:
+            size = os.path.getsize(path)
+            if dry_run:
+                print(f"[试运行] 将 {path} 替换为指向 {keep} 的硬链接")
+                saved_bytes += size
+                continue
+            tmp_path = path + '.dedup_tmp'
+            try:
+                os.link(keep, tmp_path)
+                # 原子替换，避免中断后丢失文件
+                os.replace(tmp_path, path)
+                saved_bytes += size
+                print(f"已替换为硬链接: {path} -> {keep}")
+            except OSError as e:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                print(f"硬链接替换失败: {path}, 错误: {e}")
+    return saved_bytes
+
+
+def main():
+    # 参与查重的根目录（可以同时包含多个任务的标签和数据路径）
+    roots = [
+        r"D:\数据集转换汇总\原始任务标签整理",
+        r"E:\DatasetFor5Task\FallDetection",
+    ]
+    # 'report' 只输出报告，'hardlink' 将重复文件替换为硬链接
+    action = 'report'
+    dry_run = True
+
+    entries = scan_files(roots, TARGET_SUFFIXES)
+    print(f"共扫描到 {len(entries)} 个文件")
+    duplicates = find_duplicates(entries)
+
+    print("\n=== 内容相同的文件组 ===")
+    if duplicates:
+        wasted = 0
+        for idx, group in enumerate(duplicates, 1):
+            size = os.path.getsize(group[0])
+            wasted += size * (len(group) - 1)
+            print(f"\n第 {idx} 组（{len(group)} 个文件，每个 {size} 字节）：")
+            for path in group:
+                print(f"  - {path}")
+        print(f"\n共 {len(duplicates)} 组重复文件，可节省 {wasted / 1024 ** 2:.2f} MB")
+    else:
+        print("未找到内容相同的文件。")
+
+    print("\n=== 名称为 (n) 副本但内容与原文件不同的文件 ===")
+    divergent = find_divergent_copies(entries)
+    if divergent:
+        for copy_path, original in divergent:
+            print(f"- {copy_path}（原文件: {original}）")
+    else:
+        print("无")
+
+    if action == 'hardlink' and duplicates:
+        saved = hardlink_duplicates(duplicates, dry_run=dry_run)
+        print(f"\n硬链接去重{'（试运行）' if dry_run else ''}共节省 {saved / 1024 ** 2:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import os
+import re
+import json
+import time
+
+# 目录缓存文件，保存每个任务、每个视频的统计结果
+CATALOG_PATH = r"D:\数据集转换汇总\dataset_catalog.json"
+
+# 每个视频号下各模态帧文件夹的位置：模态名 -> (相机文件夹, 帧文件夹名, 帧文件后缀)
+MODALITIES = {
+    'aps_png': ('APS', 'aps_png', '.png'),
+    'aps_raw': ('APS', 'aps_raw', '.raw'),
+    'evs_png': ('EVS', 'evs_png', '.png'),
+    'evs_raw': ('EVS', 'evs_raw', '.raw'),
+}
+
+# 标签文件夹中的子目录与对应的帧模态
+LABEL_MODALITIES = {'aps': 'aps_png', 'evs': 'evs_png'}
+LABEL_SUFFIXES = ('.xml', '.txt')
+
+frame_pattern = re.compile(r'_(\d+)\.[^.]+$')
+
+
+def frame_number(filename):
+    """从文件名中提取帧编号，例如 816_612_8_0000000012.png -> 12"""
+    match = frame_pattern.search(filename)
+    return int(match.group(1)) if match else None
+
+
+def dir_mtime(path):
+    """返回目录的修改时间，不存在时返回 None"""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def find_frame_dirs(video_dir):
+    """
+    查找视频号文件夹下各模态的帧文件夹
+
+    Returns:
+        dict: 模态名 -> 帧文件夹路径
+    """
+    frame_dirs = {}
+    for modality, (camera, folder, _) in MODALITIES.items():
+        camera_dir = os.path.join(video_dir, camera)
+        if not os.path.isdir(camera_dir):
+            continue
+        # 相机文件夹下为 quadbayer_10bit_3264_2448_{id} 或 normal_v2_816_612_{id}
+        for sub in sorted(os.listdir(camera_dir)):
+            candidate = os.path.join(camera_dir, sub, folder)
+            if os.path.isdir(candidate):
+                frame_dirs[modality] = candidate
+                break
+    return frame_dirs
+
+
+def video_signature(video_dir, label_dir):
+    """
+    计算视频的目录签名：视频号文件夹、各帧文件夹和标签文件夹的修改时间
+    只要其中有文件被新增、删除或重命名，对应目录的 mtime 就会变化
+    """
+    paths = [video_dir]
+    for camera in ('APS', 'EVS'):
+        paths.append(os.path.join(video_dir, camera))
+    paths.extend(find_frame_dirs(video_dir).values())
+    if label_dir:
+        paths.append(label_dir)
+        paths.extend(os.path.join(label_dir, sub) for sub in LABEL_MODALITIES)
+    return {p: dir_mtime(p) for p in paths}
+
+
+def scan_frames(frame_dir, suffix):
+    """统计单个帧文件夹：帧数、首帧、末帧、总字节数，并返回帧编号集合"""
+    frames = set()
+    total_bytes = 0
+    with os.scandir(frame_dir) as it:
+        for entry in it:
+            if entry.name.endswith(suffix) and entry.is_file():
+                number = frame_number(entry.name)
+                if number is None:
+                    continue
+                frames.add(number)
+                total_bytes += entry.stat().st_size
+    stats = {
+        'frame_count': len(frames),
+        'first_frame': min(frames) if frames else None,
+        'last_frame': max(frames) if frames else None,
+        'total_bytes': total_bytes,
+    }
+    return stats, frames
+
+
+def scan_labels(label_dir):
+    """统计标签文件夹中 aps/evs 的已标注帧编号"""
+    labelled = {}
+    if not label_dir or not os.path.isdir(label_dir):
+        return labelled
+    for sub in LABEL_MODALITIES:
+        sub_dir = os.path.join(label_dir, sub)
+        if not os.path.isdir(sub_dir):
+            continue
+        numbers = {frame_number(f) for f in os.listdir(sub_dir) if f.endswith(LABEL_SUFFIXES)}
+        numbers.discard(None)
+        labelled[sub] = numbers
+    return labelled
+
+
+def scan_video(video_dir, label_dir):
+    """扫描一个视频号，返回各模态统计和标签覆盖率"""
+    modalities = {}
+    frames_by_modality = {}
+    for modality, frame_dir in find_frame_dirs(video_dir).items():
+        suffix = MODALITIES[modality][2]
+        modalities[modality], frames_by_modality[modality] = scan_frames(frame_dir, suffix)
+
+    labels = {}
+    for sub, numbers in scan_labels(label_dir).items():
+        frames = frames_by_modality.get(LABEL_MODALITIES[sub], set())
+        covered = len(numbers & frames)
+        labels[sub] = {
+            'label_count': len(numbers),
+            'covered_frames': covered,
+            'coverage': covered / len(frames) if frames else 0.0,
+        }
+    return {'modalities': modalities, 'labels': labels}
+
+
+def load_catalog(catalog_path):
+    """读取目录缓存文件，不存在或损坏时返回空目录"""
+    if not os.path.exists(catalog_path):
+        return {}
+    try:
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取目录缓存 {catalog_path} 时出错，将重新生成: {e}")
+        return {}
+
+
+def save_catalog(catalog, catalog_path):
+    """先写临时文件再替换，避免中断时缓存损坏"""
+    os.makedirs(os.path.dirname(catalog_path) or '.', exist_ok=True)
+    tmp_path = catalog_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, catalog_path)
+
+
+def refresh_catalog(catalog, tasks):
+    """
+    更新目录：只重新扫描目录签名发生变化的视频，删除已不存在的视频
+
+    Args:
+        catalog: 已加载的目录
+        tasks: 任务名 -> {'data': 数据路径, 'label': 标签路径或 None}
+
+    Returns:
+        tuple: (重新扫描的视频数, 使用缓存的视频数)
+    """
+    rescanned = 0
+    cached = 0
+    for task, roots in tasks.items():
+        data_root = roots['data']
+        label_root = roots.get('label')
+        if not os.path.isdir(data_root):
+            print(f"警告: 任务 {task} 的数据路径 {data_root} 不存在")
+            continue
+
+        task_entry = catalog.setdefault(task, {'videos': {}})
+        task_entry['data'] = data_root
+        task_entry['label'] = label_root
+        videos = task_entry['videos']
+
+        video_ids = sorted(d for d in os.listdir(data_root) if os.path.isdir(os.path.join(data_root, d)))
+        for video_id in video_ids:
+            video_dir = os.path.join(data_root, video_id)
+            label_dir = os.path.join(label_root, video_id) if label_root else None
+            signature = video_signature(video_dir, label_dir)
+
+            old = videos.get(video_id)
+            if old is not None and old.get('signature') == signature:
+                cached += 1
+                continue
+
+            entry = scan_video(video_dir, label_dir)
+            entry['signature'] = signature
+            videos[video_id] = entry
+            rescanned += 1
+
+        # 数据中已删除的视频从目录中移除
+        for video_id in set(videos) - set(video_ids):
+            del videos[video_id]
+    return rescanned, cached
+
+
+def query_frames(catalog, task, modality):
+    """查询某个任务某个模态的总帧数和总字节数，例如 ('FatigueDetection/yawn', 'evs_png')"""
+    frame_count = 0
+    total_bytes = 0
+    for entry in catalog.get(task, {}).get('videos', {}).values():
+        stats = entry['modalities'].get(modality)
+        if stats:
+            frame_count += stats['frame_count']
+            total_bytes += stats['total_bytes']
+    return frame_count, total_bytes
+
+
+def print_summary(catalog):
+    """按任务和模态打印汇总统计"""
+    print("\n=== 数据集目录汇总 ===")
+    for task in sorted(catalog):
+        videos = catalog[task]['videos']
+        print(f"\n任务: {task}（{len(videos)} 个视频）")
+        for modality in MODALITIES:
+            frame_count, total_bytes = query_frames(catalog, task, modality)
+            if frame_count:
+                print(f"  {modality}: {frame_count} 帧, {total_bytes / 1024 ** 3:.2f} GB")
+        for sub in LABEL_MODALITIES:
+            stats = [v['labels'][sub] for v in videos.values() if sub in v['labels']]
+            if stats:
+                covered = sum(s['covered_frames'] for s in stats)
+                frames = sum(v['modalities'].get(LABEL_MODALITIES[sub], {}).get('frame_count', 0)
+                             for v in videos.values() if sub in v['labels'])
+                ratio = covered / frames if frames else 0.0
+                print(f"  {sub} 标签: {len(stats)} 个视频有标签, 覆盖 {covered}/{frames} 帧 ({ratio:.1%})")
+
+
+def main():
+    data_base = r"E:\五大任务数据集"
+    label_base = r"D:\数据集转换汇总\原始任务标签整理"
+
+    # 任务名 -> 数据路径和标签路径（没有 aps/evs 标签的任务填 None）
+    tasks = {
+        "FallDetection": {'data': os.path.join(data_base, "FallDetection"),
+                          'label': os.path.join(label_base, "跌倒")},
+        "FatigueDetection/blink": {'data': os.path.join(data_base, "FatigueDetection", "blink"), 'label': None},
+        "FatigueDetection/normal": {'data': os.path.join(data_base, "FatigueDetection", "normal"), 'label': None},
+        "FatigueDetection/rubeyes": {'data': os.path.join(data_base, "FatigueDetection", "rubeyes"), 'label': None},
+        "FatigueDetection/yawn": {'data': os.path.join(data_base, "FatigueDetection", "yawn"), 'label': None},
+        "FatigueDetection/yawnandblink": {'data': os.path.join(data_base, "FatigueDetection", "yawnandblink"),
+                                          'label': None},
+        "High-AltitudeThrowing": {'data': os.path.join(data_base, "High-AltitudeThrowing"),
+                                  'label': os.path.join(label_base, "高空抛物")},
+        "PedestrianDetection": {'data': os.path.join(data_base, "PedestrianDetection"),
+                                'label': os.path.join(label_base, "行人识别")},
+        "RemoteSensing/person": {'data': os.path.join(data_base, "RemoteSensing", "person"), 'label': None},
+        "RemoteSensing/vehicle": {'data': os.path.join(data_base, "RemoteSensing", "vehicle"), 'label': None},
+    }
+
+    start = time.time()
+    catalog = load_catalog(CATALOG_PATH)
+    rescanned, cached = refresh_catalog(catalog, tasks)
+    save_catalog(catalog, CATALOG_PATH)
+    print(f"目录更新完成: 重新扫描 {rescanned} 个视频, 使用缓存 {cached} 个视频, 耗时 {time.time() - start:.1f} 秒")
+
+    print_summary(catalog)
+
+    # 示例查询：疲劳检测 yawn 类别共有多少 EVS 帧
+    frame_count, total_bytes = query_frames(catalog, "FatigueDetection/yawn", 'evs_png')
+    print(f"\nFatigueDetection/yawn 的 EVS 帧数: {frame_count}（{total_bytes / 1024 ** 3:.2f} GB）")
+
+
+if __name__ == "__main__":
+    main()
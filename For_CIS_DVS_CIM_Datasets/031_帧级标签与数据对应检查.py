@@ -0,0 +1,302 @@
+import os
+import re
+import csv
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+# 打包键的位布局：video_idx(高位) | modality(1 位) | frame(32 位)
+FRAME_BITS = 32
+MODALITY_SHIFT = FRAME_BITS
+VIDEO_SHIFT = FRAME_BITS + 1
+FRAME_MASK = (1 << FRAME_BITS) - 1
+
+MODALITY_NAMES = ['aps', 'evs']
+MODALITY_INDEX = {name: idx for idx, name in enumerate(MODALITY_NAMES)}
+
+# 数据本体中各模态的帧文件夹：模态 -> (相机文件夹, 帧文件夹名)
+DATA_FRAME_DIRS = {'aps': ('APS', 'aps_png'), 'evs': ('EVS', 'evs_png')}
+
+# 没有 aps/evs 子文件夹时，根据文件名前缀判断模态
+FILENAME_MODALITY = {'3264_2448': 'aps', '816_612': 'evs'}
+
+# head CSV 中可能表示帧的列名
+CSV_FRAME_COLUMNS = ('frame', 'frame_id', 'frame_number', 'filename', 'image', 'image_name')
+
+frame_pattern = re.compile(r'(\d+)(?:\.[^.\d]+)?$')
+
+
+def frame_number(name):
+    """从文件名或字段值中提取帧编号（取最后一段数字）"""
+    match = frame_pattern.search(name.strip())
+    return int(match.group(1)) if match else None
+
+
+def modality_from_filename(filename, default=None):
+    """根据文件名前缀（3264_2448 / 816_612）判断模态"""
+    for prefix, modality in FILENAME_MODALITY.items():
+        if filename.startswith(prefix):
+            return modality
+    return default
+
+
+def pack_keys(video_idx, modality_idx, frames):
+    """将 (视频, 模态, 帧) 打包为 int64 键数组"""
+    frames = np.asarray(frames, dtype=np.int64)
+    return (np.int64(video_idx) << VIDEO_SHIFT) | (np.int64(modality_idx) << MODALITY_SHIFT) | frames
+
+
+def unpack_keys(keys):
+    """将打包的键拆回 (视频索引, 模态索引, 帧编号) 三个数组"""
+    keys = np.asarray(keys, dtype=np.int64)
+    return keys >> VIDEO_SHIFT, (keys >> MODALITY_SHIFT) & 1, keys & FRAME_MASK
+
+
+def list_data_frames(video_dir):
+    """列出一个视频号下 aps/evs 帧文件夹中的帧编号，返回 {模态: [帧编号]}"""
+    frames = {}
+    for modality, (camera, folder) in DATA_FRAME_DIRS.items():
+        camera_dir = os.path.join(video_dir, camera)
+        if not os.path.isdir(camera_dir):
+            continue
+        numbers = []
+        for sub in os.listdir(camera_dir):
+            frame_dir = os.path.join(camera_dir, sub, folder)
+            if os.path.isdir(frame_dir):
+                numbers.extend(frame_number(f) for f in os.listdir(frame_dir) if f.endswith('.png'))
+        frames[modality] = [n for n in numbers if n is not None]
+    return frames
+
+
+def list_label_files(video_label_dir, suffix):
+    """
+    列出 aps/evs XML 或 YOLO txt 标签的帧编号，兼容两种布局：
+    <视频号>/aps|evs/*.xml 以及 <视频号>/*.xml（由文件名前缀判断模态）
+    """
+    frames = {name: [] for name in MODALITY_NAMES}
+    for root, _, files in os.walk(video_label_dir):
+        sub = os.path.basename(root).lower()
+        for f in files:
+            if not f.endswith(suffix):
+                continue
+            modality = sub if sub in MODALITY_INDEX else modality_from_filename(f)
+            number = frame_number(f)
+            if modality is not None and number is not None:
+                frames[modality].append(number)
+    return frames
+
+
+def list_head_csv(csv_path, default_modality='aps'):
+    """读取遥感 head CSV，按帧列（或第一列）提取被标注的帧编号"""
+    frames = {name: [] for name in MODALITY_NAMES}
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return frames
+        lowered = [h.strip().lower() for h in header]
+        column = next((lowered.index(c) for c in CSV_FRAME_COLUMNS if c in lowered), None)
+        rows = reader
+        if column is None:
+            # 没有表头时第一行本身就是数据
+            column = 0
+            rows = [header] + list(reader)
+        for row in rows:
+            if len(row) <= column:
+                continue
+            value = row[column]
+            number = frame_number(value)
+            if number is not None:
+                frames[modality_from_filename(os.path.basename(value), default_modality)].append(number)
+    return frames
+
+
+def collect_labels(label_root, layout):
+    """
+    收集一个任务的所有标签帧
+
+    Args:
+        label_root: 标签根路径
+        layout: 'voc'（aps/evs XML）、'yolo'（txt）或 'csv'（遥感 head CSV，每个视频一个文件）
+
+    Returns:
+        dict: 视频号 -> {模态: [帧编号]}
+    """
+    labels = {}
+    if not os.path.isdir(label_root):
+        print(f"警告: 标签路径 {label_root} 不存在")
+        return labels
+    if layout == 'csv':
+        for f in os.listdir(label_root):
+            if f.endswith('.csv'):
+                labels[os.path.splitext(f)[0]] = list_head_csv(os.path.join(label_root, f))
+        return labels
+
+    suffix = '.xml' if layout == 'voc' else '.txt'
+    video_ids = [d for d in os.listdir(label_root) if os.path.isdir(os.path.join(label_root, d))]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = executor.map(lambda v: list_label_files(os.path.join(label_root, v), suffix), video_ids)
+        for video_id, frames in zip(video_ids, results):
+            labels[video_id] = frames
+    return labels
+
+
+def collect_data(data_root):
+    """收集一个任务所有视频的帧编号，返回 视频号 -> {模态: [帧编号]}"""
+    if not os.path.isdir(data_root):
+        print(f"警告: 数据路径 {data_root} 不存在")
+        return {}
+    video_ids = [d for d in os.listdir(data_root) if os.path.isdir(os.path.join(data_root, d))]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = executor.map(lambda v: list_data_frames(os.path.join(data_root, v)), video_ids)
+        return dict(zip(video_ids, results))
+
+
+def build_keys(frames_by_video, video_index):
+    """将 视频号 -> {模态: [帧编号]} 转为排序去重后的打包键数组"""
+    parts = [np.empty(0, dtype=np.int64)]
+    for video_id, frames in frames_by_video.items():
+        for modality, numbers in frames.items():
+            if numbers:
+                parts.append(pack_keys(video_index[video_id], MODALITY_INDEX[modality], numbers))
+    return np.unique(np.concatenate(parts))
+
+
+def compare_task(data_frames, label_frames):
+    """
+    对一个任务做帧级对应检查
+
+    Returns:
+        dict: video_ids, labels_without_frames, frames_without_labels, coverage
+    """
+    video_ids = sorted(set(data_frames) | set(label_frames))
+    video_index = {v: i for i, v in enumerate(video_ids)}
+
+    data_keys = build_keys(data_frames, video_index)
+    label_keys = build_keys(label_frames, video_index)
+
+    labels_without_frames = np.setdiff1d(label_keys, data_keys, assume_unique=True)
+    frames_without_labels = np.setdiff1d(data_keys, label_keys, assume_unique=True)
+    matched = np.intersect1d(data_keys, label_keys, assume_unique=True)
+
+    # 以 (视频, 模态) 为分组统计每组的帧数和已标注帧数
+    n_groups = len(video_ids) * len(MODALITY_NAMES)
+    frame_counts = np.bincount(data_keys >> MODALITY_SHIFT, minlength=n_groups)
+    matched_counts = np.bincount(matched >> MODALITY_SHIFT, minlength=n_groups)
+    coverage = np.where(frame_counts > 0, matched_counts / np.maximum(frame_counts, 1), np.nan)
+
+    return {
+        'video_ids': video_ids,
+        'labels_without_frames': labels_without_frames,
+        'frames_without_labels': frames_without_labels,
+        'frame_counts': frame_counts.reshape(-1, len(MODALITY_NAMES)),
+        'matched_counts': matched_counts.reshape(-1, len(MODALITY_NAMES)),
+        'coverage': coverage.reshape(-1, len(MODALITY_NAMES)),
+    }
+
+
+def find_consecutive_ranges(numbers):
+    """将有序帧编号数组整理为连续范围，如 [45, 46, 47, 50] -> ['45-47', '50']"""
+    if len(numbers) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(numbers) != 1)
+    starts = np.concatenate(([numbers[0]], numbers[breaks + 1]))
+    ends = np.concatenate((numbers[breaks], [numbers[-1]]))
+    return [str(s) if s == e else f"{s}-{e}" for s, e in zip(starts, ends)]
+
+
+def group_missing(keys, video_ids):
+    """将缺失的打包键按 (视频号, 模态) 分组为帧范围"""
+    grouped = {}
+    if len(keys) == 0:
+        return grouped
+    video_idx, modality_idx, frames = unpack_keys(keys)
+    group = keys >> MODALITY_SHIFT
+    boundaries = np.flatnonzero(np.diff(group)) + 1
+    for start, end in zip(np.concatenate(([0], boundaries)), np.concatenate((boundaries, [len(keys)]))):
+        name = (video_ids[video_idx[start]], MODALITY_NAMES[modality_idx[start]])
+        grouped[name] = frames[start:end]
+    return grouped
+
+
+def print_report(task, result, min_coverage):
+    """打印单个任务的检查结果"""
+    video_ids = result['video_ids']
+    print(f"\n=== 任务: {task} ===")
+
+    print("\n有标签但没有对应帧的标签：")
+    missing = group_missing(result['labels_without_frames'], video_ids)
+    if missing:
+        for (video_id, modality), frames in sorted(missing.items()):
+            print(f"- {video_id}/{modality}: {len(frames)} 个，帧 {', '.join(find_consecutive_ranges(frames))}")
+    else:
+        print("无")
+
+    print(f"\n标签覆盖率低于 {min_coverage:.0%} 的视频（仅统计有标签的视频）：")
+    low = []
+    for i, video_id in enumerate(video_ids):
+        for m, modality in enumerate(MODALITY_NAMES):
+            frames = result['frame_counts'][i, m]
+            matched = result['matched_counts'][i, m]
+            if frames and matched and result['coverage'][i, m] < min_coverage:
+                low.append((result['coverage'][i, m], video_id, modality, matched, frames))
+    if low:
+        for ratio, video_id, modality, matched, frames in sorted(low):
+            print(f"- {video_id}/{modality}: {matched}/{frames} 帧 ({ratio:.1%})")
+    else:
+        print("无")
+
+    video_index = {v: i for i, v in enumerate(video_ids)}
+    unlabelled = group_missing(result['frames_without_labels'], video_ids)
+    no_label_videos = [name for name, frames in unlabelled.items()
+                       if len(frames) == result['frame_counts'][video_index[name[0]], MODALITY_INDEX[name[1]]]]
+    print(f"\n没有任何标签的视频/模态: {len(no_label_videos)} 个")
+    for video_id, modality in sorted(no_label_videos):
+        print(f"- {video_id}/{modality}")
+
+    total_frames = int(result['frame_counts'].sum())
+    total_matched = int(result['matched_counts'].sum())
+    print(f"\n汇总: 共 {total_frames} 帧，已标注 {total_matched} 帧，"
+          f"未标注 {len(result['frames_without_labels'])} 帧，无帧标签 {len(result['labels_without_frames'])} 个")
+
+
+def main():
+    data_base = r"E:\DatasetFor5Task"
+    label_base = r"D:\数据集转换汇总\标签专用文件夹\标签整理2\0整理"
+
+    # 任务名 -> (数据路径, [(标签路径, 标签布局)])
+    tasks = {
+        "FallDetection": (os.path.join(data_base, "FallDetection"),
+                          [(os.path.join(label_base, "跌倒"), 'voc')]),
+        "PedestrianDetection": (os.path.join(data_base, "PedestrianDetection"),
+                                [(os.path.join(label_base, "行人识别"), 'yolo')]),
+        "High-AltitudeThrowing": (os.path.join(data_base, "High-AltitudeThrowing"),
+                                  [(os.path.join(label_base, "高空抛物"), 'yolo')]),
+        # 遥感数据按 person/vehicle 分两个文件夹存放（见 019/030），分别与对应的标签来源比较
+        "RemoteSensing/person": (os.path.join(data_base, "RemoteSensing", "person"),
+                                 [(os.path.join(label_base, "遥感", "head"), 'csv')]),
+        "RemoteSensing/vehicle": (os.path.join(data_base, "RemoteSensing", "vehicle"),
+                                  [(os.path.join(label_base, "遥感", "vehicle"), 'voc')]),
+    }
+    # 覆盖率低于该值的视频会被列出
+    min_coverage = 0.5
+
+    for task, (data_root, label_sources) in tasks.items():
+        start = time.time()
+        data_frames = collect_data(data_root)
+
+        # 合并同一任务的多个标签来源
+        label_frames = {}
+        for label_root, layout in label_sources:
+            for video_id, frames in collect_labels(label_root, layout).items():
+                merged = label_frames.setdefault(video_id, {name: [] for name in MODALITY_NAMES})
+                for modality, numbers in frames.items():
+                    merged[modality].extend(numbers)
+
+        result = compare_task(data_frames, label_frames)
+        print_report(task, result, min_coverage)
+        print(f"耗时 {time.time() - start:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
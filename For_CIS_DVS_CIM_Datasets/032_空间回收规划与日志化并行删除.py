@@ -0,0 +1,207 @@
+import os
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def get_reclaimable_files(video_id, base_path):
+    """
+    列出一个视频号下可回收的文件（与 006 中删除的文件相同）：
+    ApsEvsInfo.txt、DeviceCfg.txt 以及 APS/EVS 下的 .bin 原始数据
+    """
+    return [
+        os.path.join(base_path, "ApsEvsInfo.txt"),
+        os.path.join(base_path, "DeviceCfg.txt"),
+        os.path.join(base_path, "APS", f"quadbayer_10bit_3264_2448_{video_id}.bin"),
+        os.path.join(base_path, "EVS", f"normal_v2_816_612_{video_id}.bin"),
+    ]
+
+
+def is_verified(bin_path, size):
+    """检查 033 写下的校验记录：必须通过校验，且 bin 的大小和修改时间与校验时一致"""
+    record_path = bin_path + ".verified.json"
+    try:
+        with open(record_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (record.get('status') == 'pass' and record.get('bin_size') == size
+            and record.get('bin_mtime') == os.path.getmtime(bin_path))
+
+
+def take_snapshot(root_path, folder_list, require_verified=True):
+    """
+    扫描指定任务文件夹，记录每个可回收文件的大小
+
+    Args:
+        root_path: 根路径
+        folder_list: 要检查的任务文件夹列表
+        require_verified: 为 True 时，.bin 文件必须先通过 033 的校验才会加入删除计划
+
+    Returns:
+        tuple: (快照列表，每项为 {'task', 'video', 'path', 'size'}; 未通过校验而跳过的 .bin 列表)
+    """
+    snapshot = []
+    unverified = []
+    for folder in folder_list:
+        folder_path = os.path.join(root_path, folder)
+        if not os.path.exists(folder_path):
+            print(f"错误: 文件夹 {folder_path} 不存在")
+            continue
+        for video_id in sorted(os.listdir(folder_path)):
+            video_path = os.path.join(folder_path, video_id)
+            if not os.path.isdir(video_path):
+                continue
+            for file_path in get_reclaimable_files(video_id, video_path):
+                try:
+                    size = os.path.getsize(file_path)
+                except OSError:
+                    continue
+                if require_verified and file_path.endswith('.bin') and not is_verified(file_path, size):
+                    unverified.append(file_path)
+                    continue
+                snapshot.append({'task': folder, 'video': video_id, 'path': file_path, 'size': size})
+    return snapshot, unverified
+
+
+def print_plan(snapshot):
+    """按任务和视频号汇总可回收的字节数"""
+    per_task = defaultdict(int)
+    per_video = defaultdict(int)
+    for item in snapshot:
+        per_task[item['task']] += item['size']
+        per_video[(item['task'], item['video'])] += item['size']
+
+    print("\n=== 可回收空间（按任务） ===")
+    for task in sorted(per_task):
+        print(f"{task}: {per_task[task] / 1024 ** 3:.2f} GB")
+
+    print("\n=== 可回收空间（按视频号，从大到小） ===")
+    for (task, video), size in sorted(per_video.items(), key=lambda kv: kv[1], reverse=True):
+        print(f"{task}/{video}: {size / 1024 ** 3:.2f} GB")
+
+    total = sum(per_task.values())
+    print(f"\n共 {len(snapshot)} 个文件，合计 {total / 1024 ** 3:.2f} GB")
+
+
+def append_journal(journal, record):
+    """向日志追加一条记录并立即落盘，保证中断后可以恢复"""
+    journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+def write_plan(journal_path, snapshot):
+    """将删除计划写入新的日志文件"""
+    with open(journal_path, 'w', encoding='utf-8') as journal:
+        append_journal(journal, {'type': 'header', 'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                                 'files': len(snapshot)})
+        for item in snapshot:
+            append_journal(journal, dict(item, type='plan'))
+
+
+def read_journal(journal_path):
+    """
+    读取日志，返回尚未完成的计划项（已完成或已跳过的不再执行，失败的会重试）
+    日志最后一行可能因中断而不完整，直接忽略
+    """
+    planned = {}
+    finished = set()
+    with open(journal_path, 'r', encoding='utf-8') as journal:
+        for line in journal:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record['type'] == 'plan':
+                planned[record['path']] = record
+            elif record['type'] in ('done', 'skipped'):
+                finished.add(record['path'])
+    return [item for path, item in planned.items() if path not in finished]
+
+
+def delete_one(item):
+    """删除单个文件；文件大小与快照不一致时跳过，文件已不存在时视为已完成"""
+    path = item['path']
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        # 上次运行可能已经删除但未来得及写日志
+        return {'type': 'done', 'path': path, 'size': 0}
+    if size != item['size']:
+        return {'type': 'skipped', 'path': path, 'reason': f"文件大小已变化: {item['size']} -> {size}"}
+    try:
+        os.remove(path)
+    except OSError as e:
+        return {'type': 'failed', 'path': path, 'error': str(e)}
+    return {'type': 'done', 'path': path, 'size': size}
+
+
+def run_journal(journal_path, max_workers=8):
+    """
+    按日志并行执行删除，每完成一个文件就写入日志
+
+    Returns:
+        tuple: (删除的文件数, 释放的字节数, 失败或跳过的文件数)
+    """
+    pending = read_journal(journal_path)
+    print(f"日志中待删除的文件: {len(pending)} 个")
+
+    deleted = 0
+    freed = 0
+    problems = 0
+    with open(journal_path, 'a', encoding='utf-8') as journal, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # 上次中断时最后一行可能没写完，先补一个换行，避免与新记录粘连
+        if journal.tell() > 0:
+            with open(journal_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    journal.write("\n")
+        futures = [executor.submit(delete_one, item) for item in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            append_journal(journal, result)
+            if result['type'] == 'done':
+                deleted += 1
+                freed += result['size']
+                print(f"已删除: {result['path']}")
+            else:
+                problems += 1
+                print(f"未删除: {result['path']}, 原因: {result.get('reason') or result.get('error')}")
+    return deleted, freed, problems
+
+
+def main():
+    root_path = r"D:\数据集转换汇总"
+    folders_to_check = ["高空抛物-易华录", "高空抛物-教师公寓"]  # 用户可以修改
+    journal_path = os.path.join(root_path, "reclaim_journal.jsonl")
+
+    # 'dry-run' 只统计并生成删除计划，'commit' 按日志执行删除（中断后再次运行会从日志继续）
+    mode = 'dry-run'
+    max_workers = 8
+    # .bin 必须先用 033 校验通过才会被删除
+    require_verified = True
+
+    if mode == 'dry-run' or not os.path.exists(journal_path):
+        snapshot, unverified = take_snapshot(root_path, folders_to_check, require_verified)
+        print_plan(snapshot)
+        if unverified:
+            print(f"\n以下 {len(unverified)} 个 bin 文件没有通过 033 的校验（或校验后被修改），不会删除：")
+            for path in unverified:
+                print(f"  {path}")
+        write_plan(journal_path, snapshot)
+        print(f"\n删除计划已写入: {journal_path}")
+
+    if mode == 'commit':
+        start = time.time()
+        deleted, freed, problems = run_journal(journal_path, max_workers)
+        print(f"\n删除完成: {deleted} 个文件, 释放 {freed / 1024 ** 3:.2f} GB, "
+              f"{problems} 个文件未删除, 耗时 {time.time() - start:.1f} 秒")
+    else:
+        print("试运行模式，未删除任何文件（将 mode 改为 'commit' 后执行删除）")
+
+
+if __name__ == "__main__":
+    main()
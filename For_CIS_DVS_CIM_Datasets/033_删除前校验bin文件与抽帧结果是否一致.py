@@ -0,0 +1,195 @@
+import os
+import re
+import json
+import mmap
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# .bin 文件头和每帧记录头的字节数（当前设备导出的 .bin 为纯帧数据拼接，均为 0）
+FILE_HEADER_BYTES = 0
+RECORD_HEADER_BYTES = 0
+
+# 校验结果写在 .bin 旁边，032 删除前会检查该文件
+VERIFIED_SUFFIX = ".verified.json"
+
+frame_pattern = re.compile(r'_(\d+)\.raw$')
+
+
+def get_bin_jobs(video_id, video_path):
+    """
+    返回一个视频号下需要校验的 (.bin 路径, 抽帧 raw 文件夹) 列表，目录结构与 006 一致
+    """
+    return [
+        (os.path.join(video_path, "APS", f"quadbayer_10bit_3264_2448_{video_id}.bin"),
+         os.path.join(video_path, "APS", f"quadbayer_10bit_3264_2448_{video_id}", "aps_raw")),
+        (os.path.join(video_path, "EVS", f"normal_v2_816_612_{video_id}.bin"),
+         os.path.join(video_path, "EVS", f"normal_v2_816_612_{video_id}", "evs_raw")),
+    ]
+
+
+def list_raw_frames(raw_dir):
+    """列出 raw 文件夹中的帧文件，按帧编号排序，返回 [(帧编号, 路径)]"""
+    frames = []
+    for f in os.listdir(raw_dir):
+        match = frame_pattern.search(f)
+        if match:
+            frames.append((int(match.group(1)), os.path.join(raw_dir, f)))
+    frames.sort()
+    return frames
+
+
+def digest(data):
+    """计算一段字节的哈希"""
+    return hashlib.blake2b(data, digest_size=20).digest()
+
+
+def verify_bin(bin_path, raw_dir, method='bytes'):
+    """
+    将 .bin 内存映射后按帧长度切片，逐帧与抽出的 raw 文件比较
+
+    Args:
+        bin_path: .bin 文件路径
+        raw_dir: 抽帧得到的 aps_raw/evs_raw 文件夹
+        method: 'bytes' 直接比较内存（零拷贝切片），'hash' 比较两边的哈希
+
+    Returns:
+        dict: 校验结果，status 为 'pass' 或 'fail'
+    """
+    result = {'bin': bin_path, 'raw_dir': raw_dir, 'status': 'fail', 'frames': 0, 'mismatched': [], 'error': None}
+    if not os.path.exists(bin_path):
+        result['error'] = "bin 文件不存在"
+        return result
+    if not os.path.isdir(raw_dir):
+        result['error'] = "raw 文件夹不存在"
+        return result
+
+    frames = list_raw_frames(raw_dir)
+    if not frames:
+        result['error'] = "raw 文件夹中没有帧文件"
+        return result
+
+    # 帧编号必须连续，否则无法与 .bin 中的记录一一对应
+    numbers = [n for n, _ in frames]
+    if numbers[-1] - numbers[0] + 1 != len(numbers):
+        result['error'] = f"raw 帧编号不连续: {numbers[0]}-{numbers[-1]} 只有 {len(numbers)} 帧"
+        return result
+
+    record_size = os.path.getsize(frames[0][1])
+    stride = RECORD_HEADER_BYTES + record_size
+    st = os.stat(bin_path)
+    result['bin_size'] = st.st_size
+    result['bin_mtime'] = st.st_mtime
+    result['frames'] = len(frames)
+
+    bin_frames, remainder = divmod(st.st_size - FILE_HEADER_BYTES, stride)
+    if remainder or bin_frames != len(frames):
+        result['error'] = (f"bin 大小 {st.st_size} 与帧数不符: bin 中约 {bin_frames} 帧"
+                           f"（余 {remainder} 字节），raw 文件夹中 {len(frames)} 帧，每帧 {record_size} 字节")
+        return result
+
+    with open(bin_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        view = memoryview(mm)
+        try:
+            for i, (number, raw_path) in enumerate(frames):
+                offset = FILE_HEADER_BYTES + i * stride + RECORD_HEADER_BYTES
+                record = view[offset:offset + record_size]
+                with open(raw_path, 'rb') as raw_file:
+                    raw = raw_file.read()
+                if method == 'hash':
+                    same = digest(record) == digest(raw)
+                else:
+                    same = len(raw) == record_size and record == raw
+                record.release()
+                if not same:
+                    result['mismatched'].append(number)
+        finally:
+            view.release()
+
+    if result['mismatched']:
+        result['error'] = f"{len(result['mismatched'])} 帧内容与 bin 不一致"
+    else:
+        result['status'] = 'pass'
+    return result
+
+
+def write_verified_record(result):
+    """将校验结果写到 .bin 旁边的 .verified.json 文件"""
+    if 'bin_size' not in result:
+        return
+    record = dict(result, verified_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+    record_path = result['bin'] + VERIFIED_SUFFIX
+    tmp_path = record_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, record_path)
+
+
+def verify_video(video_id, video_path, method='bytes'):
+    """校验一个视频号下 APS 和 EVS 的 .bin，写入校验记录并返回结果列表"""
+    results = []
+    for bin_path, raw_dir in get_bin_jobs(video_id, video_path):
+        if not os.path.exists(bin_path):
+            continue
+        try:
+            result = verify_bin(bin_path, raw_dir, method)
+        except OSError as e:
+            result = {'bin': bin_path, 'raw_dir': raw_dir, 'status': 'fail', 'frames': 0,
+                      'mismatched': [], 'error': str(e)}
+        write_verified_record(result)
+        results.append(result)
+    return results
+
+
+def verify_folders(root_path, folder_list, method='bytes', max_workers=4):
+    """按视频号并行校验指定任务文件夹下的所有 .bin"""
+    jobs = []
+    for folder in folder_list:
+        folder_path = os.path.join(root_path, folder)
+        if not os.path.exists(folder_path):
+            print(f"错误: 文件夹 {folder_path} 不存在")
+            continue
+        for video_id in sorted(os.listdir(folder_path)):
+            video_path = os.path.join(folder_path, video_id)
+            if os.path.isdir(video_path):
+                jobs.append((video_id, video_path))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(verify_video, video_id, video_path, method): video_id
+                   for video_id, video_path in jobs}
+        for future in as_completed(futures):
+            for result in future.result():
+                results.append(result)
+                if result['status'] == 'pass':
+                    print(f"校验通过: {result['bin']}（{result['frames']} 帧）")
+                else:
+                    print(f"校验失败: {result['bin']}，原因: {result['error']}")
+    return results
+
+
+def main():
+    root_path = r"D:\数据集转换汇总"
+    folders_to_check = ["高空抛物-易华录", "高空抛物-教师公寓"]  # 用户可以修改
+
+    # 'bytes' 直接比较内存，'hash' 比较哈希
+    method = 'bytes'
+    max_workers = 4
+
+    start = time.time()
+    results = verify_folders(root_path, folders_to_check, method, max_workers)
+
+    passed = [r for r in results if r['status'] == 'pass']
+    failed = [r for r in results if r['status'] != 'pass']
+    print(f"\n=== 校验完成，耗时 {time.time() - start:.1f} 秒 ===")
+    print(f"通过 {len(passed)} 个 bin 文件，可释放 {sum(r['bin_size'] for r in passed) / 1024 ** 3:.2f} GB")
+    if failed:
+        print(f"\n以下 {len(failed)} 个 bin 文件未通过校验，请勿删除：")
+        for r in sorted(failed, key=lambda r: r['bin']):
+            print(f"- {r['bin']}: {r['error']}")
+            if r['mismatched']:
+                print(f"  不一致的帧: {r['mismatched'][:20]}{' ...' if len(r['mismatched']) > 20 else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,757 @@
+import os
+import re
+import json
+import time
+import hashlib
+import zlib
+import threading
+from functools import lru_cache
+import xml.etree.ElementTree as ET
+from queue import Queue
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+# 标签格式：'yolo'（与 001 相同的 txt）或 'voc'（与 002 相同的 xml）
+LABEL_FORMAT = 'yolo'
+LABEL_SUFFIX = {'yolo': '.txt', 'voc': '.xml'}
+
+# 输出模式：'png' 每帧一张 PNG（与 001/002 相同），'video' 每个视频和相机写成一个视频文件
+OUTPUT_MODE = 'png'
+# 视频输出参数：帧率、编码、缩放比例（1.0 为原尺寸）、是否在画面上标注帧号
+VIDEO_FPS = 25
+VIDEO_FOURCC = 'MJPG'
+VIDEO_SUFFIX = '.avi'
+VIDEO_SCALE = 0.5
+VIDEO_FRAME_LABEL = True
+
+# 预览档位：1 为原图，2/4/8 表示解码时直接缩小为 1/2、1/4、1/8（3264x2448 的 APS 用 4 即可）
+PREVIEW_FACTOR = 1
+# 预览缓存目录（None 表示不缓存），缓存文件的修改时间与源图片一致时直接复用
+PREVIEW_CACHE_DIR = None
+READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# 每个进程内的流水线：读文件线程 -> 解码绘制线程 -> 编码写出线程，各级之间为有界队列
+PIPELINE_READ_THREADS = 2
+PIPELINE_DECODE_THREADS = 1
+PIPELINE_WRITE_THREADS = 1
+PIPELINE_DEPTH = 8  # 每级队列最多缓存的帧数，限制预读占用的内存
+
+# 增量渲染：记录每个输出帧的输入签名，再次运行时只重绘图片或标签有变化的帧，并删除源图片已不存在的输出
+INCREMENTAL = False
+# 签名方式：'stat' 使用文件大小和修改时间，'hash' 使用文件内容哈希（较慢，但不受复制、同步改动修改时间的影响）
+SIGNATURE_MODE = 'stat'
+# 绘制逻辑变化时加一，使之前的渲染结果全部失效
+RENDERER_VERSION = 2
+MANIFEST_SUFFIX = '.render.json'
+
+frame_pattern = re.compile(r'_(\d+)\.png$')
+
+# 一帧中目标数超过该值时不再逐个写类别名，改为在左上角画图例（遥感车辆等密集帧）
+DENSE_LABEL_THRESHOLD = 50
+
+
+def init_worker(cv_threads):
+    """工作进程初始化：限制 OpenCV 内部线程数，避免与进程池互相抢占 CPU"""
+    cv2.setNumThreads(cv_threads)
+
+
+def load_yolo_label(label_path):
+    """读取单个 YOLO 标签文件，返回 [class_id, center_x, center_y, width, height] 列表"""
+    labels = []
+    with open(label_path, 'r') as f:
+        for line in f:
+            parts = line.strip().split()
+            if len(parts) == 5:  # YOLO标签应有5个值
+                try:
+                    labels.append([float(p) for p in parts])
+                except ValueError:
+                    print(f"警告: {label_path} 中的标签格式错误: {line}")
+    return labels
+
+
+def load_voc_label(label_path):
+    """读取单个 VOC XML 标签文件，返回 {'class', 'bbox'} 列表"""
+    objects = []
+    xml_root = ET.parse(label_path).getroot()
+    for obj in xml_root.findall('object'):
+        bndbox = obj.find('bndbox')
+        objects.append({
+            'class': obj.find('name').text,
+            'bbox': [int(bndbox.find(k).text) for k in ('xmin', 'ymin', 'xmax', 'ymax')],
+        })
+    return objects
+
+
+@lru_cache(maxsize=None)
+def class_color(class_name):
+    """根据类别名的 crc32 取色相，保证各进程、各次运行颜色一致，类别较多时也不容易撞色"""
+    hue = zlib.crc32(class_name.encode('utf-8')) % 180
+    b, g, r = cv2.cvtColor(np.uint8([[[hue, 255, 255]]]), cv2.COLOR_HSV2BGR)[0, 0]
+    return int(b), int(g), int(r)
+
+
+def box_polygons(x1, y1, x2, y2):
+    """将整帧的边界框坐标数组转换为 (框数, 4, 2) 的 int32 角点数组，可一次传给 cv2.polylines"""
+    return np.stack([np.stack([x1, y1], 1), np.stack([x2, y1], 1),
+                     np.stack([x2, y2], 1), np.stack([x1, y2], 1)], axis=1).astype(np.int32)
+
+
+def draw_yolo_labels(image, labels, scale=1.0):
+    """根据YOLO标签在图片上绘制绿色边界框（归一化坐标，与图片尺寸无关，scale 不需要使用）"""
+    if not labels:
+        return image
+    h, w = image.shape[:2]
+    boxes = np.asarray(labels, dtype=np.float64)
+    half_w = boxes[:, 3] / 2
+    half_h = boxes[:, 4] / 2
+    polygons = box_polygons((boxes[:, 1] - half_w) * w, (boxes[:, 2] - half_h) * h,
+                            (boxes[:, 1] + half_w) * w, (boxes[:, 2] + half_h) * h)
+    cv2.polylines(image, polygons, True, (0, 255, 0), 2)
+    return image
+
+
+def draw_voc_labels(image, objects, scale=1.0):
+    """
+    根据VOC标签在图片上绘制边界框和类别名称，scale 为预览图相对原图的缩放比例；
+    每个类别只调用一次 cv2.polylines，目标数超过 DENSE_LABEL_THRESHOLD 时用左上角图例代替逐个目标的类别名
+    """
+    if not objects:
+        return image
+    classes = [obj['class'] for obj in objects]
+    boxes = np.array([obj['bbox'] for obj in objects], dtype=np.float64) * scale
+    polygons = box_polygons(*boxes.T)
+    class_names, inverse, counts = np.unique(classes, return_inverse=True, return_counts=True)
+    for idx, class_name in enumerate(class_names):
+        cv2.polylines(image, polygons[inverse == idx], True, class_color(class_name), 2)
+    if len(objects) > DENSE_LABEL_THRESHOLD:
+        for i, (class_name, count) in enumerate(zip(class_names, counts)):
+            cv2.putText(image, f"{class_name}: {count}", (10, 30 + i * 30), cv2.FONT_HERSHEY_SIMPLEX, 0.9,
+                        class_color(class_name), 2)
+    else:
+        for class_name, (xmin, ymin) in zip(classes, polygons[:, 0]):
+            cv2.putText(image, class_name, (int(xmin), int(ymin) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9,
+                        class_color(class_name), 2)
+    return image
+
+
+def resolve_image_source(image_path, factor=1, cache_path=None):
+    """
+    确定实际要读取的文件和解码方式：factor 大于 1 时在解码阶段直接缩小，解码和后续绘制的开销约降为 1/factor²；
+    指定 cache_path 且缓存文件的修改时间与源图片一致时直接读取缓存
+
+    Returns:
+        tuple: (读取路径, 解码标志, 需要写入的缓存路径或 None, 源图片修改时间)
+    """
+    if cache_path is None or factor == 1:
+        return image_path, READ_FLAGS[factor], None, None
+
+    source_mtime = os.stat(image_path).st_mtime_ns
+    try:
+        if os.stat(cache_path).st_mtime_ns == source_mtime:
+            return cache_path, cv2.IMREAD_COLOR, None, source_mtime
+    except FileNotFoundError:
+        pass
+    return image_path, READ_FLAGS[factor], cache_path, source_mtime
+
+
+def read_image(path, flag=cv2.IMREAD_COLOR):
+    """读取图片；cv2.imread 在 Windows 上无法打开中文路径，改为 np.fromfile + cv2.imdecode，读取失败时为 None"""
+    try:
+        data = np.fromfile(path, dtype=np.uint8)
+    except OSError:
+        return None
+    return cv2.imdecode(data, flag) if data.size else None
+
+
+def write_image(path, image, params=()):
+    """写出图片；cv2.imwrite 在 Windows 上遇到中文路径会静默失败，改为 cv2.imencode + tofile，失败时抛出 IOError"""
+    ok, encoded = cv2.imencode(os.path.splitext(path)[1], image, list(params))
+    if not ok:
+        raise IOError(f"无法编码 {path}")
+    encoded.tofile(path)
+
+
+def write_cache(cache_path, image, source_mtime):
+    """写入预览缓存，并以源图片的修改时间作为缓存键"""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    write_image(cache_path, image)
+    os.utime(cache_path, ns=(source_mtime, source_mtime))
+
+
+def preview_cache_path(cache_dir, video_id, camera_type, factor, filename):
+    """预览缓存路径 <cache_dir>/<视频号>/<相机>/r<档位>/<文件名>：带上档位，修改预览档位后不会读到其他分辨率的缓存"""
+    return os.path.join(cache_dir, video_id, camera_type.lower(), f"r{factor}", filename)
+
+
+def load_preview(image_path, factor=1, cache_path=None):
+    """
+    按预览档位解码一张图片（020/021 抽样预览使用），缓存的读写规则与渲染流水线相同
+
+    Returns:
+        numpy.ndarray: 预览图，读取失败时为 None
+    """
+    read_path, flag, write_path, source_mtime = resolve_image_source(image_path, factor, cache_path)
+    image = read_image(read_path, flag)
+    if image is None and read_path != image_path:
+        # 缓存文件损坏时重新从源图片解码并覆盖缓存
+        read_path, flag, write_path = image_path, READ_FLAGS[factor], cache_path
+        image = read_image(read_path, flag)
+    if image is not None and write_path:
+        write_cache(write_path, image, source_mtime)
+    return image
+
+
+def frame_sort_key(stem):
+    """按帧编号排序（文件名主干如 816_612_8_0000000012），没有帧编号时按文件名排序"""
+    match = frame_pattern.search(stem + '.png')
+    return (int(match.group(1)) if match else -1, stem)
+
+
+def prepare_video_frame(image, filename, scale, frame_label):
+    """视频输出前的处理：按比例缩小，并在左上角标注帧号"""
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if frame_label:
+        match = frame_pattern.search(filename)
+        text = match.group(1) if match else filename
+        (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
+        cv2.rectangle(image, (0, 0), (tw + 8, th + baseline + 8), (0, 0, 0), -1)
+        cv2.putText(image, text, (4, th + 4), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+    return image
+
+
+class VideoSink:
+    """将一个分片的帧按顺序写入一个视频文件，第一帧决定视频尺寸"""
+
+    def __init__(self, video_path, fps=VIDEO_FPS, fourcc=VIDEO_FOURCC, scale=VIDEO_SCALE,
+                 frame_label=VIDEO_FRAME_LABEL):
+        self.video_path = video_path
+        self.fps = fps
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.scale = scale
+        self.frame_label = frame_label
+        self.writer = None
+        self.size = None
+
+    def write(self, filename, image):
+        frame = prepare_video_frame(image, filename, self.scale, self.frame_label)
+        if self.writer is None:
+            self.size = (frame.shape[1], frame.shape[0])
+            self.writer = cv2.VideoWriter(self.video_path, self.fourcc, self.fps, self.size)
+            if not self.writer.isOpened():
+                raise IOError(f"无法创建视频文件 {self.video_path}")
+        elif (frame.shape[1], frame.shape[0]) != self.size:
+            frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+
+
+class PngSink:
+    """每帧写一张 PNG 到 Merge/<video>/<camera>，与 001/002 的输出一致"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, filename, image):
+        write_image(os.path.join(self.output_dir, filename), image)
+
+    def close(self):
+        pass
+
+
+def open_sink(merge_dir, video_id, camera_type, output_mode):
+    """根据输出模式创建分片的输出对象"""
+    if output_mode == 'video':
+        os.makedirs(os.path.join(merge_dir, video_id), exist_ok=True)
+        return VideoSink(os.path.join(merge_dir, video_id, f"{video_id}_{camera_type}{VIDEO_SUFFIX}"))
+    return PngSink(os.path.join(merge_dir, video_id, camera_type))
+
+
+def shard_outputs(merge_dir, video_id, camera_type, output_mode):
+    """分片的输出位置：png 模式为帧所在目录，video 模式为视频文件路径"""
+    if output_mode == 'video':
+        return os.path.join(merge_dir, video_id, f"{video_id}_{camera_type}{VIDEO_SUFFIX}")
+    return os.path.join(merge_dir, video_id, camera_type)
+
+
+def render_settings(label_format, output_mode, preview_factor):
+    """影响输出结果的渲染参数，任何一项变化都需要整个分片重绘"""
+    settings = {'version': RENDERER_VERSION, 'label_format': label_format, 'output_mode': output_mode,
+                'preview_factor': preview_factor}
+    if output_mode == 'video':
+        settings.update(fps=VIDEO_FPS, fourcc=VIDEO_FOURCC, scale=VIDEO_SCALE, frame_label=VIDEO_FRAME_LABEL)
+    return settings
+
+
+def file_signature(path, mode=SIGNATURE_MODE):
+    """单个输入文件的签名，文件不存在时为 None"""
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if mode == 'hash':
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+        return [st.st_size, h.hexdigest()]
+    return [st.st_size, st.st_mtime_ns]
+
+
+def manifest_path(merge_dir, video_id, camera_type):
+    """分片的签名清单：Merge/<video>/.<camera>.render.json"""
+    return os.path.join(merge_dir, video_id, f".{camera_type}{MANIFEST_SUFFIX}")
+
+
+def load_manifest(path):
+    """读取签名清单，不存在或损坏时返回 None（整个分片按需重绘）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(path, settings, frames):
+    """先写临时文件再替换，中断时不会留下半个清单"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'settings': settings, 'frames': frames}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def remove_outputs(output_path, output_mode, filenames):
+    """删除不再有源图片的输出，返回删除的文件数"""
+    removed = 0
+    paths = [output_path] if output_mode == 'video' else [os.path.join(output_path, f) for f in filenames]
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def remove_stale_shards(merge_dir, shards):
+    """删除整个视频或相机文件夹已不存在的分片的输出和签名清单"""
+    current = {(video_id, camera_type.lower()) for video_id, camera_type in shards}
+    removed = 0
+    if not os.path.isdir(merge_dir):
+        return removed
+    for video_entry in os.scandir(merge_dir):
+        if not video_entry.is_dir():
+            continue
+        for entry in os.scandir(video_entry.path):
+            if not (entry.name.startswith('.') and entry.name.endswith(MANIFEST_SUFFIX)):
+                continue
+            camera_type = entry.name[1:-len(MANIFEST_SUFFIX)]
+            if (video_entry.name, camera_type) in current:
+                continue
+            manifest = load_manifest(entry.path) or {}
+            output_mode = manifest.get('settings', {}).get('output_mode', 'png')
+            removed += remove_outputs(shard_outputs(merge_dir, video_entry.name, camera_type, output_mode),
+                                      output_mode, manifest.get('frames', {}))
+            os.remove(entry.path)
+            if output_mode == 'png':
+                try:
+                    os.rmdir(shard_outputs(merge_dir, video_entry.name, camera_type, output_mode))
+                except OSError:
+                    pass  # 文件夹中还有其他文件时保留
+            print(f"删除已不存在的分片输出: {video_entry.name}/{camera_type}")
+    return removed
+
+
+LOADERS = {'yolo': load_yolo_label, 'voc': load_voc_label}
+DRAWERS = {'yolo': draw_yolo_labels, 'voc': draw_voc_labels}
+
+
+class OrderedWriter:
+    """视频必须按帧顺序写入：先缓存提前到达的帧，按序号依次交给输出对象"""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.next_seq = 0
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def write(self, seq, filename, image):
+        with self.lock:
+            self.pending[seq] = (filename, image)
+            while self.next_seq in self.pending:
+                filename, image = self.pending.pop(self.next_seq)
+                if image is not None:
+                    self.sink.write(filename, image)
+                self.next_seq += 1
+
+
+def stage_worker(name, fn, in_queue, out_queue, stage_seconds, lock):
+    """流水线中的一个线程：从上一级队列取帧，处理后放入下一级队列，并累计本级的处理耗时"""
+    busy = 0.0
+    while True:
+        item = in_queue.get()
+        if item is None:
+            break
+        t0 = time.perf_counter()
+        try:
+            fn(item)
+        except Exception as e:
+            print(f"错误: 处理 {item['filename']} 时出错（{name}）: {e}")
+            item['image'] = None
+            item['failed'] = True
+        busy += time.perf_counter() - t0
+        if out_queue is not None:
+            out_queue.put(item)
+    with lock:
+        stage_seconds[name] += busy
+
+
+def run_pipeline(items, stages, depth):
+    """
+    运行多级流水线，每一级有独立的线程数，级与级之间为有界队列
+
+    Args:
+        items: 按顺序送入第一级的帧字典
+        stages: [(阶段名, 处理函数, 线程数)]
+        depth: 每级队列的容量
+
+    Returns:
+        dict: 阶段名 -> 该级所有线程的处理耗时之和（秒）
+    """
+    stage_seconds = defaultdict(float)
+    lock = threading.Lock()
+    queues = [Queue(maxsize=depth) for _ in stages] + [None]
+    groups = []
+    for idx, (name, fn, n_threads) in enumerate(stages):
+        threads = [threading.Thread(target=stage_worker,
+                                    args=(name, fn, queues[idx], queues[idx + 1], stage_seconds, lock),
+                                    daemon=True)
+                   for _ in range(max(1, n_threads))]
+        for t in threads:
+            t.start()
+        groups.append(threads)
+
+    for item in items:
+        queues[0].put(item)
+    # 逐级结束：上一级全部退出后，下一级队列中已包含所有帧，再通知下一级退出
+    for idx, threads in enumerate(groups):
+        for _ in threads:
+            queues[idx].put(None)
+        for t in threads:
+            t.join()
+    return dict(stage_seconds)
+
+
+def collect_shards(data_dir):
+    """
+    按 (视频编号, 相机类型) 将 Data 目录下的图片分片，只记录每个分片的图片数，不保存文件列表
+
+    Returns:
+        dict: (video_id, camera_type) -> 图片数
+    """
+    shards = {}
+    for video_entry in sorted(os.scandir(data_dir), key=lambda e: e.name):
+        if not video_entry.is_dir():
+            continue
+        for camera_entry in sorted(os.scandir(video_entry.path), key=lambda e: e.name):
+            if camera_entry.is_dir():
+                count = sum(1 for e in os.scandir(camera_entry.path) if e.name.endswith('.png'))
+                if count:
+                    shards[(video_entry.name, camera_entry.name)] = count
+    return shards
+
+
+def list_sorted(directory, suffix):
+    """列出目录中指定后缀的文件，返回按 (帧编号, 文件名主干) 排序的 [(排序键, 文件名)]"""
+    if not os.path.isdir(directory):
+        return []
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(suffix):
+            stem = entry.name[:-len(suffix)]
+            entries.append((frame_sort_key(stem), entry.name))
+    entries.sort()
+    return entries
+
+
+def merge_join(images, labels):
+    """
+    对两个已排序的列表做归并连接，按文件名主干配对图片和标签
+
+    Yields:
+        tuple: (图片文件名或 None, 标签文件名或 None)；只有标签没有图片时图片为 None
+    """
+    i = j = 0
+    while i < len(images) or j < len(labels):
+        if j >= len(labels) or (i < len(images) and images[i][0] < labels[j][0]):
+            yield images[i][1], None
+            i += 1
+        elif i >= len(images) or labels[j][0] < images[i][0]:
+            yield None, labels[j][1]
+            j += 1
+        else:
+            yield images[i][1], labels[j][1]
+            i += 1
+            j += 1
+
+
+def render_shard(video_id, camera_type, data_dir, label_dir, merge_dir, label_format, output_mode='png',
+                 preview_factor=1, cache_dir=None, pipeline=None, incremental=False):
+    """
+    在工作进程中渲染一个分片：分别列出该视频和相机的图片与标签并排序，归并连接后按帧顺序渲染，
+    标签在用到时才解析，内存占用与数据集大小无关。结果写入 Merge/<video>/<camera>
+    或 Merge/<video>/<video>_<camera>.avi；preview_factor 大于 1 时按预览档位缩小解码
+
+    渲染分为三级流水线，磁盘读取与解码绘制、编码写出互相重叠：
+    读取（线程读入文件字节）-> 解码绘制（cv2.imdecode 与画框）-> 写出（PNG 编码写盘或按序写入视频）
+
+    incremental 为 True 时按签名清单只重绘图片或标签有变化的帧（视频模式下任一帧变化即整段重写），
+    并删除源图片已不存在的输出
+
+    Args:
+        pipeline: (读线程数, 解码绘制线程数, 写线程数, 队列容量)，默认使用 PIPELINE_* 配置
+        incremental: 是否增量渲染
+
+    Returns:
+        dict: 分片统计（帧数、有标签帧数、失败数、跳过数、删除数、无图片的标签数、各级耗时、总耗时、进程号）
+    """
+    start = time.perf_counter()
+    load_label = LOADERS[label_format]
+    draw = DRAWERS[label_format]
+    suffix = LABEL_SUFFIX[label_format]
+    camera_lower = camera_type.lower()
+    read_threads, decode_threads, write_threads, depth = pipeline or (
+        PIPELINE_READ_THREADS, PIPELINE_DECODE_THREADS, PIPELINE_WRITE_THREADS, PIPELINE_DEPTH)
+
+    image_dir = os.path.join(data_dir, video_id, camera_type)
+    label_sub_dir = os.path.join(label_dir, video_id, camera_lower)
+    pairs = list(merge_join(list_sorted(image_dir, '.png'), list_sorted(label_sub_dir, suffix)))
+    orphan_labels = sum(1 for filename, _ in pairs if filename is None)
+    pairs = [p for p in pairs if p[0] is not None]
+
+    counters = {'frames': 0, 'labelled': 0, 'failed': 0, 'skipped': 0, 'removed': 0}
+    counter_lock = threading.Lock()
+    rendered = {}
+    if incremental:
+        settings = render_settings(label_format, output_mode, preview_factor)
+        shard_manifest = manifest_path(merge_dir, video_id, camera_lower)
+        output_path = shard_outputs(merge_dir, video_id, camera_lower, output_mode)
+        signatures = {filename: [file_signature(os.path.join(image_dir, filename)),
+                                 file_signature(os.path.join(label_sub_dir, label_name) if label_name else None)]
+                      for filename, label_name in pairs}
+        manifest = load_manifest(shard_manifest)
+        previous = manifest['frames'] if manifest and manifest.get('settings') == settings else {}
+        stale = [filename for filename in previous if filename not in signatures]
+        counters['removed'] = remove_outputs(output_path, 'png', stale) if output_mode == 'png' else 0
+        if output_mode == 'video':
+            if previous == signatures and os.path.exists(output_path):
+                # 所有帧都没有变化，视频无需重写
+                counters['skipped'] = len(pairs)
+                pairs = []
+            elif not signatures:
+                counters['removed'] = remove_outputs(output_path, output_mode, [])
+        else:
+            existing = {e.name for e in os.scandir(output_path)} if os.path.isdir(output_path) else set()
+            unchanged = [filename for filename, _ in pairs
+                         if previous.get(filename) == signatures[filename] and filename in existing]
+            rendered.update((filename, signatures[filename]) for filename in unchanged)
+            counters['skipped'] = len(unchanged)
+            unchanged = set(unchanged)
+            pairs = [p for p in pairs if p[0] not in unchanged]
+    items = ({'seq': seq, 'filename': filename, 'label_name': label_name}
+             for seq, (filename, label_name) in enumerate(pairs))
+
+    def read_stage(item):
+        image_path = os.path.join(image_dir, item['filename'])
+        cache_path = (preview_cache_path(cache_dir, video_id, camera_lower, preview_factor, item['filename'])
+                      if cache_dir else None)
+        read_path, item['flag'], item['cache_path'], item['source_mtime'] = \
+            resolve_image_source(image_path, preview_factor, cache_path)
+        with open(read_path, 'rb') as f:
+            item['data'] = f.read()
+
+    def decode_stage(item):
+        if item.get('failed'):
+            return
+        image = cv2.imdecode(np.frombuffer(item.pop('data'), dtype=np.uint8), item['flag'])
+        if image is None:
+            print(f"错误: 无法读取图片 {os.path.join(image_dir, item['filename'])}")
+            item['image'] = None
+            item['failed'] = True
+            return
+        if item['cache_path']:
+            item['cache_image'] = image.copy()
+        if item['label_name'] is not None:
+            label_path = os.path.join(label_sub_dir, item['label_name'])
+            try:
+                frame_labels = load_label(label_path)
+            except (ET.ParseError, OSError) as e:
+                print(f"警告: 无法解析标签 {label_path}: {e}")
+                frame_labels = []
+            if frame_labels:
+                image = draw(image, frame_labels, 1.0 / preview_factor)
+                item['labelled'] = True
+        item['image'] = image
+
+    sink = open_sink(merge_dir, video_id, camera_lower, output_mode)
+    ordered = OrderedWriter(sink) if output_mode == 'video' else None
+    if ordered is not None:
+        # 视频只能按顺序写入，写出级只用一个线程
+        write_threads = 1
+
+    def write_stage(item):
+        written = False
+        try:
+            if item.get('cache_image') is not None:
+                write_cache(item['cache_path'], item.pop('cache_image'), item['source_mtime'])
+            if ordered is not None:
+                ordered.write(item['seq'], item['filename'], item.get('image'))
+            elif item.get('image') is not None:
+                sink.write(item['filename'], item['image'])
+            written = True
+        finally:
+            # 写出出错时异常由 stage_worker 记录，这里只在写出成功后才记入签名清单，下次运行会重绘该帧
+            with counter_lock:
+                if item.get('failed') or not written:
+                    counters['failed'] += 1
+                else:
+                    counters['frames'] += 1
+                    counters['labelled'] += 1 if item.get('labelled') else 0
+                    if incremental:
+                        rendered[item['filename']] = signatures[item['filename']]
+
+    stage_seconds = {}
+    try:
+        if not pairs:
+            if incremental and (counters['removed'] or not os.path.exists(shard_manifest)):
+                save_manifest(shard_manifest, settings, rendered if output_mode == 'png' else signatures)
+            return shard_stats(video_id, camera_lower, counters, orphan_labels, stage_seconds, start)
+        stage_seconds = run_pipeline(items, [
+            ('读取', read_stage, read_threads),
+            ('解码绘制', decode_stage, decode_threads),
+            ('写出', write_stage, write_threads),
+        ], depth)
+    finally:
+        sink.close()
+        if incremental and pairs:
+            # 中断时也记录已写出的帧，下次只补渲染剩下的
+            save_manifest(shard_manifest, settings, rendered)
+
+    return shard_stats(video_id, camera_lower, counters, orphan_labels, stage_seconds, start)
+
+
+def shard_stats(video_id, camera_type, counters, orphan_labels, stage_seconds, start):
+    """汇总一个分片的统计信息"""
+    return dict(counters, **{
+        'shard': f"{video_id}/{camera_type}",
+        'orphan_labels': orphan_labels,
+        'stage_seconds': stage_seconds,
+        'seconds': time.perf_counter() - start,
+        'pid': os.getpid(),
+    })
+
+
+def main(data_dir, label_dir, merge_dir, label_format=LABEL_FORMAT, output_mode=OUTPUT_MODE, workers=None,
+         cv_threads=1, preview_factor=PREVIEW_FACTOR, cache_dir=PREVIEW_CACHE_DIR, pipeline=None,
+         incremental=INCREMENTAL):
+    """
+    主函数：按视频和相机分片，在进程池中并行渲染
+
+    参数:
+        data_dir (str): Data目录路径
+        label_dir (str): Label目录路径
+        merge_dir (str): Merge目录路径
+        label_format (str): 'yolo' 或 'voc'
+        output_mode (str): 'png' 或 'video'
+        workers (int): 进程数，默认使用全部 CPU
+        cv_threads (int): 每个进程内 OpenCV 的线程数
+        preview_factor (int): 预览档位 1/2/4/8
+        cache_dir (str): 预览缓存目录，None 表示不缓存
+        pipeline (tuple): 每个进程内的 (读线程数, 解码绘制线程数, 写线程数, 队列容量)
+        incremental (bool): 只重绘输入有变化的帧，并删除源图片已不存在的输出
+    """
+    pipeline = pipeline or (PIPELINE_READ_THREADS, PIPELINE_DECODE_THREADS, PIPELINE_WRITE_THREADS, PIPELINE_DEPTH)
+    workers = workers or os.cpu_count() or 1
+    shards = collect_shards(data_dir)
+    total_images = sum(shards.values())
+    if preview_factor not in READ_FLAGS:
+        raise ValueError(f"预览档位只能为 {sorted(READ_FLAGS)}，当前为 {preview_factor}")
+    print(f"共 {total_images} 张图片，分为 {len(shards)} 个分片，使用 {workers} 个进程"
+          f"（每个进程 OpenCV 线程数 {cv_threads}，流水线 读/解码绘制/写 线程数 {pipeline[0]}/{pipeline[1]}/"
+          f"{pipeline[2]}，队列容量 {pipeline[3]}）")
+
+    start = time.perf_counter()
+    removed = remove_stale_shards(merge_dir, shards) if incremental else 0
+    skipped = rendered = failed = 0
+    per_worker = defaultdict(lambda: {'frames': 0, 'seconds': 0.0})
+    stage_totals = defaultdict(float)
+    # 先提交大的分片，减少最后只剩一个进程在跑的时间
+    ordered = sorted(shards.items(), key=lambda kv: kv[1], reverse=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cv_threads,)) as executor:
+        futures = [executor.submit(render_shard, video_id, camera_type,
+                                   data_dir, label_dir, merge_dir, label_format, output_mode,
+                                   preview_factor, cache_dir, pipeline, incremental)
+                   for (video_id, camera_type), _ in ordered]
+        for future in as_completed(futures):
+            stats = future.result()
+            skipped += stats['skipped']
+            rendered += stats['frames']
+            failed += stats['failed']
+            removed += stats['removed']
+            per_worker[stats['pid']]['frames'] += stats['frames']
+            per_worker[stats['pid']]['seconds'] += stats['seconds']
+            for name, seconds in stats['stage_seconds'].items():
+                stage_totals[name] += seconds
+            fps = stats['frames'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+            print(f"完成分片 {stats['shard']}: {stats['frames']} 帧（有标签 {stats['labelled']}，"
+                  f"失败 {stats['failed']}，无图片的标签 {stats['orphan_labels']}，未变化跳过 {stats['skipped']}），"
+                  f"{fps:.1f} 帧/秒")
+
+    elapsed = time.perf_counter() - start
+    print("\n=== 各进程渲染速度 ===")
+    for pid, stats in sorted(per_worker.items()):
+        fps = stats['frames'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+        print(f"进程 {pid}: {stats['frames']} 帧, {fps:.1f} 帧/秒")
+    print("\n=== 流水线各级耗时（所有进程合计） ===")
+    stage_threads = {'读取': pipeline[0], '解码绘制': pipeline[1], '写出': 1 if output_mode == 'video' else pipeline[2]}
+    for name, seconds in stage_totals.items():
+        print(f"{name}: 处理 {seconds:.1f} 秒（{stage_threads[name]} 个线程，平均每线程 "
+              f"{seconds / stage_threads[name]:.1f} 秒）")
+    if stage_totals:
+        bottleneck = max(stage_totals, key=lambda name: stage_totals[name] / stage_threads[name])
+        advice = "可优先增加该阶段的线程数"
+        if bottleneck == '写出' and output_mode == 'video':
+            advice = "视频只能单线程按序写入，可减小 VIDEO_SCALE 或增加进程数"
+        print(f"瓶颈阶段: {bottleneck}（{'I/O 受限' if bottleneck == '读取' else 'CPU/编码受限'}），{advice}")
+    if incremental:
+        print(f"增量渲染: 跳过未变化的帧 {skipped} 帧，删除源图片已不存在的输出 {removed} 个")
+    print(f"总计渲染 {rendered} 帧（失败 {failed} 帧）, 耗时 {elapsed:.1f} 秒, {rendered / elapsed if elapsed else 0:.1f} 帧/秒")
+
+
+# 运行程序
+if __name__ == "__main__":
+    # 设置目录路径
+    # 下面的这几个就是工程目录下的三个文件夹，也就是相对路径
+    data_dir = "Data"
+    label_dir = "Label"
+    merge_dir = "Merge"
+
+    # 执行主函数
+    main(data_dir, label_dir, merge_dir, label_format=LABEL_FORMAT, output_mode=OUTPUT_MODE,
+         preview_factor=PREVIEW_FACTOR, cache_dir=PREVIEW_CACHE_DIR, incremental=INCREMENTAL)
+    print("处理完成，所有结果已保存至Merge目录")
@@ -0,0 +1,276 @@
+import os
+import re
+import time
+import zlib
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+# 标签格式：'yolo'（txt）或 'voc'（xml）
+LABEL_FORMAT = 'voc'
+LABEL_SUFFIX = {'yolo': '.txt', 'voc': '.xml'}
+
+# 对照画面中每个窗格的尺寸（宽, 高），APS 3264x2448 与 EVS 816x612 都缩放到这个尺寸
+PANE_SIZE = (816, 612)
+# 输出模式：'video' 每个视频一个对照视频，'png' 每帧一张对照图
+OUTPUT_MODE = 'video'
+VIDEO_FPS = 25
+VIDEO_FOURCC = 'MJPG'
+# 顶部信息栏高度
+HEADER_HEIGHT = 32
+
+frame_pattern = re.compile(r'_(\d+)\.[^.]+$')
+
+
+def frame_number(filename):
+    """从文件名中提取帧编号，例如 816_612_8_0000000012.png -> 12"""
+    match = frame_pattern.search(filename)
+    return int(match.group(1)) if match else None
+
+
+@lru_cache(maxsize=None)
+def class_color(class_name):
+    """根据类别名的 crc32 取色相，与 034 的颜色一致"""
+    hue = zlib.crc32(str(class_name).encode('utf-8')) % 180
+    b, g, r = cv2.cvtColor(np.uint8([[[hue, 255, 255]]]), cv2.COLOR_HSV2BGR)[0, 0]
+    return int(b), int(g), int(r)
+
+
+def load_yolo_label(label_path, width, height):
+    """读取 YOLO 标签并换算为原图像素坐标，返回 [(类别, [xmin, ymin, xmax, ymax])]"""
+    objects = []
+    with open(label_path, 'r') as f:
+        for line in f:
+            parts = line.strip().split()
+            if len(parts) != 5:
+                continue
+            try:
+                class_id, cx, cy, w, h = (float(p) for p in parts)
+            except ValueError:
+                print(f"警告: {label_path} 中的标签格式错误: {line}")
+                continue
+            objects.append((str(int(class_id)), [(cx - w / 2) * width, (cy - h / 2) * height,
+                                                 (cx + w / 2) * width, (cy + h / 2) * height]))
+    return objects
+
+
+def load_voc_label(label_path, width, height):
+    """读取 VOC XML 标签，返回 [(类别, [xmin, ymin, xmax, ymax])]"""
+    objects = []
+    for obj in ET.parse(label_path).getroot().findall('object'):
+        bndbox = obj.find('bndbox')
+        objects.append((obj.find('name').text,
+                        [float(bndbox.find(k).text) for k in ('xmin', 'ymin', 'xmax', 'ymax')]))
+    return objects
+
+
+LOADERS = {'yolo': load_yolo_label, 'voc': load_voc_label}
+
+
+def list_frames(directory, suffix):
+    """列出目录中指定后缀的文件，返回 帧编号 -> 文件名"""
+    if not os.path.isdir(directory):
+        return {}
+    frames = {}
+    for entry in os.scandir(directory):
+        if entry.name.endswith(suffix):
+            number = frame_number(entry.name)
+            if number is not None:
+                frames[number] = entry.name
+    return frames
+
+
+def decode_pane(image_path, pane_size):
+    """
+    解码一帧并缩放到窗格尺寸，只做一次 resize；APS 利用缩小解码直接得到接近窗格的尺寸
+
+    Returns:
+        tuple: (窗格图像, 原图宽, 原图高)，读取失败时返回 None
+    """
+    # 先按原尺寸比例选择缩小解码档位，再用一次 resize 调整到窗格尺寸
+    data = np.fromfile(image_path, dtype=np.uint8)
+    if data.size == 0:
+        return None
+    width, height = png_size(data)
+    flag = cv2.IMREAD_COLOR
+    for factor, reduced_flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                                 (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if width and width // factor >= pane_size[0] and height // factor >= pane_size[1]:
+            flag = reduced_flag
+            break
+    image = cv2.imdecode(data, flag)
+    if image is None:
+        return None
+    if width is None:
+        height, width = image.shape[:2]
+    if (image.shape[1], image.shape[0]) != pane_size:
+        image = cv2.resize(image, pane_size, interpolation=cv2.INTER_AREA)
+    return image, width, height
+
+
+def png_size(data):
+    """从 PNG 文件头读取原图宽高，不是 PNG 时返回 (None, None)"""
+    if data.size >= 24 and data[:8].tobytes() == b'\x89PNG\r\n\x1a\n':
+        return int.from_bytes(data[16:20].tobytes(), 'big'), int.from_bytes(data[20:24].tobytes(), 'big')
+    return None, None
+
+
+def draw_pane_labels(pane, objects, sx, sy):
+    """在窗格上按缩放比例绘制边界框和类别"""
+    for class_name, (xmin, ymin, xmax, ymax) in objects:
+        color = class_color(class_name)
+        p1 = (int(xmin * sx), int(ymin * sy))
+        p2 = (int(xmax * sx), int(ymax * sy))
+        cv2.rectangle(pane, p1, p2, color, 2)
+        cv2.putText(pane, str(class_name), (p1[0], max(p1[1] - 6, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+
+def summarize(objects):
+    """统计每个类别的目标数，用于对比两个模态"""
+    counts = {}
+    for class_name, _ in objects:
+        counts[class_name] = counts.get(class_name, 0) + 1
+    return counts
+
+
+def render_video_pair(video_id, data_dir, label_dir, output_dir, label_format, output_mode):
+    """
+    渲染一个视频的 APS/EVS 对照：按帧编号配对两个模态的帧和标签，每帧只解码一次，
+    某个模态缺帧时沿用该模态最近一次解码的画面，不重复读取
+
+    Returns:
+        dict: 统计（对照帧数、类别或目标数不一致的帧号）
+    """
+    start = time.perf_counter()
+    load_label = LOADERS[label_format]
+    suffix = LABEL_SUFFIX[label_format]
+    pane_w, pane_h = PANE_SIZE
+
+    sources = {}
+    for modality in ('aps', 'evs'):
+        image_dir = next((os.path.join(data_dir, video_id, d) for d in os.listdir(os.path.join(data_dir, video_id))
+                          if d.lower() == modality), None)
+        sources[modality] = {
+            'image_dir': image_dir,
+            'images': list_frames(image_dir, '.png') if image_dir else {},
+            'label_dir': os.path.join(label_dir, video_id, modality),
+        }
+        sources[modality]['labels'] = list_frames(sources[modality]['label_dir'], suffix)
+
+    frame_numbers = sorted(set(sources['aps']['images']) | set(sources['evs']['images']))
+    canvas = np.zeros((HEADER_HEIGHT + pane_h, pane_w * 2, 3), dtype=np.uint8)
+    last_pane = {'aps': np.zeros((pane_h, pane_w, 3), np.uint8), 'evs': np.zeros((pane_h, pane_w, 3), np.uint8)}
+
+    writer = None
+    if output_mode == 'video':
+        os.makedirs(output_dir, exist_ok=True)
+        video_path = os.path.join(output_dir, f"{video_id}_aps_evs.avi")
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*VIDEO_FOURCC), VIDEO_FPS,
+                                 (canvas.shape[1], canvas.shape[0]))
+    else:
+        os.makedirs(os.path.join(output_dir, video_id), exist_ok=True)
+
+    mismatched = []
+    try:
+        for number in frame_numbers:
+            summaries = {}
+            for idx, modality in enumerate(('aps', 'evs')):
+                src = sources[modality]
+                pane = None
+                if number in src['images']:
+                    decoded = decode_pane(os.path.join(src['image_dir'], src['images'][number]), PANE_SIZE)
+                    if decoded is not None:
+                        pane, width, height = decoded
+                        objects = []
+                        if number in src['labels']:
+                            try:
+                                objects = load_label(os.path.join(src['label_dir'], src['labels'][number]),
+                                                     width, height)
+                            except (ET.ParseError, OSError) as e:
+                                print(f"警告: 无法解析标签 {src['labels'][number]}: {e}")
+                            draw_pane_labels(pane, objects, pane_w / width, pane_h / height)
+                            summaries[modality] = summarize(objects)
+                        last_pane[modality] = pane
+                if pane is None:
+                    # 缺帧时沿用上一次解码的画面
+                    pane = last_pane[modality]
+                canvas[HEADER_HEIGHT:, idx * pane_w:(idx + 1) * pane_w] = pane
+
+            # 顶部信息栏：帧号以及两个模态的目标统计，不一致时标红
+            canvas[:HEADER_HEIGHT] = 0
+            aps_summary = summaries.get('aps')
+            evs_summary = summaries.get('evs')
+            differs = aps_summary is not None and evs_summary is not None and aps_summary != evs_summary
+            if differs:
+                mismatched.append(number)
+            color = (0, 0, 255) if differs else (255, 255, 255)
+            text = (f"{video_id}  frame {number}  APS {aps_summary if aps_summary is not None else '-'}"
+                    f"  EVS {evs_summary if evs_summary is not None else '-'}")
+            cv2.putText(canvas, text, (8, HEADER_HEIGHT - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.55, color, 1)
+
+            if writer is not None:
+                writer.write(canvas)
+            else:
+                cv2.imwrite(os.path.join(output_dir, video_id, f"aps_evs_{number:010d}.png"), canvas)
+    finally:
+        if writer is not None:
+            writer.release()
+
+    return {
+        'video_id': video_id,
+        'frames': len(frame_numbers),
+        'mismatched': mismatched,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main(data_dir, label_dir, output_dir, label_format=LABEL_FORMAT, output_mode=OUTPUT_MODE, workers=None):
+    """
+    主函数：每个视频一个任务，在进程池中并行渲染 APS/EVS 对照
+
+    参数:
+        data_dir (str): Data目录路径（Data/<视频号>/aps|evs/*.png）
+        label_dir (str): Label目录路径（Label/<视频号>/aps|evs/）
+        output_dir (str): 输出目录
+        label_format (str): 'yolo' 或 'voc'
+        output_mode (str): 'video' 或 'png'
+        workers (int): 进程数，默认使用全部 CPU
+    """
+    workers = workers or os.cpu_count() or 1
+    video_ids = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+    print(f"共 {len(video_ids)} 个视频，使用 {workers} 个进程")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=cv2.setNumThreads, initargs=(1,)) as executor:
+        futures = [executor.submit(render_video_pair, video_id, data_dir, label_dir, output_dir,
+                                   label_format, output_mode) for video_id in video_ids]
+        for future in as_completed(futures):
+            stats = future.result()
+            results.append(stats)
+            fps = stats['frames'] / stats['seconds'] if stats['seconds'] > 0 else 0.0
+            print(f"完成视频 {stats['video_id']}: {stats['frames']} 帧，{fps:.1f} 帧/秒，"
+                  f"APS/EVS 标签不一致 {len(stats['mismatched'])} 帧")
+
+    print("\n=== APS 与 EVS 标签类别或数量不一致的帧 ===")
+    found = False
+    for stats in sorted(results, key=lambda r: len(r['mismatched']), reverse=True):
+        if stats['mismatched']:
+            found = True
+            shown = ', '.join(str(n) for n in stats['mismatched'][:20])
+            print(f"- {stats['video_id']}: {len(stats['mismatched'])} 帧（{shown}"
+                  f"{' ...' if len(stats['mismatched']) > 20 else ''}）")
+    if not found:
+        print("无")
+
+
+# 运行程序
+if __name__ == "__main__":
+    data_dir = "Data"
+    label_dir = "Label"
+    output_dir = "MergeApsEvs"
+
+    main(data_dir, label_dir, output_dir)
+    print("处理完成，所有对照结果已保存至", output_dir)
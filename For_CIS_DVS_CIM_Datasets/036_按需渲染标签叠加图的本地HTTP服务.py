@@ -0,0 +1,357 @@
+import os
+import sys
+import html
+import json
+import time
+import threading
+import importlib.util
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote, unquote
+
+import cv2
+import numpy as np
+
+
+def load_renderer():
+    """加载同目录下 034 的标签读取和绘制函数，保证与批量渲染的结果一致"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "034_并行分片批量融合标签和图片.py")
+    spec = importlib.util.spec_from_file_location("overlay_renderer", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+renderer = load_renderer()
+
+# 任务配置：任务名 -> (Data目录, Label目录, 标签格式 'yolo' 或 'voc')
+TASKS = {
+    "跌倒检测": (r"D:\跌倒检测\Data", r"D:\跌倒检测\Label", 'voc'),
+    "行人识别": (r"D:\行人识别\Data", r"D:\行人识别\Label", 'yolo'),
+}
+
+# 只监听本机，QA 工作站离线使用
+HOST = "127.0.0.1"
+PORT = 8765
+
+# 渲染结果缓存上限：条目数和编码后的总字节数，任一超出时淘汰最久未访问的结果
+CACHE_MAX_ENTRIES = 2000
+CACHE_MAX_BYTES = 512 * 1024 ** 2
+# 每次请求后在后台预渲染的后续帧数；同一视频和相机的新请求会取消还没开始的旧预渲染，拖动浏览时队列不会堆积
+PREFETCH_FRAMES = 5
+PREFETCH_THREADS = 2
+# 返回的编码格式和 JPEG 质量（JPEG 编码比 PNG 快得多，体积也小）
+ENCODE_EXT = '.jpg'
+JPEG_QUALITY = 90
+
+
+class RenderCache:
+    """按条目数和字节数限制的 LRU 缓存，保存编码后的渲染结果"""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= len(self.entries.pop(key))
+            if len(data) > self.max_bytes:
+                return
+            self.entries[key] = data
+            self.bytes += len(data)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+class FrameIndex:
+    """缓存每个 (任务, 视频, 相机) 的帧列表，目录修改时间变化时重新扫描"""
+
+    def __init__(self):
+        self.sequences = {}
+        self.lock = threading.Lock()
+
+    def get(self, task, video_id, camera_type):
+        """
+        Returns:
+            tuple: (帧编号列表, 帧编号 -> (图片路径, 标签路径或 None))
+        """
+        data_dir, label_dir, label_format = TASKS[task]
+        image_dir = os.path.join(data_dir, video_id, camera_type)
+        label_sub_dir = os.path.join(label_dir, video_id, camera_type.lower())
+        signature = tuple(os.stat(d).st_mtime_ns if os.path.isdir(d) else None for d in (image_dir, label_sub_dir))
+        key = (task, video_id, camera_type)
+        with self.lock:
+            cached = self.sequences.get(key)
+            if cached is not None and cached[0] == signature:
+                return cached[1], cached[2]
+
+        images = renderer.list_sorted(image_dir, '.png')
+        labels = renderer.list_sorted(label_sub_dir, renderer.LABEL_SUFFIX[label_format])
+        frames = {}
+        for (number, _), filename in images:
+            frames.setdefault(number, [os.path.join(image_dir, filename), None])
+        for (number, _), filename in labels:
+            if number in frames:
+                frames[number][1] = os.path.join(label_sub_dir, filename)
+        numbers = sorted(frames)
+        frames = {n: tuple(paths) for n, paths in frames.items()}
+        with self.lock:
+            self.sequences[key] = (signature, numbers, frames)
+        return numbers, frames
+
+
+def file_signature(path):
+    """文件的 (大小, 修改时间)，不存在时为 None；作为缓存键的一部分，标签修改后自动失效"""
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def render_frame(image_path, label_path, label_format, factor):
+    """读取一帧并绘制标签，返回编码后的字节"""
+    image = cv2.imdecode(np.fromfile(image_path, dtype=np.uint8), renderer.READ_FLAGS[factor])
+    if image is None:
+        raise ValueError(f"无法读取图片 {image_path}")
+    if label_path is not None:
+        try:
+            frame_labels = renderer.LOADERS[label_format](label_path)
+        except (ET.ParseError, OSError) as e:
+            print(f"警告: 无法解析标签 {label_path}: {e}")
+            frame_labels = []
+        if frame_labels:
+            image = renderer.DRAWERS[label_format](image, frame_labels, 1.0 / factor)
+    params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY] if ENCODE_EXT == '.jpg' else []
+    ok, encoded = cv2.imencode(ENCODE_EXT, image, params)
+    if not ok:
+        raise ValueError(f"无法编码图片 {image_path}")
+    return encoded.tobytes()
+
+
+class OverlayService:
+    """按需渲染：先查缓存，同一帧正在渲染时等待同一个结果，返回后在后台预渲染后续几帧"""
+
+    def __init__(self):
+        self.cache = RenderCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+        self.index = FrameIndex()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.prefetcher = ThreadPoolExecutor(max_workers=PREFETCH_THREADS)
+        # (任务, 视频, 相机) -> 最近一次请求提交的预渲染任务
+        self.prefetch_futures = {}
+        self.prefetch_lock = threading.Lock()
+
+    def cache_key(self, task, video_id, camera_type, number, factor):
+        _, frames = self.index.get(task, video_id, camera_type)
+        if number not in frames:
+            return None, None
+        image_path, label_path = frames[number]
+        return (task, video_id, camera_type, number, factor,
+                file_signature(image_path), file_signature(label_path)), frames[number]
+
+    def render(self, task, video_id, camera_type, number, factor):
+        """返回编码后的渲染结果，帧不存在时返回 None"""
+        key, paths = self.cache_key(task, video_id, camera_type, number, factor)
+        if key is None:
+            return None
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        with self.pending_lock:
+            event = self.pending.get(key)
+            owner = event is None
+            if owner:
+                event = self.pending[key] = threading.Event()
+        if not owner:
+            event.wait()
+            data = self.cache.get(key)
+            if data is not None:
+                return data
+
+        try:
+            data = render_frame(paths[0], paths[1], TASKS[task][2], factor)
+            self.cache.put(key, data)
+        finally:
+            if owner:
+                with self.pending_lock:
+                    self.pending.pop(key, None)
+                event.set()
+        return data
+
+    def prefetch(self, task, video_id, camera_type, number, factor):
+        """
+        在后台渲染当前帧之后的 PREFETCH_FRAMES 帧，并取消同一视频和相机上一次请求中还没开始的预渲染，
+        每个 (任务, 视频, 相机) 排队的预渲染最多 PREFETCH_FRAMES 个
+        """
+        numbers, _ = self.index.get(task, video_id, camera_type)
+        start = np.searchsorted(numbers, number, side='right')
+        stream = (task, video_id, camera_type)
+        with self.prefetch_lock:
+            for future in self.prefetch_futures.pop(stream, []):
+                future.cancel()  # 已经开始的渲染会正常完成并进入缓存
+            self.prefetch_futures[stream] = [
+                self.prefetcher.submit(self.prefetch_one, task, video_id, camera_type, next_number, factor)
+                for next_number in numbers[start:start + PREFETCH_FRAMES]]
+
+    def prefetch_one(self, task, video_id, camera_type, number, factor):
+        try:
+            self.render(task, video_id, camera_type, number, factor)
+        except (OSError, ValueError) as e:
+            print(f"预渲染失败 {task}/{video_id}/{camera_type}/{number}: {e}")
+
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>body{{background:#222;color:#ddd;font-family:sans-serif}}img{{max-width:100%}}</style></head>
+<body><div id="info"></div><img id="frame">
+<script>
+const frames = {frames};
+const title = {title_js};
+const base = {base_js};
+const factor = {factor};
+let i = 0;
+function show() {{
+  document.getElementById("frame").src = base + "/" + frames[i] + "?factor=" + factor;
+  document.getElementById("info").textContent = title + "  帧 " + frames[i] + " (" + (i + 1) + "/" + frames.length + ")  ← → 切换";
+}}
+document.addEventListener("keydown", e => {{
+  if (e.key === "ArrowRight" && i < frames.length - 1) {{ i++; show(); }}
+  if (e.key === "ArrowLeft" && i > 0) {{ i--; show(); }}
+}});
+if (frames.length) show();
+</script></body></html>
+"""
+
+
+def js_literal(value):
+    """转为可以放进 <script> 的 JS 字符串字面量，转义 < > & 避免提前结束脚本"""
+    return json.dumps(value).replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026')
+
+
+class OverlayHandler(BaseHTTPRequestHandler):
+    """
+    路由:
+        /render/<任务>/<视频号>/<相机>/<帧编号>?factor=4  返回叠加标签后的图片
+        /frames/<任务>/<视频号>/<相机>                    返回帧编号列表（JSON）
+        /view/<任务>/<视频号>/<相机>?factor=4             简单的逐帧查看页面（左右方向键切换）
+        /stats                                             缓存命中统计
+    """
+    service = None
+
+    def send_body(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_text(self, status, message):
+        self.send_body(status, "text/plain; charset=utf-8", message.encode('utf-8'))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [unquote(p) for p in url.path.strip('/').split('/') if p]
+        query = parse_qs(url.query)
+        try:
+            factor = int(query.get('factor', ['1'])[0])
+        except ValueError:
+            factor = 0
+        if factor not in renderer.READ_FLAGS:
+            self.send_error_text(400, f"factor 只能是 {sorted(renderer.READ_FLAGS)}")
+            return
+
+        if parts == ['stats']:
+            body = json.dumps(self.service.cache.stats()).encode('utf-8')
+            self.send_body(200, "application/json", body)
+            return
+        if len(parts) < 4 or parts[0] not in ('render', 'frames', 'view') or parts[1] not in TASKS:
+            self.send_error_text(404, "未知的路径或任务")
+            return
+
+        task, video_id, camera_type = parts[1:4]
+        if any(p in ('..', '.') or os.sep in p or '/' in p for p in (video_id, camera_type)):
+            self.send_error_text(400, "非法的视频号或相机")
+            return
+
+        if parts[0] == 'render' and len(parts) == 5:
+            try:
+                number = int(parts[4])
+            except ValueError:
+                self.send_error_text(400, "帧编号必须是整数")
+                return
+            start = time.perf_counter()
+            try:
+                data = self.service.render(task, video_id, camera_type, number, factor)
+            except (OSError, ValueError) as e:
+                self.send_error_text(500, str(e))
+                return
+            if data is None:
+                self.send_error_text(404, "帧不存在")
+                return
+            self.send_body(200, "image/jpeg" if ENCODE_EXT == '.jpg' else "image/png", data)
+            self.service.prefetch(task, video_id, camera_type, number, factor)
+            print(f"{task}/{video_id}/{camera_type}/{number} 用时 {(time.perf_counter() - start) * 1000:.1f} ms")
+        elif parts[0] in ('frames', 'view') and len(parts) == 4:
+            numbers, _ = self.service.index.get(task, video_id, camera_type)
+            if parts[0] == 'frames':
+                self.send_body(200, "application/json", json.dumps(numbers).encode('utf-8'))
+            else:
+                # 任务、视频号和相机来自 URL，写入页面前先转义，防止构造的链接注入脚本
+                title = f"{task}/{video_id}/{camera_type}"
+                base = '/' + '/'.join(['render'] + [quote(p) for p in parts[1:4]])
+                page = VIEWER_HTML.format(title=html.escape(title), title_js=js_literal(title),
+                                          frames=json.dumps(numbers), base_js=js_literal(base), factor=factor)
+                self.send_body(200, "text/html; charset=utf-8", page.encode('utf-8'))
+        else:
+            self.send_error_text(404, "未知的路径")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(host=HOST, port=PORT):
+    """启动本地渲染服务"""
+    OverlayHandler.service = OverlayService()
+    server = ThreadingHTTPServer((host, port), OverlayHandler)
+    print(f"渲染服务已启动: http://{host}:{port}/view/<任务>/<视频号>/<相机>?factor=4")
+    print(f"可用任务: {', '.join(TASKS)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = OverlayHandler.service.cache.stats()
+        print(f"缓存命中 {stats['hits']} 次，未命中 {stats['misses']} 次")
+
+
+if __name__ == "__main__":
+    main()
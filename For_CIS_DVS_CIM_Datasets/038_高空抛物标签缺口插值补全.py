@@ -0,0 +1,221 @@
+import os
+import re
+import sys
+import csv
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# 标签文件名：前缀 + 帧编号，例如 816_612_8_0000000012.txt
+label_pattern = re.compile(r"^(.*?)(\d+)\.txt$")
+
+# 只补全不超过该长度的缺口，过长的缺口目标可能已经离开画面，仍需人工标注
+MAX_GAP = 15
+# 缺口两侧的框 IOU 低于该值时不认为是同一个目标
+MIN_IOU = 0.1
+# 需要补全的相机子文件夹
+CAMERAS = ("evs",)
+# 待审核清单文件名，写在输出根目录下
+REVIEW_LIST_NAME = "待审核插值标签.csv"
+
+
+def load_box_index():
+    """加载同目录下 037 的网格空间索引（使用其中的 iou_matrix）"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "037_矩形框网格空间索引.py")
+    spec = importlib.util.spec_from_file_location("box_index", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+box_index = load_box_index()
+
+
+def list_label_frames(label_dir):
+    """
+    列出标签文件夹中的帧
+
+    Returns:
+        tuple: (排序后的帧编号数组, 帧编号 -> 文件名, 文件名前缀, 帧编号位数)
+    """
+    frames = {}
+    prefix, width = "", 0
+    for entry in os.scandir(label_dir):
+        match = label_pattern.match(entry.name)
+        if match:
+            frames[int(match.group(2))] = entry.name
+            prefix, width = match.group(1), len(match.group(2))
+    return np.array(sorted(frames), dtype=np.int64), frames, prefix, width
+
+
+def load_yolo_boxes(label_path):
+    """读取 YOLO 标签，返回 (类别数组, [cx, cy, w, h] 数组)"""
+    rows = []
+    with open(label_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 5:
+                continue
+            try:
+                rows.append([float(p) for p in parts])
+            except ValueError:
+                print(f"警告: {label_path} 中的标签格式错误: {line.strip()}")
+    rows = np.array(rows, dtype=np.float64).reshape(-1, 5)
+    return rows[:, 0].astype(np.int64), rows[:, 1:]
+
+
+def to_corners(boxes):
+    """[cx, cy, w, h] -> [xmin, ymin, xmax, ymax]（归一化坐标）"""
+    half = boxes[:, 2:] / 2
+    return np.hstack([boxes[:, :2] - half, boxes[:, :2] + half])
+
+
+def find_gaps(numbers, max_gap):
+    """
+    找出已标注帧之间的缺口
+
+    Returns:
+        tuple: (缺口左侧帧编号数组, 右侧帧编号数组, 超过 max_gap 而跳过的缺口列表)
+    """
+    if len(numbers) < 2:
+        return np.empty(0, np.int64), np.empty(0, np.int64), []
+    missing = np.diff(numbers) - 1
+    has_gap = missing > 0
+    fillable = has_gap & (missing <= max_gap)
+    too_long = has_gap & ~fillable
+    skipped = [(int(a), int(b)) for a, b in zip(numbers[:-1][too_long], numbers[1:][too_long])]
+    return numbers[:-1][fillable], numbers[1:][fillable], skipped
+
+
+def associate(left_classes, left_boxes, right_classes, right_boxes, min_iou):
+    """
+    用 IOU 矩阵和线性分配关联缺口两侧的框，只有类别相同且 IOU 不低于 min_iou 的框才会配对
+
+    Returns:
+        tuple: (左侧框行号数组, 右侧框行号数组)
+    """
+    if not len(left_boxes) or not len(right_boxes):
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    iou = box_index.iou_matrix(to_corners(left_boxes), to_corners(right_boxes))
+    iou[left_classes[:, None] != right_classes[None, :]] = 0
+    rows, cols = linear_sum_assignment(iou, maximize=True)
+    keep = iou[rows, cols] >= min_iou
+    return rows[keep], cols[keep]
+
+
+def interpolate_tracks(left_frames, right_frames, left_boxes, right_boxes):
+    """
+    对所有配对的框一次性线性插值
+
+    Args:
+        left_frames, right_frames: 每个配对所在缺口的左右帧编号 (P,)
+        left_boxes, right_boxes: 每个配对在左右两帧中的框 (P, 4)
+
+    Returns:
+        tuple: (每个插值框所属的配对序号, 帧编号, 插值后的框)
+    """
+    lengths = right_frames - left_frames - 1
+    pair_ids = np.repeat(np.arange(len(lengths)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + 1
+    t = (offsets / (lengths[pair_ids] + 1))[:, None]
+    boxes = left_boxes[pair_ids] + t * (right_boxes[pair_ids] - left_boxes[pair_ids])
+    return pair_ids, left_frames[pair_ids] + offsets, boxes
+
+
+def fill_label_dir(label_dir, output_dir, max_gap=MAX_GAP, min_iou=MIN_IOU):
+    """
+    补全一个相机标签文件夹中的缺口，插值结果写到 output_dir（不改动原标签）
+
+    Returns:
+        tuple: (待审核记录列表, 跳过的长缺口列表)
+    """
+    numbers, frames, prefix, width = list_label_frames(label_dir)
+    gap_left, gap_right, skipped = find_gaps(numbers, max_gap)
+    if not len(gap_left):
+        return [], skipped
+
+    # 缺口两侧的帧只读取一次
+    loaded = {n: load_yolo_boxes(os.path.join(label_dir, frames[n]))
+              for n in np.unique(np.concatenate([gap_left, gap_right])).tolist()}
+
+    pair_left, pair_right, pair_classes, box_left, box_right = [], [], [], [], []
+    unmatched = {}
+    for a, b in zip(gap_left.tolist(), gap_right.tolist()):
+        (lc, lb), (rc, rb) = loaded[a], loaded[b]
+        li, ri = associate(lc, lb, rc, rb, min_iou)
+        unmatched[a] = (len(lb) - len(li), len(rb) - len(ri))
+        pair_left.append(np.full(len(li), a))
+        pair_right.append(np.full(len(li), b))
+        pair_classes.append(lc[li])
+        box_left.append(lb[li])
+        box_right.append(rb[ri])
+
+    pair_classes = np.concatenate(pair_classes)
+    pair_ids, frame_ids, boxes = interpolate_tracks(
+        np.concatenate(pair_left), np.concatenate(pair_right), np.concatenate(box_left), np.concatenate(box_right))
+
+    # 按帧分组写出，没有配对成功的缺口也写出空标签，表示该帧待审核
+    os.makedirs(output_dir, exist_ok=True)
+    order = np.argsort(frame_ids, kind='stable')
+    pair_ids, frame_ids, boxes = pair_ids[order], frame_ids[order], boxes[order]
+    bounds = np.searchsorted(frame_ids, np.arange(numbers[0], numbers[-1] + 2))
+    review = []
+    for a, b in zip(gap_left.tolist(), gap_right.tolist()):
+        for n in range(a + 1, b):
+            start, end = bounds[n - numbers[0]], bounds[n - numbers[0] + 1]
+            lines = [f"{cls} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n"
+                     for cls, (cx, cy, w, h) in zip(pair_classes[pair_ids[start:end]].tolist(),
+                                                    boxes[start:end].tolist())]
+            filename = f"{prefix}{str(n).zfill(width)}.txt"
+            with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
+                f.writelines(lines)
+            review.append({
+                'frame': n, 'file': filename, 'boxes': len(lines), 'left_frame': a, 'right_frame': b,
+                'unmatched_left': unmatched[a][0], 'unmatched_right': unmatched[a][1],
+            })
+    return review, skipped
+
+
+def main():
+    # 标签根目录（与 024 的路径二相同）和插值结果输出目录
+    label_root = Path(r"D:\数据集转换汇总\原始任务标签整理\高空抛物")
+    output_root = Path(r"D:\数据集转换汇总\原始任务标签整理\高空抛物_插值待审核")
+
+    all_review = []
+    total_skipped = 0
+    video_dirs = sorted(d for d in label_root.iterdir() if d.is_dir())
+    for video_dir in video_dirs:
+        for camera in CAMERAS:
+            label_dir = video_dir / camera
+            if not label_dir.exists():
+                continue
+            review, skipped = fill_label_dir(label_dir, output_root / video_dir.name / camera)
+            total_skipped += len(skipped)
+            for row in review:
+                all_review.append(dict(row, video=video_dir.name, camera=camera))
+            if review or skipped:
+                boxes = sum(r['boxes'] for r in review)
+                print(f"视频号 {video_dir.name}/{camera}: 补全 {len(review)} 帧，插值 {boxes} 个框"
+                      + (f"，跳过过长缺口 {', '.join(f'{a + 1}-{b - 1}' for a, b in skipped)}" if skipped else ""))
+
+    if all_review:
+        output_root.mkdir(parents=True, exist_ok=True)
+        review_path = output_root / REVIEW_LIST_NAME
+        fields = ['video', 'camera', 'frame', 'file', 'boxes', 'left_frame', 'right_frame',
+                  'unmatched_left', 'unmatched_right']
+        with open(review_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(all_review)
+        print(f"\n插值标签为临时标签，已写入 {output_root}，请按 {review_path} 逐帧审核后再并入正式标签")
+
+    needs_attention = sum(1 for r in all_review if r['boxes'] == 0 or r['unmatched_left'] or r['unmatched_right'])
+    print(f"共补全 {len(all_review)} 帧，其中 {needs_attention} 帧有未能配对的目标，"
+          f"{total_skipped} 个缺口超过 {MAX_GAP} 帧未补全")
+
+
+if __name__ == "__main__":
+    main()
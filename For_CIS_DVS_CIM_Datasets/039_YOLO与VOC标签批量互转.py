@@ -0,0 +1,321 @@
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# 转换方向：'yolo2voc'（txt -> xml）或 'voc2yolo'（xml -> txt）
+DIRECTION = 'yolo2voc'
+SUFFIX = {'yolo2voc': ('.txt', '.xml'), 'voc2yolo': ('.xml', '.txt')}
+
+# 类别编号与类别名的对应关系，编号即列表下标；YOLO 转 VOC 时超出列表的编号直接用数字作为类别名，
+# VOC 转 YOLO 时不在列表中的类别名（纯数字除外）会被跳过并统计
+CLASS_NAMES = ['danger']
+
+# 取不到图片尺寸时按相机文件夹名推断，APS 为 3264x2448，EVS 为 816x612
+LAYOUT_SIZE = {'aps': (3264, 2448), 'evs': (816, 612)}
+# 文件名前缀中的尺寸，例如 3264_2448_xxx_0000000012.txt、816_612_8_0000000012.txt
+size_pattern = re.compile(r'^(\d{3,5})_(\d{3,5})_')
+
+# YOLO 标签一行的格式
+YOLO_LINE = "%d %.6f %.6f %.6f %.6f\n"
+
+VOC_HEADER = """<annotation>
+\t<folder>{folder}</folder>
+\t<filename>{filename}</filename>
+\t<size>
+\t\t<width>{width}</width>
+\t\t<height>{height}</height>
+\t\t<depth>3</depth>
+\t</size>
+\t<segmented>0</segmented>
+"""
+VOC_OBJECT = """\t<object>
+\t\t<name>{name}</name>
+\t\t<pose>Unspecified</pose>
+\t\t<truncated>0</truncated>
+\t\t<difficult>0</difficult>
+\t\t<bndbox>
+\t\t\t<xmin>{xmin}</xmin>
+\t\t\t<ymin>{ymin}</ymin>
+\t\t\t<xmax>{xmax}</xmax>
+\t\t\t<ymax>{ymax}</ymax>
+\t\t</bndbox>
+\t</object>
+"""
+
+
+def png_size(image_path):
+    """只读取 PNG 文件头得到图片宽高，文件不存在或不是 PNG 时返回 None"""
+    try:
+        with open(image_path, 'rb') as f:
+            header = f.read(24)
+    except OSError:
+        return None
+    if len(header) == 24 and header[:8] == b'\x89PNG\r\n\x1a\n':
+        return int.from_bytes(header[16:20], 'big'), int.from_bytes(header[20:24], 'big')
+    return None
+
+
+def lookup_size(filename, image_dir, camera, counts):
+    """
+    查找标签对应图片的尺寸：优先读 PNG 文件头，其次是文件名前缀中的尺寸，最后按相机文件夹推断
+
+    Args:
+        counts (Counter): 统计每种尺寸来源的使用次数
+
+    Returns:
+        tuple: (宽, 高)，都取不到时返回 None
+    """
+    if image_dir:
+        size = png_size(os.path.join(image_dir, os.path.splitext(filename)[0] + '.png'))
+        if size:
+            counts['png'] += 1
+            return size
+    match = size_pattern.match(filename)
+    if match:
+        counts['filename'] += 1
+        return int(match.group(1)), int(match.group(2))
+    if camera in LAYOUT_SIZE:
+        counts['layout'] += 1
+        return LAYOUT_SIZE[camera]
+    counts['missing'] += 1
+    return None
+
+
+def parse_yolo_text(text):
+    """
+    把一个 YOLO 文件的内容解析为 (N, 5) 数组：每个非空行都恰好是 5 个值时整体一次转换为数组，
+    否则（一行 4 个、一行 6 个这类总数碰巧是 5 的倍数的错误行也算在内）再逐行解析，跳过错误行
+    """
+    lines = [line.split() for line in text.splitlines() if line.strip()]
+    if all(len(parts) == 5 for parts in lines):
+        try:
+            return np.array(lines, dtype=np.float64).reshape(-1, 5)
+        except ValueError:
+            pass
+    rows = []
+    for parts in lines:
+        if len(parts) != 5:
+            continue
+        try:
+            rows.append([float(p) for p in parts])
+        except ValueError:
+            continue
+    return np.array(rows, dtype=np.float64).reshape(-1, 5)
+
+
+def read_text(path):
+    """读取标签文本，非 UTF-8 的旧标签按 GBK 读取"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('gbk', errors='replace')
+
+
+def yolo_dir_to_voc(src_dir, dst_dir, image_dir, camera, class_names):
+    """
+    转换一个文件夹中的全部 YOLO 标签：整个文件夹的框拼成一个数组，一次完成坐标换算
+
+    Returns:
+        dict: 统计信息
+    """
+    stats = {'files': 0, 'boxes': 0, 'size_sources': Counter(), 'skipped_classes': Counter(), 'no_size': []}
+    filenames, sizes, arrays = [], [], []
+    for filename in sorted(f for f in os.listdir(src_dir) if f.endswith('.txt')):
+        size = lookup_size(filename, image_dir, camera, stats['size_sources'])
+        if size is None:
+            stats['no_size'].append(filename)
+            continue
+        filenames.append(filename)
+        sizes.append(size)
+        arrays.append(parse_yolo_text(read_text(os.path.join(src_dir, filename))))
+    if not filenames:
+        return stats
+
+    counts = np.array([len(a) for a in arrays])
+    rows = np.concatenate(arrays)
+    sizes = np.array(sizes, dtype=np.float64)
+    wh = np.repeat(sizes, counts, axis=0)
+    centers, half = rows[:, 1:3], rows[:, 3:5] / 2
+    # 与 023 的 yolo_to_voc 一致向零取整，并裁剪到图片范围内
+    corners = np.trunc(np.hstack([(centers - half) * wh, (centers + half) * wh]))
+    corners = np.clip(corners, 0, np.hstack([wh, wh])).astype(np.int64)
+    class_ids = rows[:, 0].astype(np.int64)
+    names = [escape(class_names[c] if 0 <= c < len(class_names) else str(c)) for c in class_ids.tolist()]
+
+    os.makedirs(dst_dir, exist_ok=True)
+    folder = escape(os.path.basename(os.path.normpath(src_dir)))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    corners = corners.tolist()
+    for i, filename in enumerate(filenames):
+        width, height = (int(v) for v in sizes[i])
+        parts = [VOC_HEADER.format(folder=folder, filename=escape(os.path.splitext(filename)[0] + '.png'),
+                                   width=width, height=height)]
+        for j in range(offsets[i], offsets[i + 1]):
+            xmin, ymin, xmax, ymax = corners[j]
+            parts.append(VOC_OBJECT.format(name=names[j], xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax))
+        parts.append("</annotation>\n")
+        with open(os.path.join(dst_dir, os.path.splitext(filename)[0] + '.xml'), 'w', encoding='utf-8') as f:
+            f.write(''.join(parts))
+    stats['files'] = len(filenames)
+    stats['boxes'] = int(counts.sum())
+    return stats
+
+
+def read_voc(path):
+    """读取 VOC 标签，返回 (<size> 中的宽高或 None, 类别名列表, [xmin, ymin, xmax, ymax] 列表)"""
+    root = ET.parse(path).getroot()
+    size = None
+    size_elem = root.find('size')
+    if size_elem is not None:
+        try:
+            width, height = int(float(size_elem.findtext('width'))), int(float(size_elem.findtext('height')))
+            if width > 0 and height > 0:
+                size = (width, height)
+        except (TypeError, ValueError):
+            pass
+    names, boxes = [], []
+    for obj in root.iter('object'):
+        bndbox = obj.find('bndbox')
+        if bndbox is None:
+            continue
+        names.append((obj.findtext('name') or '').strip())
+        boxes.append([float(bndbox.findtext(k)) for k in ('xmin', 'ymin', 'xmax', 'ymax')])
+    return size, names, boxes
+
+
+def voc_dir_to_yolo(src_dir, dst_dir, image_dir, camera, class_names):
+    """
+    转换一个文件夹中的全部 VOC 标签：逐个解析 XML 后拼成一个数组，一次完成归一化
+
+    Returns:
+        dict: 统计信息
+    """
+    stats = {'files': 0, 'boxes': 0, 'size_sources': Counter(), 'skipped_classes': Counter(), 'no_size': []}
+    class_ids = {name: i for i, name in enumerate(class_names)}
+    filenames, sizes, all_names, all_boxes, counts = [], [], [], [], []
+    for filename in sorted(f for f in os.listdir(src_dir) if f.endswith('.xml')):
+        try:
+            size, names, boxes = read_voc(os.path.join(src_dir, filename))
+        except (ET.ParseError, TypeError, ValueError) as e:
+            print(f"警告: 无法解析标签 {os.path.join(src_dir, filename)}: {e}")
+            continue
+        if size:
+            stats['size_sources']['xml'] += 1
+        else:
+            size = lookup_size(filename, image_dir, camera, stats['size_sources'])
+        if size is None:
+            stats['no_size'].append(filename)
+            continue
+        filenames.append(filename)
+        sizes.append(size)
+        all_names.extend(names)
+        all_boxes.extend(boxes)
+        counts.append(len(names))
+    if not filenames:
+        return stats
+
+    counts = np.array(counts)
+    ids = np.array([class_ids.get(n, int(n) if n.isdigit() else -1) for n in all_names], dtype=np.int64)
+    boxes = np.array(all_boxes, dtype=np.float64).reshape(-1, 4)
+    wh = np.repeat(np.array(sizes, dtype=np.float64), counts, axis=0)
+    rows = np.column_stack([ids, (boxes[:, :2] + boxes[:, 2:]) / 2 / wh, (boxes[:, 2:] - boxes[:, :2]) / wh])
+    valid = ids >= 0
+    for name in np.array(all_names, dtype=object)[~valid]:
+        stats['skipped_classes'][name] += 1
+
+    os.makedirs(dst_dir, exist_ok=True)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    for i, filename in enumerate(filenames):
+        file_rows = rows[offsets[i]:offsets[i + 1]][valid[offsets[i]:offsets[i + 1]]]
+        with open(os.path.join(dst_dir, os.path.splitext(filename)[0] + '.txt'), 'w', encoding='utf-8') as f:
+            f.write((YOLO_LINE * len(file_rows)) % tuple(file_rows.ravel().tolist()))
+        stats['boxes'] += len(file_rows)
+    stats['files'] = len(filenames)
+    return stats
+
+
+CONVERTERS = {'yolo2voc': yolo_dir_to_voc, 'voc2yolo': voc_dir_to_yolo}
+
+
+def convert_dir(relative_dir, label_root, output_root, data_root, direction, class_names):
+    """进程池任务：转换 label_root 下的一个文件夹，图片到 data_root 下相同的相对路径中查找"""
+    start = time.perf_counter()
+    image_dir = os.path.join(data_root, relative_dir) if data_root else None
+    camera = os.path.basename(relative_dir).lower()
+    stats = CONVERTERS[direction](os.path.join(label_root, relative_dir), os.path.join(output_root, relative_dir),
+                                  image_dir, camera, class_names)
+    stats['dir'] = relative_dir
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def collect_label_dirs(label_root, suffix):
+    """找出所有直接包含指定后缀标签文件的文件夹，返回相对 label_root 的路径"""
+    relative_dirs = []
+    for root, dirs, files in os.walk(label_root):
+        dirs.sort()
+        if any(f.endswith(suffix) for f in files):
+            relative_dirs.append(os.path.relpath(root, label_root))
+    return relative_dirs
+
+
+def main(label_root, output_root, direction=DIRECTION, data_root=None, class_names=CLASS_NAMES, workers=None):
+    """
+    主函数：按文件夹在进程池中并行转换整个任务的标签，输出保持与输入相同的目录结构
+
+    参数:
+        label_root (str): 标签根目录（例如 Label/<视频号>/aps|evs/）
+        output_root (str): 输出根目录
+        direction (str): 'yolo2voc' 或 'voc2yolo'
+        data_root (str): 图片根目录（与标签相同的目录结构），用于读取 PNG 文件头得到尺寸，可为 None
+        class_names (list): 类别编号与类别名的对应关系
+        workers (int): 进程数，默认使用全部 CPU
+    """
+    start = time.perf_counter()
+    src_suffix, _ = SUFFIX[direction]
+    relative_dirs = collect_label_dirs(label_root, src_suffix)
+    workers = workers or os.cpu_count() or 1
+    print(f"共 {len(relative_dirs)} 个标签文件夹，方向 {direction}，使用 {workers} 个进程")
+
+    total_files = total_boxes = 0
+    size_sources, skipped_classes = Counter(), Counter()
+    no_size = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(convert_dir, d, label_root, output_root, data_root, direction, class_names)
+                   for d in relative_dirs]
+        for future in as_completed(futures):
+            stats = future.result()
+            total_files += stats['files']
+            total_boxes += stats['boxes']
+            size_sources.update(stats['size_sources'])
+            skipped_classes.update(stats['skipped_classes'])
+            no_size.extend(os.path.join(stats['dir'], f) for f in stats['no_size'])
+            print(f"完成 {stats['dir']}: {stats['files']} 个文件，{stats['boxes']} 个框，{stats['seconds']:.2f} 秒")
+
+    elapsed = time.perf_counter() - start
+    print(f"\n共转换 {total_files} 个文件，{total_boxes} 个框，用时 {elapsed:.1f} 秒")
+    print("图片尺寸来源: " + ', '.join(f"{k} {v}" for k, v in sorted(size_sources.items())))
+    if skipped_classes:
+        print("不在类别列表中而跳过的类别: " + ', '.join(f"{k} {v}" for k, v in skipped_classes.most_common()))
+    if no_size:
+        print(f"无法确定图片尺寸而跳过 {len(no_size)} 个文件，例如:")
+        for path in no_size[:10]:
+            print(f"- {path}")
+
+
+# 运行程序
+if __name__ == "__main__":
+    label_root = r"D:\数据集转换汇总\原始任务标签整理\行人识别"
+    output_root = r"D:\数据集转换汇总\行人识别标签VOC格式"
+    data_root = None
+
+    main(label_root, output_root, direction='yolo2voc', data_root=data_root)
+    print("处理完成，所有标签已保存至", output_root)
@@ -0,0 +1,315 @@
+import os
+import re
+import sys
+import csv
+import time
+import importlib.util
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# 迁移方向：源模态 -> 目标模态（'aps' 或 'evs'），以及源标签和输出标签的格式（'yolo' 或 'voc'）
+SOURCE = 'aps'
+TARGET = 'evs'
+SOURCE_FORMAT = 'yolo'
+TARGET_FORMAT = 'yolo'
+
+# 两个模态的分辨率，APS 正好是 EVS 的 4 倍
+MODALITY_SIZE = {'aps': (3264, 2448), 'evs': (816, 612)}
+# 写出标签时使用的文件名前缀，帧编号沿用源文件的位数
+MODALITY_PREFIX = {'aps': '3264_2448_10_', 'evs': '816_612_8_'}
+
+# 标定文件（与 006 检查的文件相同，位于原始数据的视频号文件夹下），按顺序查找偏移量
+CALIBRATION_FILES = ("DeviceCfg.txt", "ApsEvsInfo.txt")
+# 偏移量的键名（不区分大小写），数值以 EVS 像素为单位：evs = aps / 4 + 偏移
+OFFSET_KEYS = {
+    'x': ('aps_evs_offset_x', 'evs_offset_x', 'offset_x', 'offsetx', 'dx'),
+    'y': ('aps_evs_offset_y', 'evs_offset_y', 'offset_y', 'offsety', 'dy'),
+}
+
+# 迁移后的框与目标模态已有标签匹配 IOU 低于该值时记为不一致
+DISAGREE_IOU = 0.5
+REPORT_NAME = "迁移标签与已有标签不一致.csv"
+
+frame_pattern = re.compile(r'^(.*?)(\d+)\.(txt|xml)$')
+calibration_pattern = re.compile(r'^\s*([A-Za-z_][\w.]*)\s*[:=]\s*(-?\d+(?:\.\d+)?)')
+
+
+def load_script(name, filename):
+    """加载同目录下的编号脚本"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+converter = load_script("label_converter", "039_YOLO与VOC标签批量互转.py")
+box_index = load_script("box_index", "037_矩形框网格空间索引.py")
+
+
+def read_calibration(video_dir):
+    """
+    从 DeviceCfg.txt / ApsEvsInfo.txt 中读取 APS 到 EVS 的偏移量
+
+    Returns:
+        tuple: (dx, dy, 来源文件名)，没有标定文件或其中没有偏移量时返回 (0, 0, None)
+    """
+    if not video_dir:
+        return 0.0, 0.0, None
+    lookup = {key: axis for axis, keys in OFFSET_KEYS.items() for key in keys}
+    for filename in CALIBRATION_FILES:
+        path = os.path.join(video_dir, filename)
+        if not os.path.isfile(path):
+            continue
+        offset = {}
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                match = calibration_pattern.match(line)
+                if match and match.group(1).lower() in lookup:
+                    offset.setdefault(lookup[match.group(1).lower()], float(match.group(2)))
+        if offset:
+            return offset.get('x', 0.0), offset.get('y', 0.0), filename
+    return 0.0, 0.0, None
+
+
+def load_labels(label_dir, label_format, modality):
+    """
+    读取一个模态文件夹中的全部标签，所有帧的框拼成一个数组
+
+    Returns:
+        dict: frames（帧编号 -> 文件名）、frame_ids、names（类别名数组）、boxes（像素坐标 (N, 4)）、width（帧编号位数）
+    """
+    suffix = '.txt' if label_format == 'yolo' else '.xml'
+    width, height = MODALITY_SIZE[modality]
+    frames, frame_ids, names, boxes = {}, [], [], []
+    digits = 10
+    if os.path.isdir(label_dir):
+        for filename in sorted(os.listdir(label_dir)):
+            match = frame_pattern.match(filename)
+            if not match or not filename.endswith(suffix):
+                continue
+            number = int(match.group(2))
+            digits = len(match.group(2))
+            path = os.path.join(label_dir, filename)
+            if label_format == 'yolo':
+                rows = converter.parse_yolo_text(converter.read_text(path))
+                class_names = converter.CLASS_NAMES
+                names.extend(class_names[c] if 0 <= c < len(class_names) else str(c)
+                             for c in rows[:, 0].astype(np.int64).tolist())
+                centers, half = rows[:, 1:3], rows[:, 3:5] / 2
+                file_boxes = np.hstack([centers - half, centers + half]) * [width, height, width, height]
+            else:
+                try:
+                    _, file_names, file_boxes = converter.read_voc(path)
+                except (ET.ParseError, TypeError, ValueError) as e:
+                    print(f"警告: 无法解析标签 {path}: {e}")
+                    continue
+                names.extend(file_names)
+                file_boxes = np.array(file_boxes, dtype=np.float64).reshape(-1, 4)
+            frames[number] = filename
+            frame_ids.append(np.full(len(file_boxes), number))
+            boxes.append(file_boxes)
+    frame_ids = np.concatenate(frame_ids) if frame_ids else np.empty(0, np.int64)
+    order = np.argsort(frame_ids, kind='stable')
+    return {
+        'frames': frames,
+        'frame_ids': frame_ids[order],
+        'names': np.array(names, dtype=object)[order],
+        'boxes': (np.concatenate(boxes) if boxes else np.empty((0, 4)))[order],
+        'width': digits,
+    }
+
+
+def transfer_boxes(boxes, source, target, dx=0.0, dy=0.0):
+    """
+    把整段视频的框一次换算到目标模态的像素坐标并裁剪到画面内
+
+    Args:
+        boxes: 源模态像素坐标 (N, 4)
+        dx, dy: 标定偏移（EVS 像素）
+    """
+    src_w, src_h = MODALITY_SIZE[source]
+    dst_w, dst_h = MODALITY_SIZE[target]
+    scale = np.array([dst_w / src_w, dst_h / src_h] * 2)
+    offset = np.array([dx, dy, dx, dy])
+    if source == 'aps' and target == 'evs':
+        moved = boxes * scale + offset
+    elif source == 'evs' and target == 'aps':
+        moved = (boxes - offset) * scale
+    else:
+        moved = boxes * scale
+    return np.clip(moved, 0, [dst_w, dst_h, dst_w, dst_h])
+
+
+def frame_bounds(frame_ids, frame_numbers):
+    """frame_ids 已排序，返回每个帧编号对应的框在数组中的起止位置"""
+    return np.searchsorted(frame_ids, frame_numbers, 'left'), np.searchsorted(frame_ids, frame_numbers, 'right')
+
+
+def write_labels(output_dir, frame_ids, names, boxes, frame_numbers, digits, label_format, target):
+    """
+    按帧分组写出目标模态的标签，源模态中没有框的帧也写出空标签
+
+    Returns:
+        int: 写 YOLO 时因不在类别列表中而跳过的框数
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    width, height = MODALITY_SIZE[target]
+    prefix = MODALITY_PREFIX[target]
+    skipped = 0
+    if label_format == 'yolo':
+        class_ids = {name: i for i, name in enumerate(converter.CLASS_NAMES)}
+        ids = np.array([class_ids.get(n, int(n) if n.isdigit() else -1) for n in names], dtype=np.int64)
+        keep = ids >= 0
+        skipped = int((~keep).sum())
+        rows = np.column_stack([ids, (boxes[:, :2] + boxes[:, 2:]) / 2 / [width, height],
+                                (boxes[:, 2:] - boxes[:, :2]) / [width, height]])[keep]
+        frame_ids = frame_ids[keep]
+    else:
+        corners = np.round(boxes).astype(np.int64).tolist()
+        escaped = [converter.escape(str(n)) for n in names]
+
+    for number, start, end in zip(frame_numbers, *frame_bounds(frame_ids, frame_numbers)):
+        stem = f"{prefix}{str(number).zfill(digits)}"
+        if label_format == 'yolo':
+            file_rows = rows[start:end]
+            with open(os.path.join(output_dir, stem + '.txt'), 'w', encoding='utf-8') as f:
+                f.write((converter.YOLO_LINE * len(file_rows)) % tuple(file_rows.ravel().tolist()))
+        else:
+            parts = [converter.VOC_HEADER.format(folder=target, filename=stem + '.png', width=width, height=height)]
+            for j in range(start, end):
+                xmin, ymin, xmax, ymax = corners[j]
+                parts.append(converter.VOC_OBJECT.format(name=escaped[j], xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax))
+            parts.append("</annotation>\n")
+            with open(os.path.join(output_dir, stem + '.xml'), 'w', encoding='utf-8') as f:
+                f.write(''.join(parts))
+    return skipped
+
+
+def compare_frame(moved_names, moved_boxes, existing_names, existing_boxes):
+    """
+    用 IOU 矩阵和线性分配把迁移后的框与已有标签一一对应
+
+    Returns:
+        dict: 匹配数、最小 IOU、类别不一致数
+    """
+    if not len(moved_boxes) or not len(existing_boxes):
+        return {'matched': 0, 'min_iou': 0.0, 'class_mismatch': 0}
+    iou = box_index.iou_matrix(moved_boxes, existing_boxes)
+    rows, cols = linear_sum_assignment(iou, maximize=True)
+    matched = iou[rows, cols] > 0
+    rows, cols = rows[matched], cols[matched]
+    return {
+        'matched': len(rows),
+        'min_iou': float(iou[rows, cols].min()) if len(rows) else 0.0,
+        'class_mismatch': int((moved_names[rows] != existing_names[cols]).sum()),
+    }
+
+
+def transfer_video(video_id, label_root, output_root, data_root, source, target, source_format, target_format):
+    """
+    迁移一个视频的标签，并与目标模态已有的标签逐帧比较
+
+    Returns:
+        dict: 统计信息和不一致的帧
+    """
+    start = time.perf_counter()
+    src = load_labels(os.path.join(label_root, video_id, source), source_format, source)
+    dx, dy, calibration = read_calibration(os.path.join(data_root, video_id) if data_root else None)
+    moved = transfer_boxes(src['boxes'], source, target, dx, dy)
+    frame_numbers = sorted(src['frames'])
+    skipped = write_labels(os.path.join(output_root, video_id, target), src['frame_ids'], src['names'], moved,
+                           frame_numbers, src['width'], target_format, target)
+
+    # 与目标模态已有标签比较，两种格式都读取，优先使用与输出格式相同的
+    disagreements = []
+    existing = load_labels(os.path.join(label_root, video_id, target), target_format, target)
+    if not existing['frames']:
+        other = 'voc' if target_format == 'yolo' else 'yolo'
+        existing = load_labels(os.path.join(label_root, video_id, target), other, target)
+    if existing['frames']:
+        src_bounds = frame_bounds(src['frame_ids'], frame_numbers)
+        dst_bounds = frame_bounds(existing['frame_ids'], frame_numbers)
+        for i, number in enumerate(frame_numbers):
+            if number not in existing['frames']:
+                continue
+            a, b = src_bounds[0][i], src_bounds[1][i]
+            c, d = dst_bounds[0][i], dst_bounds[1][i]
+            result = compare_frame(src['names'][a:b], moved[a:b], existing['names'][c:d], existing['boxes'][c:d])
+            if b - a != d - c or result['class_mismatch'] or (result['matched'] and result['min_iou'] < DISAGREE_IOU) \
+                    or result['matched'] < min(b - a, d - c):
+                disagreements.append({
+                    'video': video_id, 'frame': number, 'transferred': b - a, 'existing': d - c,
+                    'matched': result['matched'], 'min_iou': round(result['min_iou'], 3),
+                    'class_mismatch': result['class_mismatch'],
+                })
+
+    return {
+        'video_id': video_id,
+        'frames': len(frame_numbers),
+        'boxes': len(moved),
+        'skipped': skipped,
+        'offset': (dx, dy, calibration),
+        'compared': len(set(frame_numbers) & set(existing['frames'])),
+        'disagreements': disagreements,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main(label_root, output_root, data_root=None, source=SOURCE, target=TARGET, source_format=SOURCE_FORMAT,
+         target_format=TARGET_FORMAT, workers=None):
+    """
+    主函数：每个视频一个任务，在进程池中把源模态标签迁移到目标模态
+
+    参数:
+        label_root (str): 标签根目录（Label/<视频号>/aps|evs/）
+        output_root (str): 输出根目录，迁移结果写到 <视频号>/<目标模态>/ 下，不改动原标签
+        data_root (str): 原始数据根目录（<视频号>/DeviceCfg.txt），为 None 时不使用标定偏移
+        source, target (str): 'aps' 或 'evs'
+        source_format, target_format (str): 'yolo' 或 'voc'
+        workers (int): 进程数，默认使用全部 CPU
+    """
+    workers = workers or os.cpu_count() or 1
+    video_ids = sorted(d for d in os.listdir(label_root)
+                       if os.path.isdir(os.path.join(label_root, d, source)))
+    print(f"共 {len(video_ids)} 个视频，{source}({source_format}) -> {target}({target_format})，使用 {workers} 个进程")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(transfer_video, video_id, label_root, output_root, data_root, source, target,
+                                   source_format, target_format) for video_id in video_ids]
+        for future in as_completed(futures):
+            stats = future.result()
+            results.append(stats)
+            dx, dy, calibration = stats['offset']
+            offset_text = f"标定偏移 ({dx:g}, {dy:g}) 来自 {calibration}" if calibration else "无标定偏移"
+            print(f"完成视频 {stats['video_id']}: {stats['frames']} 帧，{stats['boxes']} 个框，{offset_text}，"
+                  f"与已有标签比较 {stats['compared']} 帧，不一致 {len(stats['disagreements'])} 帧"
+                  + (f"，跳过不在类别列表中的框 {stats['skipped']} 个" if stats['skipped'] else ""))
+
+    disagreements = [row for stats in sorted(results, key=lambda r: r['video_id']) for row in stats['disagreements']]
+    print(f"\n共迁移 {sum(r['frames'] for r in results)} 帧，{sum(r['boxes'] for r in results)} 个框")
+    if disagreements:
+        os.makedirs(output_root, exist_ok=True)
+        report_path = os.path.join(output_root, REPORT_NAME)
+        with open(report_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(disagreements[0]))
+            writer.writeheader()
+            writer.writerows(disagreements)
+        print(f"与已有 {target} 标签不一致的帧共 {len(disagreements)} 个，明细见 {report_path}")
+    else:
+        print(f"迁移结果与已有 {target} 标签没有不一致")
+
+
+# 运行程序
+if __name__ == "__main__":
+    label_root = r"D:\数据集转换汇总\原始任务标签整理\行人识别"
+    output_root = r"D:\数据集转换汇总\行人识别APS标签迁移到EVS"
+    data_root = None
+
+    main(label_root, output_root, data_root=data_root)
+    print("处理完成，迁移后的标签已保存至", output_root)
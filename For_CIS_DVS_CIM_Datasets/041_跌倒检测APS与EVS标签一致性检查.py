@@ -0,0 +1,210 @@
+import os
+import re
+import sys
+import csv
+import time
+import importlib.util
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# EVS 分辨率，APS 框统一换算到 EVS 像素坐标后再比较
+EVS_SIZE = (816, 612)
+# XML 中没有 <size> 时按 APS 3264x2448 换算
+DEFAULT_APS_SIZE = (3264, 2448)
+# 配对的框 IOU 低于该值时记为可疑
+IOU_THRESHOLD = 0.5
+# 控制台打印的可疑帧数，完整列表写入 CSV
+TOP_N = 50
+REPORT_NAME = "跌倒检测APS与EVS标签不一致帧.csv"
+
+frame_pattern = re.compile(r'_(\d+)\.xml$')
+
+
+def load_script(name, filename):
+    """加载同目录下的编号脚本"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+converter = load_script("label_converter", "039_YOLO与VOC标签批量互转.py")
+box_index = load_script("box_index", "037_矩形框网格空间索引.py")
+
+
+def load_modality(label_dir, default_size=None):
+    """
+    读取一个模态文件夹中的全部 VOC 标签，换算到 EVS 像素坐标后按帧编号排序拼成数组
+
+    Args:
+        label_dir: 标签文件夹（<视频号>/aps 或 <视频号>/evs）
+        default_size: XML 中没有 <size> 时使用的原图尺寸，None 表示不换算
+
+    Returns:
+        dict: frames（有标签文件的帧编号数组）、frame_ids、names、boxes (N, 4)、errors（无法解析的文件）
+    """
+    frames, frame_ids, names, boxes, errors = [], [], [], [], []
+    if os.path.isdir(label_dir):
+        for entry in os.scandir(label_dir):
+            match = frame_pattern.search(entry.name)
+            if not match:
+                continue
+            try:
+                size, file_names, file_boxes = converter.read_voc(entry.path)
+            except (ET.ParseError, TypeError, ValueError):
+                errors.append(entry.name)
+                continue
+            number = int(match.group(1))
+            file_boxes = np.array(file_boxes, dtype=np.float64).reshape(-1, 4)
+            size = size or default_size
+            if size:
+                file_boxes *= [EVS_SIZE[0] / size[0], EVS_SIZE[1] / size[1]] * 2
+            frames.append(number)
+            frame_ids.append(np.full(len(file_boxes), number, dtype=np.int64))
+            names.extend(file_names)
+            boxes.append(file_boxes)
+    frame_ids = np.concatenate(frame_ids) if frame_ids else np.empty(0, np.int64)
+    order = np.argsort(frame_ids, kind='stable')
+    return {
+        'frames': np.array(sorted(frames), dtype=np.int64),
+        'frame_ids': frame_ids[order],
+        'names': np.array(names, dtype=object)[order],
+        'boxes': (np.concatenate(boxes) if boxes else np.empty((0, 4)))[order],
+        'errors': errors,
+    }
+
+
+def frame_bounds(frame_ids, frame_numbers):
+    """frame_ids 已排序，返回每个帧编号对应的框在数组中的起止位置"""
+    return np.searchsorted(frame_ids, frame_numbers, 'left'), np.searchsorted(frame_ids, frame_numbers, 'right')
+
+
+def match_frames(aps, evs, frame_numbers):
+    """
+    逐帧配对两个模态的框：两边都只有一个框的帧（最常见的情况）整段视频一次向量化计算 IOU，
+    其余帧用 IOU 矩阵和线性分配
+
+    Returns:
+        tuple: (每帧 APS 框数, EVS 框数, 配对数, 最小配对 IOU, 类别不一致数)
+    """
+    a_start, a_end = frame_bounds(aps['frame_ids'], frame_numbers)
+    e_start, e_end = frame_bounds(evs['frame_ids'], frame_numbers)
+    aps_count, evs_count = a_end - a_start, e_end - e_start
+    matched = np.minimum(aps_count, evs_count)
+    min_iou = np.ones(len(frame_numbers))
+    class_mismatch = np.zeros(len(frame_numbers), dtype=np.int64)
+
+    single = (aps_count == 1) & (evs_count == 1)
+    min_iou[single] = box_index.pair_iou(aps['boxes'][a_start[single]], evs['boxes'][e_start[single]])
+    class_mismatch[single] = aps['names'][a_start[single]] != evs['names'][e_start[single]]
+
+    for i in np.flatnonzero(~single & (matched > 0)):
+        iou = box_index.iou_matrix(aps['boxes'][a_start[i]:a_end[i]], evs['boxes'][e_start[i]:e_end[i]])
+        rows, cols = linear_sum_assignment(iou, maximize=True)
+        min_iou[i] = iou[rows, cols].min()
+        class_mismatch[i] = (aps['names'][a_start[i] + rows] != evs['names'][e_start[i] + cols]).sum()
+    min_iou[matched == 0] = 0.0
+    return aps_count, evs_count, matched, min_iou, class_mismatch
+
+
+def check_video(video_id, label_root, iou_threshold=IOU_THRESHOLD):
+    """
+    检查一个视频的 APS 与 EVS 标签是否一致
+
+    Returns:
+        dict: 统计信息和可疑帧列表
+    """
+    start = time.perf_counter()
+    aps = load_modality(os.path.join(label_root, video_id, 'aps'), DEFAULT_APS_SIZE)
+    evs = load_modality(os.path.join(label_root, video_id, 'evs'))
+    frame_numbers = np.intersect1d(aps['frames'], evs['frames'])
+
+    aps_count, evs_count, matched, min_iou, class_mismatch = match_frames(aps, evs, frame_numbers)
+    count_diff = np.abs(aps_count - evs_count)
+    low_iou = (matched > 0) & (min_iou < iou_threshold)
+    suspect = (count_diff > 0) | (class_mismatch > 0) | low_iou
+    # 可疑程度：数量差和类别不一致各计 1 分，加上最差配对的 1 - IOU
+    score = count_diff + class_mismatch + np.where(matched > 0, 1 - min_iou, 0)
+
+    suspects = [{
+        'video': video_id, 'frame': int(n), 'score': round(float(s), 3), 'aps_boxes': int(a), 'evs_boxes': int(e),
+        'class_mismatch': int(c), 'min_iou': round(float(m), 3) if k else '',
+    } for n, s, a, e, c, m, k in zip(frame_numbers[suspect], score[suspect], aps_count[suspect], evs_count[suspect],
+                                     class_mismatch[suspect], min_iou[suspect], matched[suspect])]
+    return {
+        'video_id': video_id,
+        'compared': len(frame_numbers),
+        'only_aps': len(np.setdiff1d(aps['frames'], evs['frames'])),
+        'only_evs': len(np.setdiff1d(evs['frames'], aps['frames'])),
+        'errors': [os.path.join(video_id, 'aps', f) for f in aps['errors']] +
+                  [os.path.join(video_id, 'evs', f) for f in evs['errors']],
+        'suspects': suspects,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def main(label_root, output_dir, iou_threshold=IOU_THRESHOLD, workers=None):
+    """
+    主函数：每个视频一个任务，在进程池中并行检查，最后按可疑程度排序输出
+
+    参数:
+        label_root (str): 跌倒检测标签根目录（<视频号>/aps|evs/*.xml）
+        output_dir (str): 可疑帧 CSV 的输出目录
+        iou_threshold (float): 配对框的 IOU 阈值
+        workers (int): 进程数，默认使用全部 CPU
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    video_ids = sorted(d for d in os.listdir(label_root) if os.path.isdir(os.path.join(label_root, d)))
+    print(f"共 {len(video_ids)} 个视频，使用 {workers} 个进程")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(check_video, video_id, label_root, iou_threshold) for video_id in video_ids]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    suspects = sorted((row for stats in results for row in stats['suspects']),
+                      key=lambda r: (-r['score'], r['video'], r['frame']))
+    compared = sum(r['compared'] for r in results)
+    print(f"共比较 {compared} 帧，可疑 {len(suspects)} 帧，用时 {time.perf_counter() - start:.1f} 秒")
+
+    print("\n=== 只有一个模态有标签的视频 ===")
+    one_sided = [r for r in sorted(results, key=lambda r: r['video_id']) if r['only_aps'] or r['only_evs']]
+    for stats in one_sided:
+        print(f"- {stats['video_id']}: 只有 APS {stats['only_aps']} 帧，只有 EVS {stats['only_evs']} 帧")
+    if not one_sided:
+        print("无")
+
+    errors = [path for stats in results for path in stats['errors']]
+    if errors:
+        print(f"\n无法解析的标签 {len(errors)} 个:")
+        for path in sorted(errors):
+            print(f"- {path}")
+
+    print(f"\n=== 最可疑的 {min(TOP_N, len(suspects))} 帧 ===")
+    for row in suspects[:TOP_N]:
+        print(f"- {row['video']} 帧 {row['frame']}: 得分 {row['score']}，APS {row['aps_boxes']} 个框，"
+              f"EVS {row['evs_boxes']} 个框，类别不一致 {row['class_mismatch']}，最小 IOU {row['min_iou']}")
+
+    if suspects:
+        os.makedirs(output_dir, exist_ok=True)
+        report_path = os.path.join(output_dir, REPORT_NAME)
+        with open(report_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(suspects[0]))
+            writer.writeheader()
+            writer.writerows(suspects)
+        print(f"\n完整列表已保存至 {report_path}")
+
+
+# 运行程序
+if __name__ == "__main__":
+    label_root = r"D:\数据集转换汇总\原始任务标签整理\跌倒"
+    output_dir = "Report"
+
+    main(label_root, output_dir)
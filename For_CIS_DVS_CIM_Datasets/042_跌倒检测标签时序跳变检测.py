@@ -0,0 +1,275 @@
+import os
+import sys
+import csv
+import time
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# 检查的模态
+MODALITIES = ('aps', 'evs')
+# 相邻两帧的框 IOU 不低于该值时认为是同一个人
+LINK_IOU = 0.1
+# 中间帧的框偏离前后两帧框的中点超过该值时记为框跳变。偏离 = 中心距离 / 中点框边长 + |ln(边长比)|，
+# 不像 1 - IOU 那样在框完全错开后饱和为 1，跳变帧的得分总是高于被它带偏的相邻帧；
+# 匀速运动（包括快速跌倒）的中点预测误差很小
+JITTER_THRESHOLD = 0.5
+# 控制台打印的条目数，完整列表写入 CSV
+TOP_N = 50
+REPORT_NAME = "跌倒检测标签时序跳变待审核.csv"
+
+
+def load_script(name, filename):
+    """加载同目录下的编号脚本"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+consistency = load_script("aps_evs_consistency", "041_跌倒检测APS与EVS标签一致性检查.py")
+box_index = consistency.box_index
+
+
+def link_boxes(data, link_iou=LINK_IOU):
+    """
+    关联相邻帧（帧编号相差 1）的框：两帧都只有一个框时整段视频一次向量化计算 IOU，其余帧用线性分配
+
+    Returns:
+        numpy.ndarray: 每个框在上一帧中对应的框序号，没有对应时为 -1
+    """
+    frame_ids, boxes = data['frame_ids'], data['boxes']
+    prev = np.full(len(boxes), -1, dtype=np.int64)
+    frames = data['frames']
+    if len(frames) < 2:
+        return prev
+    starts = frames[:-1][np.diff(frames) == 1]
+    s0, e0 = consistency.frame_bounds(frame_ids, starts)
+    s1, e1 = consistency.frame_bounds(frame_ids, starts + 1)
+
+    single = (e0 - s0 == 1) & (e1 - s1 == 1)
+    iou = box_index.pair_iou(boxes[s0[single]], boxes[s1[single]])
+    linked = iou >= link_iou
+    prev[s1[single][linked]] = s0[single][linked]
+
+    for i in np.flatnonzero(~single & (e0 > s0) & (e1 > s1)):
+        iou = box_index.iou_matrix(boxes[s0[i]:e0[i]], boxes[s1[i]:e1[i]])
+        rows, cols = linear_sum_assignment(iou, maximize=True)
+        keep = iou[rows, cols] >= link_iou
+        prev[s1[i] + cols[keep]] = s0[i] + rows[keep]
+    return bridge_jumps(data, prev, link_iou)
+
+
+def box_centers(boxes):
+    """[xmin, ymin, xmax, ymax] -> 中心点 (N, 2)"""
+    return (boxes[:, :2] + boxes[:, 2:]) / 2
+
+
+def bridge_jumps(data, prev, link_iou=LINK_IOU):
+    """
+    框在某一帧整体跳开时与前后帧都没有交集，轨迹会在这一帧断开。对有孤立框（前后都没有对应）的帧，
+    把上一帧轨迹的末尾与下一帧轨迹的开头按 IOU 配对，再把离两者中点最近的孤立框接入轨迹，
+    这样跳变的框也会作为中间框参与评分。按帧顺序处理，每接入一帧都更新前后指针，
+    连续几帧都有孤立框时，已接入的框不会在下一帧再被当作轨迹末尾（一个框只有一个后继）
+    """
+    frame_ids, boxes = data['frame_ids'], data['boxes']
+    nxt = np.full(len(prev), -1, dtype=np.int64)
+    has_prev = np.flatnonzero(prev >= 0)
+    nxt[prev[has_prev]] = has_prev
+    orphans = np.flatnonzero((prev < 0) & (nxt < 0))
+    for frame in np.unique(frame_ids[orphans]):
+        s0, e0 = consistency.frame_bounds(frame_ids, frame - 1)
+        s1, e1 = consistency.frame_bounds(frame_ids, frame)
+        s2, e2 = consistency.frame_bounds(frame_ids, frame + 1)
+        ends = s0 + np.flatnonzero(nxt[s0:e0] < 0)
+        begins = s2 + np.flatnonzero(prev[s2:e2] < 0)
+        candidates = s1 + np.flatnonzero((prev[s1:e1] < 0) & (nxt[s1:e1] < 0))
+        if not len(ends) or not len(begins) or not len(candidates):
+            continue
+        iou = box_index.iou_matrix(boxes[ends], boxes[begins])
+        rows, cols = linear_sum_assignment(iou, maximize=True)
+        keep = iou[rows, cols] >= link_iou
+        a, c = ends[rows[keep]], begins[cols[keep]]
+        if not len(a):
+            continue
+        midpoint = (box_centers(boxes[a]) + box_centers(boxes[c])) / 2
+        distance = np.linalg.norm(midpoint[:, None] - box_centers(boxes[candidates])[None], axis=2)
+        rows, cols = linear_sum_assignment(distance)
+        linked = candidates[cols]
+        prev[linked], nxt[a[rows]] = a[rows], linked
+        prev[c[rows]], nxt[linked] = linked, c[rows]
+    return prev
+
+
+def jitter_score(boxes, predicted):
+    """框相对中点预测框的偏离：中心距离按预测框边长（面积开方）归一化，加上边长比的对数"""
+    side = np.sqrt(np.maximum((boxes[:, 2:] - boxes[:, :2]).prod(axis=1), 1e-6))
+    predicted_side = np.sqrt(np.maximum((predicted[:, 2:] - predicted[:, :2]).prod(axis=1), 1e-6))
+    offset = np.linalg.norm(box_centers(boxes) - box_centers(predicted), axis=1) / predicted_side
+    return offset + np.abs(np.log(side / predicted_side))
+
+
+def suppress_neighbors(mid, p, n, jitter, candidates):
+    """按得分从高到低接受跳变帧，已接受帧的前后两个框不再上报，一次跳变只输出一条"""
+    accepted = np.zeros(len(mid), dtype=bool)
+    blocked = set()
+    for i in sorted(np.flatnonzero(candidates), key=lambda i: (-jitter[i], mid[i])):
+        if mid[i] in blocked:
+            continue
+        accepted[i] = True
+        blocked.update((mid[i], p[i], n[i]))
+    return accepted
+
+
+def track_ids(prev):
+    """沿 prev 指针倍增找到每个框所在轨迹的第一个框，作为轨迹编号"""
+    root = np.where(prev >= 0, prev, np.arange(len(prev)))
+    while True:
+        next_root = root[root]
+        if np.array_equal(next_root, root):
+            return root
+        root = next_root
+
+
+def score_video(data, link_iou=LINK_IOU, jitter_threshold=JITTER_THRESHOLD):
+    """
+    在整段视频上一次计算类别闪变和框跳变：只看前后都有对应框的中间框
+
+    Returns:
+        list: 待审核条目
+    """
+    prev = link_boxes(data, link_iou)
+    nxt = np.full(len(prev), -1, dtype=np.int64)
+    has_prev = np.flatnonzero(prev >= 0)
+    nxt[prev[has_prev]] = has_prev
+    tracks = track_ids(prev)
+
+    mid = np.flatnonzero((prev >= 0) & (nxt >= 0))
+    p, n = prev[mid], nxt[mid]
+    names, boxes, frame_ids = data['names'], data['boxes'], data['frame_ids']
+    flip = (names[p] == names[n]) & (names[mid] != names[p])
+    jitter = jitter_score(boxes[mid], (boxes[p] + boxes[n]) / 2)
+    # 跳变的框会让前后两帧的中点预测也偏离（约为跳变帧得分的一半），只保留得分最高的那一帧
+    jump = suppress_neighbors(mid, p, n, jitter, jitter > jitter_threshold)
+
+    issues = []
+    for j, before, after in zip(mid[flip], p[flip], n[flip]):
+        issues.append({'frame': int(frame_ids[j]), 'type': 'class_flip', 'track': int(tracks[j]), 'score': 1.0,
+                       'detail': f"{names[before]} -> {names[j]} -> {names[after]}"})
+    for j, score in zip(mid[jump], jitter[jump]):
+        issues.append({'frame': int(frame_ids[j]), 'type': 'box_jump', 'track': int(tracks[j]),
+                       'score': round(float(score), 3),
+                       'detail': ' '.join(f"{v:.0f}" for v in boxes[j])})
+    return issues
+
+
+def check_video(video_id, label_root, modalities=MODALITIES):
+    """检查一个视频各个模态的时序跳变"""
+    start = time.perf_counter()
+    issues = []
+    frames = 0
+    for modality in modalities:
+        data = consistency.load_modality(os.path.join(label_root, video_id, modality))
+        frames += len(data['frames'])
+        for issue in score_video(data):
+            issues.append(dict(video=video_id, modality=modality, **issue))
+    return {'video_id': video_id, 'frames': frames, 'issues': issues, 'seconds': time.perf_counter() - start}
+
+
+def main(label_root, output_dir, modalities=MODALITIES, workers=None):
+    """
+    主函数：每个视频一个任务，在进程池中检查类别闪变和框跳变，输出按得分排序的待审核列表
+
+    参数:
+        label_root (str): 跌倒检测标签根目录（<视频号>/aps|evs/*.xml）
+        output_dir (str): 待审核列表 CSV 的输出目录
+        modalities (tuple): 检查的模态
+        workers (int): 进程数，默认使用全部 CPU
+
+    返回:
+        int: 待审核条目数，可作为交付检查的结果
+    """
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    video_ids = sorted(d for d in os.listdir(label_root) if os.path.isdir(os.path.join(label_root, d)))
+    print(f"共 {len(video_ids)} 个视频，使用 {workers} 个进程")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(check_video, video_id, label_root, modalities) for video_id in video_ids]
+        for future in as_completed(futures):
+            results.append(future.result())
+
+    issues = sorted((row for stats in results for row in stats['issues']),
+                    key=lambda r: (-r['score'], r['video'], r['modality'], r['frame']))
+    flips = sum(1 for r in issues if r['type'] == 'class_flip')
+    print(f"共检查 {sum(r['frames'] for r in results)} 帧，类别闪变 {flips} 处，框跳变 {len(issues) - flips} 处，"
+          f"用时 {time.perf_counter() - start:.1f} 秒")
+
+    print("\n=== 跳变最多的视频 ===")
+    ranked = sorted((r for r in results if r['issues']), key=lambda r: len(r['issues']), reverse=True)
+    for stats in ranked[:20]:
+        print(f"- {stats['video_id']}: {len(stats['issues'])} 处")
+    if not ranked:
+        print("无")
+
+    if issues:
+        print(f"\n=== 得分最高的 {min(TOP_N, len(issues))} 处 ===")
+        for row in issues[:TOP_N]:
+            print(f"- {row['video']}/{row['modality']} 帧 {row['frame']} 轨迹 {row['track']}: "
+                  f"{row['type']} {row['detail']}（得分 {row['score']}）")
+        os.makedirs(output_dir, exist_ok=True)
+        report_path = os.path.join(output_dir, REPORT_NAME)
+        fields = ['video', 'modality', 'frame', 'type', 'score', 'track', 'detail']
+        with open(report_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(issues)
+        print(f"\n完整待审核列表已保存至 {report_path}")
+    return len(issues)
+
+
+def synthetic_track(jumps, frames=13):
+    """匀速运动的单个框，jumps 为 {帧编号: 跳变后的框}"""
+    boxes = np.array([jumps.get(i, [10 + 5 * i, 100, 60 + 5 * i, 200]) for i in range(frames)], dtype=np.float64)
+    frame_ids = np.arange(frames)
+    return {'frames': frame_ids, 'frame_ids': frame_ids, 'names': np.array(['fall'] * frames, dtype=object),
+            'boxes': boxes}
+
+
+def self_check():
+    """用合成数据回归检查：一次跳变只输出一条；连续几帧有孤立框时每个框最多接入一个后继"""
+    rows = score_video(synthetic_track({6: [400, 100, 450, 200]}))
+    single = [(r['frame'], r['type']) for r in rows] == [(6, 'box_jump')]
+    print(f"单帧跳变只报告第 6 帧: {'是' if single else '否'}")
+
+    data = {'frame_ids': np.array([0, 1, 2, 3, 3, 4]),
+            'boxes': np.array([[0, 0, 10, 10], [2, 0, 12, 10], [100, 100, 110, 110], [6, 0, 16, 10],
+                               [200, 200, 210, 210], [101, 101, 111, 111]], dtype=np.float64)}
+    prev = bridge_jumps(data, np.array([-1, 0, -1, -1, -1, -1]))
+    successors = np.bincount(prev[prev >= 0], minlength=len(prev))
+    consecutive = successors.max() <= 1
+    print(f"连续两帧有孤立框时每个框最多一个后继: {'是' if consecutive else '否'}（{prev.tolist()}）")
+
+    rows = score_video(synthetic_track({6: [400, 100, 450, 200], 7: [45, 400, 95, 500]}))
+    frames = [r['frame'] for r in rows]
+    repeated = len(frames) == len(set(frames))
+    print(f"连续两帧跳变不重复报告: {'是' if repeated else '否'}（{frames}）")
+    return single and consecutive and repeated
+
+
+# 运行程序
+if __name__ == "__main__":
+    # 先用合成数据检查跳变检测本身，失败时不检查标签
+    if not self_check():
+        sys.exit(2)
+
+    label_root = r"D:\数据集转换汇总\原始任务标签整理\跌倒"
+    output_dir = "Report"
+
+    # 有待审核条目时以非零状态退出，便于作为每批标注交付的检查
+    sys.exit(1 if main(label_root, output_dir) else 0)
@@ -0,0 +1,270 @@
+import os
+import sys
+import csv
+import time
+import importlib.util
+import xml.etree.ElementTree as ET
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# 越界判断的容差（像素），标注工具常把框画到 xmax = 宽度 + 1
+BOUNDS_TOLERANCE = 1.0
+# 宽高比超过该值（或小于其倒数）时判为异常
+MAX_ASPECT = 10.0
+# 面积小于该值（像素²）时判为异常
+MIN_AREA = 4.0
+# 同一类别内面积、宽高比（取对数）的稳健 z 分数超过该值时判为离群
+ROBUST_Z = 3.5
+# 每个类别至少有这么多框才计算稳健 z 分数
+MIN_CLASS_BOXES = 20
+# 直方图的分箱数
+HISTOGRAM_BINS = 20
+
+FLAGGED_NAME = "异常标签框.csv"
+HISTOGRAM_NAME = "标签框几何直方图.csv"
+
+
+def load_script(name, filename):
+    """加载同目录下的编号脚本"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+converter = load_script("label_converter", "039_YOLO与VOC标签批量互转.py")
+
+
+def parse_dir(label_root, relative_dir):
+    """
+    进程池任务：读取一个文件夹中的全部 VOC / YOLO 标签，保留原始坐标（不裁剪、不纠正）
+
+    Returns:
+        dict: files、file_ids、names、boxes（像素 [xmin, ymin, xmax, ymax]）、
+              bounds（每个框所在图片的宽高）、sensor（按文件名或相机推断的传感器分辨率，未知为 0）、errors
+    """
+    directory = os.path.join(label_root, relative_dir)
+    camera = os.path.basename(relative_dir).lower()
+    files, file_ids, names, boxes, bounds, sensor, errors = [], [], [], [], [], [], []
+    counts = Counter()
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(('.xml', '.txt')):
+            continue
+        path = os.path.join(directory, filename)
+        sensor_size = converter.lookup_size(filename, None, camera, counts) or (0, 0)
+        try:
+            if filename.endswith('.xml'):
+                size, file_names, file_boxes = converter.read_voc(path)
+                file_boxes = np.array(file_boxes, dtype=np.float64).reshape(-1, 4)
+                size = size or sensor_size
+            else:
+                if not sensor_size[0]:
+                    # 无法确定分辨率的 YOLO 框仍是归一化坐标，混入像素统计会让规则和分布失真，跳过并报告
+                    errors.append(f"{os.path.join(relative_dir, filename)}: 无法确定图片分辨率，YOLO 坐标无法换算为像素")
+                    continue
+                rows = converter.parse_yolo_text(converter.read_text(path))
+                size = sensor_size
+                file_names = [converter.CLASS_NAMES[c] if 0 <= c < len(converter.CLASS_NAMES) else str(c)
+                              for c in rows[:, 0].astype(np.int64).tolist()]
+                centers, half = rows[:, 1:3], rows[:, 3:5] / 2
+                file_boxes = np.hstack([centers - half, centers + half]) * (list(size) * 2)
+        except (ET.ParseError, TypeError, ValueError) as e:
+            errors.append(f"{os.path.join(relative_dir, filename)}: {e}")
+            continue
+        file_ids.append(np.full(len(file_boxes), len(files), dtype=np.int64))
+        files.append(os.path.join(relative_dir, filename))
+        names.extend(file_names)
+        boxes.append(file_boxes)
+        bounds.append(np.tile(size, (len(file_boxes), 1)))
+        sensor.append(np.tile(sensor_size, (len(file_boxes), 1)))
+    return {
+        'files': files,
+        'file_ids': np.concatenate(file_ids) if file_ids else np.empty(0, np.int64),
+        'names': names,
+        'boxes': np.concatenate(boxes) if boxes else np.empty((0, 4)),
+        'bounds': np.concatenate(bounds).astype(np.float64) if bounds else np.empty((0, 2)),
+        'sensor': np.concatenate(sensor).astype(np.float64) if sensor else np.empty((0, 2)),
+        'errors': errors,
+    }
+
+
+def load_task(label_root, workers=None):
+    """按文件夹并行解析整个任务的标签，拼成一组数组"""
+    relative_dirs = sorted({os.path.relpath(root, label_root) for root, dirs, files in os.walk(label_root)
+                            if any(f.endswith(('.xml', '.txt')) for f in files)})
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        parts = list(executor.map(parse_dir, [label_root] * len(relative_dirs), relative_dirs))
+    offsets = np.cumsum([0] + [len(p['files']) for p in parts])
+    return {
+        'files': [f for p in parts for f in p['files']],
+        'file_ids': np.concatenate([p['file_ids'] + o for p, o in zip(parts, offsets)] or [np.empty(0, np.int64)]),
+        'names': np.array([n for p in parts for n in p['names']], dtype=object),
+        'boxes': np.concatenate([p['boxes'] for p in parts] or [np.empty((0, 4))]),
+        'bounds': np.concatenate([p['bounds'] for p in parts] or [np.empty((0, 2))]),
+        'sensor': np.concatenate([p['sensor'] for p in parts] or [np.empty((0, 2))]),
+        'errors': [e for p in parts for e in p['errors']],
+    }
+
+
+def robust_z(values, groups):
+    """
+    按组计算稳健 z 分数：0.6745 * (x - 中位数) / MAD，组内框数不足 MIN_CLASS_BOXES 或 MAD 为 0 时为 0
+
+    Args:
+        values: (N,) 数组
+        groups: (N,) 组编号（0..G-1）
+    """
+    z = np.zeros(len(values))
+    order = np.argsort(groups, kind='stable')
+    boundaries = np.flatnonzero(np.diff(groups[order])) + 1
+    for idx in np.split(order, boundaries):
+        if len(idx) < MIN_CLASS_BOXES:
+            continue
+        median = np.median(values[idx])
+        mad = np.median(np.abs(values[idx] - median))
+        if mad > 0:
+            z[idx] = 0.6745 * (values[idx] - median) / mad
+    return z
+
+
+def analyse(data):
+    """
+    一次计算所有框的几何量和异常标记
+
+    Returns:
+        dict: 几何量数组、类别编号、各规则的布尔数组和稳健 z 分数
+    """
+    boxes, bounds, sensor = data['boxes'], data['bounds'], data['sensor']
+    width = boxes[:, 2] - boxes[:, 0]
+    height = boxes[:, 3] - boxes[:, 1]
+    area = np.clip(width, 0, None) * np.clip(height, 0, None)
+    valid = (width > 0) & (height > 0)
+    aspect = np.divide(width, height, out=np.zeros_like(width), where=valid)
+    log_area = np.log(np.where(valid, area, 1.0))
+    log_aspect = np.log(np.where(valid, aspect, 1.0))
+    classes, class_ids = np.unique(data['names'].astype(str), return_inverse=True)
+
+    def outside(limit):
+        known = limit[:, 0] > 0
+        return known & ((boxes[:, :2] < -BOUNDS_TOLERANCE).any(1) |
+                        (boxes[:, 2:] > limit + BOUNDS_TOLERANCE).any(1))
+
+    rules = {
+        'zero_area': (width == 0) | (height == 0),
+        'inverted': (width < 0) | (height < 0),
+        'out_of_size': outside(bounds),
+        'out_of_sensor': outside(sensor),
+        'size_mismatch': (sensor[:, 0] > 0) & (bounds != sensor).any(1),
+        'tiny': valid & (area < MIN_AREA),
+        'extreme_aspect': valid & ((aspect > MAX_ASPECT) | (aspect < 1 / MAX_ASPECT)),
+    }
+    z_area = np.where(valid, robust_z(log_area, class_ids), 0)
+    z_aspect = np.where(valid, robust_z(log_aspect, class_ids), 0)
+    rules['area_outlier'] = np.abs(z_area) > ROBUST_Z
+    rules['aspect_outlier'] = np.abs(z_aspect) > ROBUST_Z
+    return {
+        'width': width, 'height': height, 'area': area, 'aspect': aspect, 'valid': valid,
+        'log_area': log_area, 'log_aspect': log_aspect,
+        'classes': classes, 'class_ids': class_ids, 'rules': rules, 'z_area': z_area, 'z_aspect': z_aspect,
+    }
+
+
+def class_histograms(data, result, bins=HISTOGRAM_BINS):
+    """按类别计算面积（log2）、宽高比（log2）和中心位置（归一化）的直方图，返回 CSV 行"""
+    boxes, bounds = data['boxes'], data['bounds']
+    safe_bounds = np.where(bounds > 0, bounds, 1)
+    quantities = {
+        'log2_area': result['log_area'] / np.log(2),
+        'log2_aspect': result['log_aspect'] / np.log(2),
+        'center_x': (boxes[:, 0] + boxes[:, 2]) / 2 / safe_bounds[:, 0],
+        'center_y': (boxes[:, 1] + boxes[:, 3]) / 2 / safe_bounds[:, 1],
+    }
+    rows = []
+    for quantity, values in quantities.items():
+        values = values[result['valid']]
+        class_ids = result['class_ids'][result['valid']]
+        if not len(values):
+            continue
+        # 所有类别共用分箱，便于类别之间比较
+        edges = np.histogram_bin_edges(values, bins=bins)
+        bin_ids = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+        counts = np.zeros((len(result['classes']), bins), dtype=np.int64)
+        np.add.at(counts, (class_ids, bin_ids), 1)
+        for c, class_name in enumerate(result['classes']):
+            for b in np.flatnonzero(counts[c]):
+                rows.append({'class': class_name, 'quantity': quantity, 'bin_left': round(float(edges[b]), 4),
+                             'bin_right': round(float(edges[b + 1]), 4), 'count': int(counts[c, b])})
+    return rows
+
+
+def main(label_root, output_dir, workers=None):
+    """
+    主函数：解析整个任务的标签，计算每个类别的几何统计，导出异常框和直方图
+
+    参数:
+        label_root (str): 任务标签根目录（递归查找 .xml 和 .txt）
+        output_dir (str): 报告输出目录
+        workers (int): 解析标签的进程数，默认使用全部 CPU
+    """
+    start = time.perf_counter()
+    data = load_task(label_root, workers)
+    parsed = time.perf_counter()
+    result = analyse(data)
+    histograms = class_histograms(data, result)
+    analysed = time.perf_counter()
+    print(f"共 {len(data['files'])} 个标签文件，{len(data['boxes'])} 个框；"
+          f"解析 {parsed - start:.1f} 秒，统计 {analysed - parsed:.2f} 秒")
+
+    print("\n=== 各类别框的尺寸（像素） ===")
+    for c, class_name in enumerate(result['classes']):
+        mask = (result['class_ids'] == c) & result['valid']
+        if not mask.any():
+            print(f"- {class_name}: 没有有效的框")
+            continue
+        w5, w50, w95 = np.percentile(result['width'][mask], [5, 50, 95])
+        h5, h50, h95 = np.percentile(result['height'][mask], [5, 50, 95])
+        print(f"- {class_name}: {int(mask.sum())} 个，宽 {w5:.0f}/{w50:.0f}/{w95:.0f}，"
+              f"高 {h5:.0f}/{h50:.0f}/{h95:.0f}（5%/50%/95%），宽高比中位数 {np.median(result['aspect'][mask]):.2f}")
+
+    rule_names = list(result['rules'])
+    flags = np.column_stack([result['rules'][r] for r in rule_names])
+    flagged = np.flatnonzero(flags.any(1))
+    print("\n=== 异常框统计 ===")
+    for i, rule in enumerate(rule_names):
+        print(f"- {rule}: {int(flags[:, i].sum())}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    flagged_path = os.path.join(output_dir, FLAGGED_NAME)
+    with open(flagged_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['file', 'class', 'xmin', 'ymin', 'xmax', 'ymax', 'image_width', 'image_height',
+                         'z_area', 'z_aspect', 'rules'])
+        for i in flagged.tolist():
+            writer.writerow([data['files'][data['file_ids'][i]], data['names'][i],
+                             *(round(float(v), 2) for v in data['boxes'][i]),
+                             *(int(v) for v in data['bounds'][i]),
+                             round(float(result['z_area'][i]), 2), round(float(result['z_aspect'][i]), 2),
+                             ' '.join(r for r, hit in zip(rule_names, flags[i]) if hit)])
+    histogram_path = os.path.join(output_dir, HISTOGRAM_NAME)
+    with open(histogram_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['class', 'quantity', 'bin_left', 'bin_right', 'count'])
+        writer.writeheader()
+        writer.writerows(histograms)
+
+    if data['errors']:
+        print(f"\n无法解析或已跳过的标签 {len(data['errors'])} 个:")
+        for error in data['errors'][:20]:
+            print(f"- {error}")
+    print(f"\n共 {len(flagged)} 个异常框，已导出至 {flagged_path}；直方图已保存至 {histogram_path}")
+
+
+# 运行程序
+if __name__ == "__main__":
+    label_root = r"D:\数据集转换汇总\原始任务标签整理\跌倒"
+    output_dir = "Report"
+
+    main(label_root, output_dir)
@@ -0,0 +1,351 @@
+import os
+import sys
+import csv
+import time
+import heapq
+import importlib.util
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from itertools import groupby
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# 融合任务：任务名 -> 配置。新的合并需求只需在这里加一项，不再单独写脚本
+#   sources: 按优先级排列的标签来源，重复的框保留优先级高的
+#       name: 来源名（用于统计）
+#       root: 标签根目录
+#       format: 'voc'（xml）、'yolo'（txt）或 'csv'（一个文件，列为 video, modality, frame, class, xmin, ymin, xmax, ymax）
+#       layout: 标签文件夹相对 root 的路径模板，可用 {video} 和 {modality}，csv 来源不需要
+#       modalities: 该来源参与的模态，默认参与全部模态
+#       class_names: yolo 来源的类别编号与类别名的对应关系，默认使用 039 的 CLASS_NAMES
+#       default_class: yolo 来源中不在 class_names 范围内的类别编号使用的类别名，默认保留编号本身
+#       rename: 类别名替换，例如 {'crawl': 'fallen'}
+#       keep: 只保留这些类别，None 表示全部保留
+#       required: 为 True 时，该来源参与的模态中只输出该来源有标签的帧
+#   modalities: 要融合的模态
+#   output: 输出根目录和格式（'voc' 或 'yolo'，也可以按模态分别指定），结果写到 <root>/<video>/<modality>/
+#       class_names: 输出 yolo 时类别名与编号的对应关系，默认使用 039 的 CLASS_NAMES；
+#                    不在列表中的类别（类别名本身是数字时按该编号写出）无法写入，计入“丢弃”
+#   dedup_iou: 新框与已保留的框（包括同一来源中排在前面的框）IOU 不低于该值时视为重复
+#   class_rule: 'same_class' 只在同类别之间去重，'any_class' 不区分类别
+JOBS = {
+    # 与 023 相同：RGB 目标识别 VOC 标签 + aps/evs 的 danger 框（023 不看类别编号，所有框都记为 danger）
+    '行人识别与danger合并': {
+        'sources': [
+            {'name': 'rgb', 'root': r"D:\数据集转换汇总\原始任务标签整理\行人识别RGB标签Yolov5已清洗",
+             'format': 'voc', 'layout': '{video}', 'modalities': ('aps',), 'required': True},
+            {'name': 'danger', 'root': r"D:\数据集转换汇总\原始任务标签整理\行人识别",
+             'format': 'yolo', 'layout': '{video}/{modality}', 'class_names': ['danger'], 'default_class': 'danger',
+             'required': True},
+        ],
+        'modalities': ('aps', 'evs'),
+        'output': {'root': r"D:\数据集转换汇总\行人识别任务种类与danger合并", 'format': {'aps': 'voc', 'evs': 'yolo'},
+                   'class_names': ['danger']},
+        'dedup_iou': 0.9,
+        'class_rule': 'same_class',
+    },
+}
+
+MODALITY_SIZE = {'aps': (3264, 2448), 'evs': (816, 612)}
+SOURCE_SUFFIX = {'voc': '.xml', 'yolo': '.txt'}
+
+
+def load_script(name, filename):
+    """加载同目录下的编号脚本"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+box_index = load_script("box_index", "037_矩形框网格空间索引.py")
+converter = load_script("label_converter", "039_YOLO与VOC标签批量互转.py")
+renderer = load_script("renderer", "034_并行分片批量融合标签和图片.py")
+
+
+def join_key(sort_key):
+    """把 034 的排序键 (帧编号, 文件名主干) 转为连接键：有帧编号时只按帧编号连接，不同来源的文件名前缀可以不同"""
+    number, stem = sort_key
+    return (number, '') if number >= 0 else (-1, stem)
+
+
+@lru_cache(maxsize=None)
+def load_csv_source(path):
+    """读取 csv 来源（每个进程只读一次），返回 (video, modality) -> {帧编号: [(类别, [xmin, ymin, xmax, ymax])]}"""
+    table = defaultdict(lambda: defaultdict(list))
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            try:
+                box = [float(row[k]) for k in ('xmin', 'ymin', 'xmax', 'ymax')]
+                table[(row['video'], row['modality'].lower())][int(row['frame'])].append((row['class'], box))
+            except (KeyError, ValueError):
+                continue
+    return {key: dict(frames) for key, frames in table.items()}
+
+
+def source_stream(source, video_id, modality):
+    """
+    一个来源在一个 (视频, 模态) 下的有序键流
+
+    Returns:
+        list: 按连接键排序的 [(连接键, 文件名或帧编号)]
+    """
+    if source.get('modalities') and modality not in source['modalities']:
+        return []
+    if source['format'] == 'csv':
+        frames = load_csv_source(source['root']).get((video_id, modality), {})
+        return [((number, ''), number) for number in sorted(frames)]
+    directory = os.path.join(source['root'], source['layout'].format(video=video_id, modality=modality))
+    return [(join_key(key), name) for key, name in renderer.list_sorted(directory, SOURCE_SUFFIX[source['format']])]
+
+
+def tag_stream(stream, idx):
+    """给键流中的每一项加上来源序号，键相同时按来源优先级排列"""
+    for key, item in stream:
+        yield key, idx, item
+
+
+def join_streams(streams):
+    """
+    N 路有序键流的归并连接（034 merge_join 的多路版本）
+
+    Yields:
+        tuple: (连接键, {来源序号: 文件名或帧编号})
+    """
+    merged = heapq.merge(*[tag_stream(stream, idx) for idx, stream in enumerate(streams)])
+    for key, group in groupby(merged, key=lambda entry: entry[0]):
+        yield key, {idx: item for _, idx, item in group}
+
+
+def read_source(source, video_id, modality, item):
+    """
+    读取一个来源在一帧中的框
+
+    Returns:
+        tuple: (<size> 中的宽高或 None, 类别名列表, (N, 4) 像素坐标数组, 文件名主干或 None)
+    """
+    if source['format'] == 'csv':
+        objects = load_csv_source(source['root'])[(video_id, modality)][item]
+        names = [name for name, _ in objects]
+        boxes = np.array([box for _, box in objects], dtype=np.float64).reshape(-1, 4)
+        size, stem = None, None
+    else:
+        directory = os.path.join(source['root'], source['layout'].format(video=video_id, modality=modality))
+        path = os.path.join(directory, item)
+        stem = os.path.splitext(item)[0]
+        if source['format'] == 'voc':
+            size, names, boxes = converter.read_voc(path)
+            boxes = np.array(boxes, dtype=np.float64).reshape(-1, 4)
+        else:
+            size = converter.lookup_size(item, None, modality, Counter()) or MODALITY_SIZE.get(modality)
+            rows = converter.parse_yolo_text(converter.read_text(path))
+            class_names = source.get('class_names', converter.CLASS_NAMES)
+            names = [class_names[c] if 0 <= c < len(class_names) else source.get('default_class', str(c))
+                     for c in rows[:, 0].astype(np.int64).tolist()]
+            centers, half = rows[:, 1:3], rows[:, 3:5] / 2
+            boxes = np.hstack([centers - half, centers + half]) * (list(size) * 2)
+            size = None
+    rename = source.get('rename') or {}
+    names = [rename.get(name, name) for name in names]
+    if source.get('keep') is not None:
+        kept = [i for i, name in enumerate(names) if name in source['keep']]
+        names, boxes = [names[i] for i in kept], boxes[kept]
+    return size, names, boxes, stem
+
+
+def deduplicate(kept_names, kept_boxes, names, boxes, iou_threshold, class_rule):
+    """
+    去掉与已保留的框重复的新框，比较用 037 的网格空间索引：先与已保留的框整体比较一次，
+    剩下的框再按文件中的顺序逐个登记（与 023 相同），同一来源中重复标注的框只保留第一个
+
+    Returns:
+        numpy.ndarray: 新框中要保留的布尔数组
+    """
+    keep = np.ones(len(boxes), dtype=bool)
+    if not len(boxes):
+        return keep
+    kept_names, names = np.array(kept_names, dtype=object), np.array(names, dtype=object)
+    if class_rule == 'any_class':
+        groups = [(np.arange(len(boxes)), kept_boxes)]
+    else:
+        groups = [(np.flatnonzero(names == class_name), kept_boxes[kept_names == class_name])
+                  for class_name in set(names.tolist())]
+    for query, existing in groups:
+        if len(existing):
+            keep[query] = box_index.BoxGridIndex(existing).max_iou(boxes[query]) < iou_threshold
+        query = query[keep[query]]
+        if len(query) < 2:
+            continue
+        accepted = box_index.BoxGridIndex(boxes[query[:1]])
+        for i in query[1:]:
+            if accepted.max_iou(boxes[i:i + 1])[0] >= iou_threshold:
+                keep[i] = False
+            else:
+                accepted.add(boxes[i:i + 1])
+    return keep
+
+
+def write_fused(output_dir, stem, names, boxes, size, output_format, modality, class_names=None):
+    """
+    用 039 的格式写出一帧的融合结果
+
+    Returns:
+        list: 输出 yolo 时因类别不在 class_names 中而丢弃的框的类别名
+    """
+    width, height = size
+    if output_format == 'voc':
+        corners = np.round(boxes).astype(np.int64).tolist()
+        parts = [converter.VOC_HEADER.format(folder=modality, filename=converter.escape(stem + '.png'),
+                                             width=width, height=height)]
+        for name, (xmin, ymin, xmax, ymax) in zip(names, corners):
+            parts.append(converter.VOC_OBJECT.format(name=converter.escape(str(name)),
+                                                     xmin=xmin, ymin=ymin, xmax=xmax, ymax=ymax))
+        parts.append("</annotation>\n")
+        with open(os.path.join(output_dir, stem + '.xml'), 'w', encoding='utf-8') as f:
+            f.write(''.join(parts))
+        return []
+    class_ids = {name: i for i, name in enumerate(class_names or converter.CLASS_NAMES)}
+    ids = np.array([class_ids.get(n, int(n) if str(n).isdigit() else -1) for n in names], dtype=np.int64)
+    rows = np.column_stack([ids, (boxes[:, :2] + boxes[:, 2:]) / 2 / [width, height],
+                            (boxes[:, 2:] - boxes[:, :2]) / [width, height]])[ids >= 0]
+    with open(os.path.join(output_dir, stem + '.txt'), 'w', encoding='utf-8') as f:
+        f.write((converter.YOLO_LINE * len(rows)) % tuple(rows.ravel().tolist()))
+    return [name for name, class_id in zip(names, ids.tolist()) if class_id < 0]
+
+
+def modality_prefix(modality):
+    """模态对应的文件名前缀，与抽帧结果一致"""
+    return {'aps': '3264_2448_10_', 'evs': '816_612_8_'}.get(modality, '')
+
+
+def fuse_shard(job, video_id, modality):
+    """
+    融合一个 (视频, 模态)：各来源的有序键流归并连接，按优先级依次加入框并去重
+
+    Returns:
+        dict: 统计信息
+    """
+    start = time.perf_counter()
+    sources = job['sources']
+    output_dir = os.path.join(job['output']['root'], video_id, modality)
+    output_format = job['output']['format']
+    if isinstance(output_format, dict):
+        output_format = output_format[modality]
+    stats = {'video_id': video_id, 'modality': modality, 'frames': 0, 'unpaired': 0, 'added': Counter(),
+             'duplicates': Counter(), 'dropped': Counter(), 'errors': []}
+    streams = [source_stream(source, video_id, modality) for source in sources]
+    required = {idx for idx, source in enumerate(sources) if source.get('required')
+                and (not source.get('modalities') or modality in source['modalities'])}
+    for key, items in join_streams(streams):
+        if not required.issubset(items):
+            stats['unpaired'] += 1
+            continue
+        names, boxes, size, stem = [], np.empty((0, 4)), None, None
+        read_ok = set()
+        for idx in sorted(items):
+            source = sources[idx]
+            try:
+                src_size, src_names, src_boxes, src_stem = read_source(source, video_id, modality, items[idx])
+            except (ET.ParseError, OSError, TypeError, ValueError) as e:
+                stats['errors'].append(f"{source['name']} {video_id}/{modality} {items[idx]}: {e}")
+                continue
+            read_ok.add(idx)
+            size = size or src_size
+            stem = stem or src_stem
+            keep = deduplicate(names, boxes, src_names, src_boxes, job.get('dedup_iou', 0.5),
+                               job.get('class_rule', 'same_class'))
+            names.extend(name for name, k in zip(src_names, keep) if k)
+            boxes = np.vstack([boxes, src_boxes[keep]])
+            stats['added'][source['name']] += int(keep.sum())
+            stats['duplicates'][source['name']] += int((~keep).sum())
+        if not read_ok or not required.issubset(read_ok):
+            # 所有来源（或必需来源）都读取失败时不写出，出错的帧不能变成一个没有目标的标签文件
+            continue
+        if stem is None:
+            # 只有 csv 来源时按模态的文件名前缀生成文件名
+            number = key[0]
+            stem = f"{modality_prefix(modality)}{number:010d}" if number >= 0 else key[1]
+        size = size or MODALITY_SIZE.get(modality)
+        if size is None:
+            stats['errors'].append(f"{video_id}/{modality} {stem}: 无法确定图片尺寸")
+            continue
+        if not stats['frames']:
+            os.makedirs(output_dir, exist_ok=True)
+        stats['dropped'].update(write_fused(output_dir, stem, names, boxes, size, output_format, modality,
+                                            job['output'].get('class_names')))
+        stats['frames'] += 1
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+
+def collect_shards(job):
+    """汇总各来源中出现的 (视频, 模态)"""
+    shards = set()
+    for source in job['sources']:
+        modalities = [m for m in job['modalities'] if not source.get('modalities') or m in source['modalities']]
+        if source['format'] == 'csv':
+            shards.update(key for key in load_csv_source(source['root']) if key[1] in modalities)
+            continue
+        if not os.path.isdir(source['root']):
+            print(f"警告: 来源 {source['name']} 的路径不存在: {source['root']}")
+            continue
+        for video_id in os.listdir(source['root']):
+            for modality in modalities:
+                directory = os.path.join(source['root'], source['layout'].format(video=video_id, modality=modality))
+                if os.path.isdir(directory):
+                    shards.add((video_id, modality))
+    return sorted(shards)
+
+
+def main(job_name, workers=None):
+    """
+    主函数：按配置运行一个融合任务，每个 (视频, 模态) 一个进程池任务
+
+    参数:
+        job_name (str): JOBS 中的任务名
+        workers (int): 进程数，默认使用全部 CPU
+    """
+    start = time.perf_counter()
+    job = JOBS[job_name]
+    shards = collect_shards(job)
+    workers = workers or os.cpu_count() or 1
+    print(f"融合任务 {job_name}: {len(job['sources'])} 个来源，{len(shards)} 个 (视频, 模态)，使用 {workers} 个进程")
+
+    frames = unpaired = 0
+    added, duplicates, dropped = Counter(), Counter(), Counter()
+    errors = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fuse_shard, job, video_id, modality) for video_id, modality in shards]
+        for future in as_completed(futures):
+            stats = future.result()
+            frames += stats['frames']
+            unpaired += stats['unpaired']
+            added.update(stats['added'])
+            duplicates.update(stats['duplicates'])
+            dropped.update(stats['dropped'])
+            errors.extend(stats['errors'])
+            skipped = sum(stats['duplicates'].values())
+            print(f"完成 {stats['video_id']}/{stats['modality']}: {stats['frames']} 帧"
+                  + (f"，去掉重复框 {skipped} 个" if skipped else ""))
+
+    print(f"\n共写出 {frames} 帧，缺少必需来源而跳过 {unpaired} 帧，用时 {time.perf_counter() - start:.1f} 秒")
+    for source in job['sources']:
+        print(f"- {source['name']}: 加入 {added[source['name']]} 个框，重复 {duplicates[source['name']]} 个")
+    if dropped:
+        print(f"\n输出 yolo 时类别不在 output['class_names'] 中而丢弃 {sum(dropped.values())} 个框:")
+        for name, count in dropped.most_common():
+            print(f"- {name}: {count} 个")
+    if errors:
+        print(f"\n出错 {len(errors)} 处:")
+        for error in errors[:20]:
+            print(f"- {error}")
+
+
+# 运行程序
+if __name__ == "__main__":
+    main('行人识别与danger合并')
+    print("处理完成，融合结果已保存至", JOBS['行人识别与danger合并']['output']['root'])